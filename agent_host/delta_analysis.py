@@ -0,0 +1,174 @@
+# delta_analysis.py
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from risk_features import decode_content
+
+# Fields that change on every response without saying anything about risk
+VOLATILE_KEYS = {
+    "last_updated", "last_updated_epoch", "localtime", "localtime_epoch",
+    "meta", "annotations", "time_epoch", "date_epoch", "publishedAt",
+}
+
+# List items carrying one of these are keyed by it instead of their index,
+# so a reordered news list is not reported as every article changing
+IDENTITY_KEYS = ("url", "id", "headline", "title")
+
+
+def _decode_tool_result(result):
+    """
+    MCP tool results arrive as model_dump()-ed CallToolResult dicts whose
+    content blocks hold JSON text; decode those so diffs see real fields.
+    """
+    if not isinstance(result, dict) or "content" not in result:
+        return result
+    return {"is_error": result.get("isError", False), "content": decode_content(result)}
+
+
+def flatten_signals(data, prefix: str = "") -> Dict[str, Any]:
+    """
+    Flattens fetched tool data into {dotted.path: scalar} signals.
+    """
+    signals = {}
+
+    def walk(value, path):
+        if isinstance(value, dict):
+            for key, child in value.items():
+                if key in VOLATILE_KEYS:
+                    continue
+                walk(child, f"{path}.{key}" if path else str(key))
+        elif isinstance(value, list):
+            for index, child in enumerate(value):
+                label = index
+                if isinstance(child, dict):
+                    label = next((child[k] for k in IDENTITY_KEYS if child.get(k)), index)
+                walk(child, f"{path}[{label}]")
+        else:
+            signals[path] = value
+
+    if isinstance(data, dict) and not prefix:
+        for tool_name, result in data.items():
+            walk(_decode_tool_result(result), tool_name)
+    else:
+        walk(data, prefix)
+    return signals
+
+
+def _is_material(old, new, numeric_tolerance: float) -> bool:
+    if isinstance(old, bool) or isinstance(new, bool):
+        return old != new
+    if isinstance(old, (int, float)) and isinstance(new, (int, float)):
+        scale = max(abs(old), abs(new), 1.0)
+        return abs(new - old) / scale > numeric_tolerance
+    return old != new
+
+
+def compute_delta(previous: Dict[str, Any], current: Dict[str, Any], numeric_tolerance: float = 0.05) -> dict:
+    """
+    Structured diff between two flattened signal maps.
+
+    Returns:
+        dict: {"added": {path: value}, "changed": {path: {"old", "new"}},
+            "removed": [paths]} holding material differences only. Numeric
+            moves within `numeric_tolerance` (relative) are ignored.
+    """
+    added = {path: value for path, value in current.items() if path not in previous}
+    removed = sorted(path for path in previous if path not in current)
+    changed = {
+        path: {"old": previous[path], "new": value}
+        for path, value in current.items()
+        if path in previous and _is_material(previous[path], value, numeric_tolerance)
+    }
+    return {"added": added, "changed": changed, "removed": removed}
+
+
+def is_empty_delta(delta: dict) -> bool:
+    return not (delta["added"] or delta["changed"] or delta["removed"])
+
+
+@dataclass
+class LaneSnapshot:
+    signals: Dict[str, Any]
+    report: Optional[dict] = None
+    taken_at: float = field(default_factory=time.time)
+
+
+class LaneSnapshotStore:
+    """
+    Keeps each lane's previous signals and risk report so the next cycle can
+    send the LLM only what changed.
+    """
+    def __init__(self, numeric_tolerance: float = 0.05):
+        self.numeric_tolerance = numeric_tolerance
+        self._snapshots: Dict[str, LaneSnapshot] = {}
+        self._stats = {"full_analyses": 0, "delta_analyses": 0, "skipped_analyses": 0}
+
+    def get(self, lane_id: str) -> Optional[LaneSnapshot]:
+        return self._snapshots.get(lane_id)
+
+    def diff(self, lane_id: str, signals: Dict[str, Any]) -> Optional[dict]:
+        """
+        Returns the delta against the lane's stored snapshot, or None when the
+        lane has no usable previous snapshot (first cycle or no stored report).
+        """
+        snapshot = self._snapshots.get(lane_id)
+        if snapshot is None or snapshot.report is None:
+            return None
+        return compute_delta(snapshot.signals, signals, self.numeric_tolerance)
+
+    def update(self, lane_id: str, signals: Dict[str, Any], report: Optional[dict]):
+        """
+        Replaces the lane's snapshot after a full assessment of `signals`.
+        """
+        self._snapshots[lane_id] = LaneSnapshot(signals=signals, report=report)
+
+    def apply_delta(self, lane_id: str, delta: dict, report: dict):
+        """
+        After the LLM assessed `delta`, moves only the signals it was sent to
+        their new values. Signals that stayed within tolerance keep their
+        baseline, so slow drift accumulates until it is material instead of
+        being absorbed one small step at a time.
+        """
+        snapshot = self._snapshots[lane_id]
+        signals = snapshot.signals
+        signals.update(delta["added"])
+        signals.update((path, change["new"]) for path, change in delta["changed"].items())
+        for path in delta["removed"]:
+            signals.pop(path, None)
+        self._snapshots[lane_id] = LaneSnapshot(signals=signals, report=report)
+
+    def record(self, outcome: str):
+        self._stats[f"{outcome}_analyses"] += 1
+
+    def stats(self) -> dict:
+        return {**self._stats, "lanes": len(self._snapshots)}
+
+
+def build_delta_payload(lane_id: str, delta: dict, snapshot: LaneSnapshot, signals: Dict[str, Any]) -> dict:
+    """
+    Compact LLM input for a delta cycle: the changed signals plus a short
+    state summary and the assessment they should update.
+    """
+    per_tool = {}
+    for path in signals:
+        tool_name = path.split(".", 1)[0].split("[", 1)[0]
+        per_tool[tool_name] = per_tool.get(tool_name, 0) + 1
+
+    previous = snapshot.report or {}
+    return {
+        "mode": "delta",
+        "lane_id": lane_id,
+        "seconds_since_previous": round(time.time() - snapshot.taken_at),
+        "state_summary": {
+            "signals_per_source": per_tool,
+            "unchanged_signals": len(signals) - len(delta["added"]) - len(delta["changed"]),
+        },
+        "previous_assessment": {
+            "is_disruption_detected": previous.get("is_disruption_detected"),
+            "risk_score": previous.get("risk_score"),
+            "summary": previous.get("summary"),
+            "key_findings": previous.get("key_findings", []),
+        },
+        "changes": delta,
+    }
@@ -1,14 +1,30 @@
 # disrupt_agent.py
-from mcp.client.streamable_http import streamablehttp_client
-from mcp import ClientSession 
 import asyncio
+import functools
 import json
 import os 
+import signal
+import time
 from openai import AsyncOpenAI
 from datetime import date
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any
 
+from mcp_session_pool import MCPSessionPool
+from tool_planner import plan_tool_calls, plan_fleet_calls, lane_location, port_code_for, PLANNER_MODES
+from lane_scheduler import Lane, LaneScheduler
+from delta_analysis import LaneSnapshotStore, flatten_signals, is_empty_delta, build_delta_payload
+from risk_features import extract_features, payload_size_report
+from exchange_recorder import ExchangeRecorder
+from risk_prescreen import RiskPrescreen
+from fleet_features import FleetFeatureEngine
+from signal_store import SignalStore
+from llm_streaming import stream_json_completion, streaming_enabled
+from llm_cache import LLMResponseCache, make_llm_cache_key
+from llm_json import compact_json, extract_json_object, with_json_key
+from tool_registry import ToolSchemaRegistry
+from tracing import tracer
+
 tools_definition_str= [
     {
         "type": "function",
@@ -20,6 +36,7 @@ tools_definition_str= [
                 "properties": {
                     "city": {"type": "string", "description": "The city name for the weather query, e.g., 'Los Angeles'."} ,
                     "history_date": {"type": "string", "description": "history_date five days prior   e.g format: YYYY-MM-DD"} ,
+                    "sections": {"type": "array", "items": {"type": "string"}, "description": "Optional subset of 'current', 'forecast', 'history', 'alerts', 'marine'; omit for all. Skip 'marine' for inland cities."} ,
                 },
                 "required": ["city"]
             }
@@ -33,13 +50,13 @@ tools_definition_str= [
             "parameters": {
                 "type": "object",
                 "properties": {
-                    "news_keywords": {
+                    "news": {
                         "type": "array",
                         "items": {"type": "string"},
                         "description": "A list of topics to search for, e.g., ['Los Angeles port', 'global supply chain', 'geopolitical risk']."
                     }
                 },
-                "required": ["news_keywords"]
+                "required": ["news"]
             }
         }
     },
@@ -80,65 +97,50 @@ tools_definition_str= [
             "parameters": {
                 "type": "object",
                 "properties": {
-                    "cik_company": {"type": "string", "description": "The CIK (Central Index Key) of the company, e.g., '0000320193'."}
+                    "cik_company": {"type": "string", "description": "The CIK (Central Index Key) of the company, e.g., '0000320193'."},
+                    "form_types": {"type": "array", "items": {"type": "string"}, "description": "Optional form types to search instead of the latest 10-Q, e.g. ['8-K'] for recent material events."}
                 },
                 "required": ["cik_company"]
             }
         }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_weather_batch",
+            "description": "get_weather for several cities or port areas in one call. Use instead of repeated get_weather calls.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "cities": {"type": "array", "items": {"type": "string"}, "description": "City names, e.g., ['Los Angeles', 'Shanghai']."},
+                    "history_date": {"type": "string", "description": "history_date five days prior   e.g format: YYYY-MM-DD"},
+                    "sections": {"type": "array", "items": {"type": "string"}, "description": "Optional subset of 'current', 'forecast', 'history', 'alerts', 'marine'; omit for all."}
+                },
+                "required": ["cities", "history_date"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_port_congestion_batch",
+            "description": "get_port_congestion for several ports in one call. Use instead of repeated get_port_congestion calls.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "port_codes": {"type": "array", "items": {"type": "string"}, "description": "Official port codes, e.g., ['USBAL', 'CNSHA']."},
+                    "vessel_type": {"type": "string", "description": "The type of vessel to check congestion for, e.g., 'cargo', 'tanker' , 'roro'."}
+                },
+                "required": ["port_codes", "vessel_type"]
+            }
+        }
     }
 ]
 
-
-def pretty_print_tool_calls(raw: str) -> str:
-    # 1) Find the first “{” and last “}”
-    start = raw.find('{')
-    end   = raw.rfind('}')
-    if start == -1 or end == -1 or end < start:
-        raise ValueError("No valid JSON object found in input")
-
-    # 2) Slice out only the JSON object
-    clean = raw[start:end+1]
-
-    # 3) Parse the cleaned JSON
-    data = json.loads(clean)
-
-    # 4) Re-serialize with indentation
-    return json.dumps(data, indent=2)
-
-class DisruptionDetectionAgent:
-    """
-    An agent that continuously monitors various data sources for potential
-    supply chain disruptions, analyzes the data, and reports findings.
-    """
-    def __init__(self, monitor_interval_seconds=3600):
-        """
-        Initializes the DisruptionDetectionAgent.
-
-        """
-        self.client = AsyncOpenAI(
-        api_key= os.getenv("PERPLEXITY_API_KEY"),
-        base_url="https://api.perplexity.ai"
-        )
-        self.model = "sonar"
-        self.mcp_url = "http://127.0.0.1:8001/mcp"
-        self.monitor_interval_seconds = monitor_interval_seconds
-        self.session = None  # MCP session, initialized upon connection
-
-
-
-    async def _fetch_data(self, params):
-        """
-            Dynamically fetches data from various sources by letting an LLM choose
-            and parameterize the appropriate tools based on the input.
-
-            Args:
-                params (dict): A dictionary containing supply chain details from the orchestrator.
-            
-            Returns:
-                dict: A dictionary containing the results from each data source called.
-        """
-        
-        system_prompt = f"""
+@functools.lru_cache(maxsize=8)
+def build_planner_prompt(tools_json: str) -> str:
+    # One prompt per tool catalogue version; `tools_json` is the catalogue as compact JSON
+    return f"""
         You are a data-fetching AI component. Based on the user's input, your sole purpose is to generate a single, valid JSON object that specifies which tools to call.
 
         The JSON object must have a single root key: "tool_calls".
@@ -148,7 +150,7 @@ class DisruptionDetectionAgent:
         Do not output any text, explanations, or markdown formatting other than the final JSON object.
 
         Available Tools:
-        {tools_definition_str}
+        {tools_json}
 
         Example of the required JSON output:
         {{
@@ -165,7 +167,7 @@ class DisruptionDetectionAgent:
             "function": {{
                 "name": "get_news",
                 "arguments": {{
-                "news_keywords": ["geopolitical", "maritime security"]
+                "news": ["geopolitical", "maritime security"]
                 }}
             }}
             }},
@@ -187,110 +189,604 @@ class DisruptionDetectionAgent:
         """
 
 
-        user_input_str = json.dumps(params, indent=2)
+# Fallback catalogue, used until the server's own schemas have been listed
+# (see tool_registry.ToolSchemaRegistry). Built once, not on every planning call.
+PLANNER_SYSTEM_PROMPT = build_planner_prompt(compact_json(tools_definition_str))
+
+
+class DisruptionDetectionAgent:
+    """
+    An agent that continuously monitors various data sources for potential
+    supply chain disruptions, analyzes the data, and reports findings.
+    """
+    def __init__(self, monitor_interval_seconds=3600, max_concurrent_tools=5, tool_timeout_seconds=30, session_pool=None,
+                 planner_mode="auto", feature_extractor=extract_features, llm_client=None,
+                 stream_llm=None, preliminary_alert_handler=None, llm_cache=None, prescreen=None,
+                 tool_registry=None, signal_store=None, recorder=None, fleet_engine=None, fleet_context_rows=5):
+        """
+        Initializes the DisruptionDetectionAgent.
+
+        Args:
+            monitor_interval_seconds (int): Seconds between monitoring cycles.
+            max_concurrent_tools (int): Cap on MCP tool calls in flight at once per analysis.
+            tool_timeout_seconds (float): Deadline for a single MCP tool call.
+            session_pool (MCPSessionPool): Shared pool of MCP sessions. A private
+                pool is created when none is given.
+            planner_mode (str): "rules", "llm" or "auto" (rules first, LLM fallback
+                for ambiguous input). See `_plan_tool_calls`.
+            feature_extractor (callable): Compacts raw tool results into risk-feature
+                records before analysis (see risk_features.extract_features).
+                None sends the raw results to the LLM.
+            llm_client (AsyncOpenAI): Shared LLM client (and its connection pool).
+                A private client is created, and closed by `close()`, when none is given.
+            stream_llm (bool): Stream the risk assessment and parse it as it arrives.
+                Defaults to the LLM_STREAMING env var (on).
+            preliminary_alert_handler (callable): Called with a preliminary alert dict
+                as soon as a streamed assessment has reported a disruption and its
+                risk score, before the rest of the report arrives. May return an
+                awaitable, which is run as a task. None only logs the alert.
+            llm_cache (LLMResponseCache): Cache for LLM tool plans, keyed on the
+                normalized params. Built from the LLM_CACHE_* env vars when not given.
+            prescreen (RiskPrescreen): Rule-based pass that lets clearly quiet
+                cycles skip the LLM assessment. Built from the RISK_PRESCREEN /
+                PRESCREEN_* env vars when not given.
+            tool_registry (ToolSchemaRegistry): The server's tool schemas, used to
+                build the planner prompt and to validate (and repair) planned calls
+                before dispatch. Built on `session_pool` when not given.
+            signal_store (SignalStore): Durable history of every cycle's tool
+                results, features and report. Built from the SIGNAL_STORE_* env
+                vars when not given (disabled unless SIGNAL_STORE_PATH is set).
+            recorder (ExchangeRecorder): Records or replays tool calls and LLM
+                completions. It wraps only the pool and client this agent creates
+                itself; shared ones are wrapped by their owner. Built from the
+                EXCHANGE_* env vars when not given (off unless EXCHANGE_MODE is set).
+            fleet_engine (FleetFeatureEngine): Computes the fleet-wide risk table in
+                `refresh_fleet_risk`. Built from the FLEET_RISK_* env vars when not given.
+            fleet_context_rows (int): Riskiest rows of the latest fleet table sent
+                with each assessment (plus the lane's own port); 0 sends none.
+        """
+        if planner_mode not in PLANNER_MODES:
+            raise ValueError(f"planner_mode must be one of {PLANNER_MODES}, got '{planner_mode}'")
+
+        self.client = llm_client or AsyncOpenAI(
+        api_key= os.getenv("PERPLEXITY_API_KEY"),
+        base_url=os.getenv("PERPLEXITY_BASE_URL", "https://api.perplexity.ai")
+        )
+        self._owns_llm_client = llm_client is None
+        self._owns_recorder = recorder is None
+        self.recorder = recorder or ExchangeRecorder.from_env()
+        if self.recorder is not None and llm_client is None:
+            self.client = self.recorder.wrap_llm_client(self.client)
+        self.model = "sonar"
+        self.mcp_url = os.getenv("MCP_URL", "http://127.0.0.1:8001/mcp")
+        self.monitor_interval_seconds = monitor_interval_seconds
+        # Long-lived MCP sessions, shared by every analysis this agent runs
+        self.session_pool = session_pool or MCPSessionPool(self.mcp_url)
+        if self.recorder is not None and session_pool is None:
+            self.session_pool = self.recorder.wrap_session_pool(self.session_pool)
+        self.max_concurrent_tools = max_concurrent_tools
+        self.tool_timeout_seconds = tool_timeout_seconds
+        self.planner_mode = planner_mode
+        self.shared_call_hits = 0  # tool calls served from another lane's in-flight call
+        # previous signals + report per lane, so later cycles only send what changed
+        self.snapshots = LaneSnapshotStore()
+        self.feature_extractor = feature_extractor
+        self.stream_llm = streaming_enabled() if stream_llm is None else stream_llm
+        self.preliminary_alert_handler = preliminary_alert_handler
+        self._alert_tasks = set()
+        self._owns_llm_cache = llm_cache is None
+        self.llm_cache = llm_cache or LLMResponseCache.from_env()
+        self.prescreen = prescreen or RiskPrescreen.from_env()
+        self.tool_registry = tool_registry or ToolSchemaRegistry.from_env(self.session_pool)
+        self._owns_signal_store = signal_store is None
+        self.signal_store = signal_store or SignalStore.from_env()
+        self.fleet_engine = fleet_engine or FleetFeatureEngine.from_env()
+        self.fleet_context_rows = fleet_context_rows
+        self.fleet_table = None  # latest FleetRiskTable, from refresh_fleet_risk
+
+
+
+    async def start(self):
+        """
+        Warms up the MCP session pool so the first analysis skips the handshake.
+        """
+        await self.session_pool.start()
+
+    async def close(self):
+        if self._alert_tasks:
+            await asyncio.gather(*self._alert_tasks, return_exceptions=True)
+        await self.session_pool.close()
+        if self._owns_llm_client:
+            await self.client.close()
+        if self._owns_llm_cache:
+            await self.llm_cache.aclose()
+        if self._owns_signal_store and self.signal_store is not None:
+            await self.signal_store.close()
+        if self._owns_recorder and self.recorder is not None:
+            await self.recorder.close()
+
+    def _start_tool_call(self, tool_name, tool_args, shared_calls):
+        """
+        Starts the MCP call, or joins an identical one already started in the
+        same scheduler tick when a `shared_calls` table is given.
+        """
+        if shared_calls is None:
+            return asyncio.ensure_future(self.session_pool.call_tool(tool_name, tool_args))
+
+        key = (tool_name, json.dumps(tool_args, sort_keys=True))
+        task = shared_calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.session_pool.call_tool(tool_name, tool_args))
+            # lanes that timed out stop awaiting it: retrieve a late failure so it is not reported unhandled
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            shared_calls[key] = task
+        else:
+            self.shared_call_hits += 1
+        return task
+
+    async def _call_tool(self, semaphore, tool_name, tool_args, shared_calls=None):
+        """
+        Runs one MCP tool call under the concurrency cap and per-tool timeout.
+        Never raises, so a failing tool cannot cancel its siblings.
+
+        Returns:
+            tuple: (result dict, timing dict)
+        """
+        dispatched = time.perf_counter()
+        async with semaphore:
+            started = time.perf_counter()
+            print(f"[Agent]     - Calling tool: {tool_name}({tool_args})")
+            with tracer.span("mcp.tool_call", tool=tool_name) as span:
+                try:
+                    call = self._start_tool_call(tool_name, tool_args, shared_calls)
+                    if shared_calls is not None:
+                        # shield: a timeout here must not cancel a call other lanes are awaiting
+                        call = asyncio.shield(call)
+                    # an unshielded call is cancelled on timeout instead of running on unobserved
+                    result = await asyncio.wait_for(call, timeout=self.tool_timeout_seconds)
+                    serial = result.model_dump()
+                    if result.isError:
+                        status = "tool_error"
+                        print(f"[Agent]     - Tool '{tool_name}' reported an error.")
+                        self.tool_registry.note_tool_error(
+                            " ".join(getattr(block, "text", "") for block in result.content))
+                    else:
+                        status = "ok"
+                        print(f"[Agent]     - Successfully completed: {tool_name}")
+                except asyncio.TimeoutError:
+                    serial = {"error": f"Tool '{tool_name}' timed out after {self.tool_timeout_seconds}s"}
+                    status = "timeout"
+                    print(f"[Agent]     - Tool '{tool_name}' timed out after {self.tool_timeout_seconds}s")
+                except Exception as e:
+                    serial = {"error": f"Protocol-level failure for '{tool_name}'", "details": str(e)}
+                    status = "error"
+                    print(f"[Agent]     - A critical error occurred calling tool '{tool_name}': {e}")
+                finished = time.perf_counter()
+
+                if status != "ok":
+                    span.fail(status)
+                if tracer.enabled:
+                    span.set(queued_ms=round((started - dispatched) * 1000, 2),
+                             response_bytes=len(json.dumps(serial, default=str)))
+
+        timing = {
+            "status": status,
+            "queued_ms": round((started - dispatched) * 1000, 2),
+            "call_ms": round((finished - started) * 1000, 2),
+        }
+        return serial, timing
+
+    async def _plan_with_llm(self, params):
+        """
+            Asks the LLM which tools to call and with what arguments.
+
+            Args:
+                params (dict): A dictionary containing supply chain details from the orchestrator.
+
+            Returns:
+                list or None: The planned tool calls, or None if the LLM response was unusable.
+        """
+        
+        # the prompt follows the server's schemas; a new version also means new cache keys
+        if await self.tool_registry.ensure_loaded():
+            system_prompt = build_planner_prompt(self.tool_registry.definitions_json())
+        else:
+            system_prompt = PLANNER_SYSTEM_PROMPT
+        user_input_str = compact_json(params)
+        # the date is part of the key: planned arguments such as history_date depend on it
+        cache_key = make_llm_cache_key("planner.llm", self.model, system_prompt, params,
+                                       max_tokens=500, today=date.today().isoformat())
+        cached = self.llm_cache.get(cache_key)
+        raw_output = None
 
         try:
-            print("[Agent]   - Step 1: Asking LLM for a structured JSON of tool calls...")
-            
-            # This is the key: using response_format with our custom Pydantic model.
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_input_str}
-                ],
+            if cached is not None:
+                print("[Agent]   - Reusing a cached LLM tool plan for equivalent params.")
+                raw_output = cached.content
+                response = None
+            else:
+                print("[Agent]   - Asking LLM for a structured JSON of tool calls...")
 
-                max_tokens=500,
-            )
-            
-            # Parse the guaranteed JSON response using our Pydantic model.
-            # This is much safer than a raw json.loads().
-            
-            raw_output = response.choices[0].message.content
-            print(f"[Agent]   - Raw LLM Output:\n{raw_output}")
+                # This is the key: using response_format with our custom Pydantic model.
+                with tracer.span("planner.llm", prompt_bytes=len(system_prompt) + len(user_input_str)) as span:
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_input_str}
+                        ],
 
+                        max_tokens=500,
+                    )
+                    span.set_usage(response)
+
+                # Parse the guaranteed JSON response using our Pydantic model.
+                # This is much safer than a raw json.loads().
+
+                raw_output = response.choices[0].message.content
+                print(f"[Agent]   - Raw LLM Output:\n{raw_output}")
 
-            # The output is expected to be a dictionary with a 'tool_calls' key.
-            clean_json = pretty_print_tool_calls(raw_output)
 
-            llm_response = json.loads(clean_json)
+            # The output is expected to be a dictionary with a 'tool_calls' key.
+            llm_response = extract_json_object(raw_output)
 
-            llm_tool_decisions = llm_response.get('tool_calls', [])
+            if cached is None:
+                self.llm_cache.put(cache_key, raw_output, response.usage)
+            return llm_response.get('tool_calls', [])
 
-            if not llm_tool_decisions:
-                print("[Agent]   - LLM decided no tools were necessary for the given input.")
-                return {}
         except json.JSONDecodeError as e:
             print(f"An error occurred while parsing the LLM JSON response: {e}")
             print(f"Invalid JSON received: {raw_output}")
-            return {}
+            return None
         except Exception as e:
             print(f"An unexpected error occurred during the LLM response handling: {e}")
-            return {}
-                
+            return None
+
+    async def _plan_tool_calls(self, params):
+        """
+            Builds the tool-call list for `params` according to `planner_mode`:
+            "rules" only uses the deterministic planner, "llm" always asks the
+            LLM, and "auto" uses the rules and falls back to the LLM when the
+            input is too ambiguous to map.
+
+            Returns:
+                list or None: Planned tool calls, or None if planning failed.
+        """
+        if self.planner_mode in ("rules", "auto"):
+            with tracer.span("planner.rules") as span:
+                tool_calls = plan_tool_calls(params)
+                span.set(planned_calls=len(tool_calls or []))
+            if tool_calls:
+                print(f"[Agent]   - Step 1: Planned {len(tool_calls)} tool call(s) from structured params (no LLM).")
+                return tool_calls
+            if self.planner_mode == "rules":
+                print("[Agent]   - Step 1: Rule-based planner found nothing to call for the given input.")
+                return []
+            print("[Agent]   - Step 1: Input is ambiguous for the rule-based planner, falling back to the LLM.")
+
+        return await self._plan_with_llm(params)
+
+    async def _fetch_data(self, params, shared_calls=None):
+        """
+            Fetches data from various sources, planning which tools to call and
+            with what arguments from the input (see `_plan_tool_calls`).
+
+            Args:
+                params (dict): A dictionary containing supply chain details from the orchestrator.
+                shared_calls (dict): Optional per-tick table of in-flight tool calls
+                    shared between lanes (see LaneScheduler).
+            
+            Returns:
+                tuple: (dict of the results from each data source called, dict of
+                    per-tool timings: status, queued_ms and call_ms)
+        """
+        tool_decisions = await self._plan_tool_calls(params)
+        if tool_decisions is None:
+            return {}, {}
+        if not tool_decisions:
+            print("[Agent]   - Planner decided no tools were necessary for the given input.")
+            return {}, {}
+
 
         fetched_data = {}
-        print(f"[Agent]   - Step 2: Connecting to MCP to execute {len(llm_tool_decisions)} tool(s)...")
+        rejected = {}
+        print(f"[Agent]   - Step 2: Executing {len(tool_decisions)} tool(s) over pooled MCP sessions...")
         try:
-            async with streamablehttp_client(self.mcp_url) as (read_stream, write_stream, _):
-                async with ClientSession(read_stream, write_stream) as session:
-                    await session.initialize()
-                    
-                    for tool_call in llm_tool_decisions:
-                        function_details = tool_call.get('function', {})
-                        tool_name = function_details.get('name')
-                        tool_args = function_details.get('arguments', {})
-
-                        if not tool_name:
-                            print("[Agent]     - Skipping a tool call with no name.")
-                            continue
-                        
-                        print(f"[Agent]     - Calling tool: {tool_name}({tool_args})")
-                        try:
-                            # Simple assignment, just like your working code
-                            result = await session.call_tool(tool_name, tool_args)
-                            serial = result.model_dump()
-                            fetched_data[tool_name] =  serial
-                            print(f"[Agent]     - Successfully completed: {tool_name}")
-
-                        except Exception as e:
-                            print(f"[Agent]     - A critical error occurred calling tool '{tool_name}': {e}")
-                            fetched_data[tool_name] = {"error": f"Protocol-level failure for '{tool_name}'", "details": str(e)}
+            # checked against the server's schemas first: a call that cannot
+            # succeed is repaired or dropped here instead of costing a round trip
+            schemas_loaded = await self.tool_registry.ensure_loaded()
+            planned_calls = []
+            for tool_call in tool_decisions:
+                function_details = tool_call.get('function', {})
+                tool_name = function_details.get('name')
+                tool_args = function_details.get('arguments', {})
+
+                if not tool_name:
+                    print("[Agent]     - Skipping a tool call with no name.")
+                    continue
+                if schemas_loaded:
+                    check = self.tool_registry.check(tool_name, tool_args)
+                    if not check.ok:
+                        print(f"[Agent]     - Rejected {tool_name}({tool_args}) before dispatch: {check.error}")
+                        fetched_data[tool_name] = {"error": f"Invalid call to '{tool_name}': {check.error}"}
+                        rejected[tool_name] = {"status": "rejected", "queued_ms": 0.0, "call_ms": 0.0}
+                        continue
+                    if check.repairs:
+                        print(f"[Agent]     - Repaired {tool_name} call: {'; '.join(check.repairs)}")
+                    tool_name, tool_args = check.name, check.arguments
+                planned_calls.append((tool_name, tool_args))
+
+            # Dispatch every planned call at once over the shared sessions;
+            # the semaphore caps how many are in flight.
+            semaphore = asyncio.Semaphore(self.max_concurrent_tools)
+            fetch_started = time.perf_counter()
+            with tracer.span("tools.fanout", tool_calls=len(planned_calls)):
+                outcomes = await asyncio.gather(*[
+                    self._call_tool(semaphore, tool_name, tool_args, shared_calls)
+                    for tool_name, tool_args in planned_calls
+                ])
+            fetch_ms = round((time.perf_counter() - fetch_started) * 1000, 2)
+
+            tool_timings = dict(rejected)
+            for (tool_name, _), (serial, timing) in zip(planned_calls, outcomes):
+                fetched_data[tool_name] = serial
+                tool_timings[tool_name] = timing
+
+            if tool_timings:
+                slowest = max(tool_timings, key=lambda name: tool_timings[name]["call_ms"])
+                print(f"[Agent]   - Tool fan-out took {fetch_ms} ms; critical path: {slowest} "
+                      f"({tool_timings[slowest]['call_ms']} ms)")
 
             # Don't try to JSON serialize here - let the downstream code handle it
             print(f"[Agent]   - Successfully fetched data from {len(fetched_data)} tools")
-            return fetched_data
+            return fetched_data, tool_timings
 
         except Exception as e:
-            print(f"[Agent]   - Critical error during MCP connection setup: {e}")
-            return {"error": f"Failed to execute tools via MCP: {e}"}
+            print(f"[Agent]   - Critical error while executing tools via MCP: {e}")
+            return {"error": f"Failed to execute tools via MCP: {e}"}, dict(rejected)
 
 
-    async def _analyze_disruptions(self, data):
+    async def refresh_fleet_risk(self, lane_params: list):
         """
-        Analyzes the collected data to detect potential disruptions using an LLM
-        and ensures the output is a structured, machine-readable JSON object.
+        Fetches weather and congestion for every lane's port in batched calls
+        and recomputes the fleet-wide risk table in one vectorized pass (see
+        fleet_features). The table is kept for later assessments and returned.
 
         Args:
-            data (dict): The data fetched from various sources by the _fetch_data method.
+            lane_params (list[dict]): The params of every monitored lane.
+
+        Returns:
+            FleetRiskTable or None: None when nothing could be fetched; the
+                previous table is kept then.
+        """
+        tool_calls = plan_fleet_calls(lane_params)
+        if not tool_calls:
+            return None
+        semaphore = asyncio.Semaphore(self.max_concurrent_tools)
+        with tracer.span("agent.fleet_risk", tool_calls=len(tool_calls)) as span:
+            outcomes = await asyncio.gather(*[
+                self._call_tool(semaphore, call["function"]["name"], call["function"]["arguments"])
+                for call in tool_calls
+            ])
+            results = {"get_weather_batch": [], "get_port_congestion_batch": []}
+            for call, (serial, timing) in zip(tool_calls, outcomes):
+                if timing["status"] == "ok":
+                    results[call["function"]["name"]].append(serial)
+            if not any(results.values()):
+                print("[Agent] Fleet risk sweep fetched nothing; keeping the previous table.")
+                span.fail("no_data")
+                return None
+
+            port_codes = {}
+            for params in lane_params:
+                city, port_code = lane_location(params)
+                if city and port_code:
+                    port_codes[city] = port_code
+            started = time.perf_counter()
+            table = self.fleet_engine.from_batch_results(results["get_weather_batch"],
+                                                         results["get_port_congestion_batch"], port_codes)
+            compute_ms = round((time.perf_counter() - started) * 1000, 2)
+            span.set(locations=len(table), compute_ms=compute_ms)
+
+        self.fleet_table = table
+        at_risk = [row[1] or row[0] for row in table.to_compact(top=3)["rows"] if row[-1]]
+        print(f"[Agent] Fleet risk table: {len(table)} location(s) in {compute_ms} ms; "
+              f"riskiest: {', '.join(at_risk) or 'none scored'}")
+        return table
+
+    def _fleet_context(self, params):
+        """
+        The compact fleet table to send with an assessment of `params`, or None.
+        """
+        if self.fleet_table is None or not self.fleet_context_rows:
+            return None
+        port_code = port_code_for(params)
+        return self.fleet_table.to_compact(top=self.fleet_context_rows, include=(port_code,) if port_code else ())
+
+    async def _analyze_disruptions(self, data, lane_id=None, prescreen=None, data_text=None):
+        """
+        Analyzes the collected data to detect potential disruptions (see
+        `_assess_cycle`).
 
         Returns:
             dict or None: A structured dictionary containing the analysis if a disruption
                         is detected, otherwise None.
         """
+        return self._disruption_only(await self._assess_cycle(data, lane_id=lane_id, prescreen=prescreen,
+                                                              data_text=data_text))
+
+    async def _assess_cycle(self, data, lane_id=None, prescreen=None, data_text=None, fleet_risk=None):
+        """
+        Assesses the collected data using an LLM and ensures the output is a
+        structured, machine-readable JSON object.
+
+        With a `lane_id`, the lane's previous snapshot is diffed against `data`:
+        the LLM is skipped when nothing material changed (the previous report
+        stands) and otherwise only sees the changed signals plus a compact
+        state summary.
+
+        With a `prescreen` verdict that found nothing (and the pre-screen in
+        "on" mode) the LLM is skipped and the verdict's baseline report is used.
+
+        Args:
+            data (dict): The data fetched from various sources by the _fetch_data method.
+            lane_id (str): Monitoring lane the data belongs to, if any.
+            prescreen (PrescreenResult): The pre-screen's verdict on this data, if any.
+            data_text (str): compact_json(data), when the caller already has it.
+            fleet_risk (dict): Compact fleet risk table sent along to the LLM, if any.
+
+        Returns:
+            dict or None: The cycle's risk report, disruption or not; None if
+                there was no data or the assessment failed.
+        """
         if not data:
             print("No data provided to analyze.")
             return None
 
-        # Convert the fetched data into a clean string for the LLM prompt
-        # The LLM will analyze this content.
-        data_str = json.dumps(data, indent=2)
+        if lane_id is None or "error" in data:
+            report = await self._assess(data, lane_id, prescreen, text=data_text, fleet_risk=fleet_risk)
+        else:
+            signals = flatten_signals(data)
+            delta = self.snapshots.diff(lane_id, signals)
+            snapshot = self.snapshots.get(lane_id)
+
+            # a failed assessment leaves the old snapshot so the next cycle diffs against it
+            if delta is None:
+                self.snapshots.record("full")
+                report = await self._assess(data, lane_id, prescreen, text=data_text, fleet_risk=fleet_risk)
+                if report is not None:
+                    self.snapshots.update(lane_id, signals, report)
+            elif is_empty_delta(delta):
+                # the snapshot stays the baseline: small moves keep adding up against it
+                self.snapshots.record("skipped")
+                print(f"[Agent]   - Lane '{lane_id}': nothing material changed, keeping the previous assessment.")
+                report = snapshot.report
+            else:
+                self.snapshots.record("delta")
+                payload = build_delta_payload(lane_id, delta, snapshot, signals)
+                print(f"[Agent]   - Lane '{lane_id}': sending {len(delta['added']) + len(delta['changed'])} "
+                      f"changed signal(s) of {len(signals)} to the LLM.")
+                report = await self._assess(payload, lane_id, prescreen, fleet_risk=fleet_risk)
+                if report is not None:
+                    self.snapshots.apply_delta(lane_id, delta, report)
+        return report
+
+    @staticmethod
+    def _disruption_only(report):
+        if report is None:
+            return None
 
+        # Validate the result to ensure it's usable
+        if report.get("is_disruption_detected"):
+            print(f"Potential disruption detected with risk score: {report.get('risk_score')}")
+            return report
+        else:
+            print("No significant disruptions detected in this cycle.")
+            return None
+
+    async def _assess(self, payload, lane_id, prescreen, text=None, fleet_risk=None):
+        """
+        The pre-screen's baseline report when it found nothing, otherwise the
+        LLM's assessment of `payload` (sent as `text`, its compact JSON, if given),
+        with the `fleet_risk` table added under "fleet_risk".
+        """
+        if prescreen is not None and self.prescreen.mode == "on" and not prescreen.needs_llm:
+            self.prescreen.record_skip()
+            print(f"[Agent]   - Pre-screen found nothing (baseline risk score {prescreen.risk_score}), skipping the LLM.")
+            return prescreen.as_report()
+
+        text = text if text is not None else compact_json(payload)
+        if fleet_risk is not None and isinstance(payload, dict):
+            text = with_json_key(text, "fleet_risk", fleet_risk)
+        report = await self._assess_risk(text, lane_id=lane_id)
+        if prescreen is not None:
+            self.prescreen.record_llm_verdict(prescreen, report)
+            if report is not None:
+                report["baseline_risk_score"] = prescreen.risk_score
+        return report
+
+    def _emit_preliminary_alert(self, alert: dict):
+        print(f"[Agent]   - PRELIMINARY ALERT: disruption detected, risk score {alert['risk_score']} "
+              f"({alert['elapsed_ms']} ms in, full report still streaming)")
+        if self.preliminary_alert_handler is None:
+            return
+        try:
+            result = self.preliminary_alert_handler(alert)
+        except Exception as e:
+            print(f"[Agent]   - Preliminary alert handler failed: {e}")
+            return
+        if asyncio.iscoroutine(result) or isinstance(result, asyncio.Future):
+            task = asyncio.ensure_future(result)
+            self._alert_tasks.add(task)
+            task.add_done_callback(self._alert_tasks.discard)
+
+    async def _complete_assessment(self, messages, span, lane_id=None) -> str:
+        """
+        Runs the risk-assessment completion and returns its text. When
+        streaming, fires the preliminary alert as soon as
+        `is_disruption_detected` and `risk_score` have both arrived.
+        """
+        if not self.stream_llm:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                # This is the key to ensuring reliable JSON output
+                #response_format={"type": "json_object"},
+                temperature=0.1 ,
+                max_tokens = 650
+            )
+            span.set_usage(response)
+            return response.choices[0].message.content
+
+        started = time.perf_counter()
+        seen = {}
+
+        def on_field(key, value):
+            if key not in ("is_disruption_detected", "risk_score", "summary"):
+                return
+            seen[key] = value
+            if "alerted" in seen or "is_disruption_detected" not in seen or "risk_score" not in seen:
+                return
+            seen["alerted"] = True
+            if seen["is_disruption_detected"] is True:
+                elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+                span.set(preliminary_alert_ms=elapsed_ms)
+                self._emit_preliminary_alert({
+                    "preliminary": True,
+                    "lane_id": lane_id,
+                    "is_disruption_detected": True,
+                    "risk_score": seen["risk_score"],
+                    "summary": seen.get("summary"),
+                    "elapsed_ms": elapsed_ms,
+                })
+
+        completion = await stream_json_completion(
+            self.client,
+            on_field=on_field,
+            model=self.model,
+            messages=messages,
+            temperature=0.1 ,
+            max_tokens = 650
+        )
+        span.set(streamed=True, first_token_ms=completion.first_token_ms)
+        span.set_usage(completion)
+        return completion.content
+
+    async def _assess_risk(self, data_str, lane_id=None):
+        """
+        Sends the serialized intelligence to the LLM and parses its report.
+
+        Returns:
+            dict or None: The full report (whether or not a disruption was
+                detected), or None if the LLM response was unusable.
+        """
         system_prompt ="""
             **Your Persona**: You are "Horus," a world-class supply chain risk analyst. You are logical, data-driven, and concise. Your sole purpose is to synthesize disparate, real-time intelligence into a clear, structured risk assessment for an automated system. You do not hedge or provide conversational filler; you deliver analysis.
 
             **Your Task**:
             1.  **Analyze**: You will be given a JSON object containing multi-source intelligence (weather, news, port congestion, SEC filings) can also search web.
+                If the object has "mode": "delta", it only holds the signals that changed since "previous_assessment"; update that assessment using the changes.
+                A "fleet_risk" table, if present, ranks the monitored ports by pre-computed weather, sea-state and congestion risk (riskiest first); use it as context for this port, not as findings about it.
             2.  **Assess**: Identify correlations and emergent risks. A weather alert combined with high port congestion is a higher risk than either alone.
             3.  **Report**: Your entire output must be a single, valid JSON object conforming to the schema below.
 
@@ -319,36 +815,19 @@ class DisruptionDetectionAgent:
 
 
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            raw_output = None
+            with tracer.span("analysis.llm", prompt_bytes=len(system_prompt) + len(data_str)) as span:
+                raw_output = await self._complete_assessment([
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": data_str}
-                ],
-                # This is the key to ensuring reliable JSON output
-                #response_format={"type": "json_object"},
-                temperature=0.1 ,
-                max_tokens = 650
-            )
+                ], span, lane_id=lane_id)
 
-            raw_output = response.choices[0].message.content
             print(raw_output)
 
-            clean_json = pretty_print_tool_calls(raw_output)
-
-            # The response_format guarantees the content is a valid JSON string
-            analysis_result = json.loads(clean_json)
-            
-            # Validate the result to ensure it's usable
-            if analysis_result.get("is_disruption_detected"):
-                print(f"Potential disruption detected with risk score: {analysis_result.get('risk_score')}")
-                return analysis_result
-            else:
-                print("No significant disruptions detected in this cycle.")
-                return None
+            return extract_json_object(raw_output)
 
         except json.JSONDecodeError as e:
-            print(f"CRITICAL ERROR: Failed to decode JSON from LLM response despite using response_format. Response: {response.choices[0].message.content}. Error: {e}")
+            print(f"CRITICAL ERROR: Failed to decode JSON from LLM response despite using response_format. Response: {raw_output}. Error: {e}")
             return None
         except KeyError as e:
             print(f"CRITICAL ERROR: LLM response was valid JSON but missed a required key: {e}")
@@ -358,20 +837,68 @@ class DisruptionDetectionAgent:
             return None
         
 
-    async def run_single_analysis(self, initial_params: dict):
+    async def run_single_analysis(self, initial_params: dict, shared_calls: dict = None, lane_id: str = None,
+                                  return_details: bool = False):
         """
         Runs one complete analysis cycle: fetch, analyze, and report.
+
+        Args:
+            initial_params (dict): Structured supply chain params to monitor.
+            shared_calls (dict): Per-tick in-flight tool-call table (see LaneScheduler).
+            lane_id (str): Monitoring lane; enables delta analysis against the
+                lane's previous cycle.
+            return_details (bool): Also return this cycle's details.
+
+        Returns:
+            dict or None: The analysis report if a disruption was detected.
+                With return_details, a (report, details) tuple where details
+                holds this cycle's "tool_timings" (per tool: status, queued_ms,
+                call_ms) and "compaction_report" (None without compaction).
         """
         print("[Agent] Starting analysis...")
 
         data_to_analyze = None
+        compaction_report = None
         
-
-        # 1. Fetch Data
-        data_to_analyze = await self._fetch_data(initial_params)
-        
-        # 2. Analyze Data
-        analysis_result = await self._analyze_disruptions(data_to_analyze)
+        with tracer.span("agent.analysis_cycle", lane_id=lane_id) as cycle_span:
+            # 1. Fetch Data
+            with tracer.span("agent.fetch"):
+                data_to_analyze, tool_timings = await self._fetch_data(initial_params, shared_calls=shared_calls)
+            raw_data = data_to_analyze
+            data_text = None
+
+            # 1b. Compact raw tool results into risk features, serialized once for the prompt
+            if self.feature_extractor and data_to_analyze and "error" not in data_to_analyze:
+                with tracer.span("agent.compaction") as span:
+                    data_to_analyze = self.feature_extractor(raw_data)
+                    data_text = compact_json(data_to_analyze)
+                    report = payload_size_report(raw_data, data_to_analyze, compact_text=data_text)
+                    span.set(raw_bytes=report["raw_bytes"], compact_bytes=report["compact_bytes"])
+                compaction_report = report
+                print(f"[Agent]   - Compacted payload: {report['raw_bytes']} -> {report['compact_bytes']} bytes "
+                      f"(~{report['raw_tokens_est']} -> ~{report['compact_tokens_est']} tokens)")
+            
+            # 1c. Score the data with deterministic rules; quiet cycles skip the LLM
+            prescreen = None
+            if self.prescreen.enabled and raw_data and "error" not in raw_data:
+                with tracer.span("agent.prescreen") as span:
+                    compacted = self.feature_extractor is extract_features
+                    prescreen = self.prescreen.score(data_to_analyze if compacted else extract_features(raw_data))
+                    span.set(baseline_risk_score=prescreen.risk_score, needs_llm=prescreen.needs_llm)
+                print(f"[Agent]   - Pre-screen: baseline risk score {prescreen.risk_score}, "
+                      f"signals {prescreen.signals or 'none'}{', uncertain: ' + '; '.join(prescreen.uncertain) if prescreen.uncertain else ''}")
+
+            # 2. Analyze Data
+            with tracer.span("agent.analysis"):
+                cycle_report = await self._assess_cycle(data_to_analyze, lane_id=lane_id, prescreen=prescreen,
+                                                        data_text=data_text,
+                                                        fleet_risk=self._fleet_context(initial_params))
+            analysis_result = self._disruption_only(cycle_report)
+            # every cycle is kept, quiet ones included: the trend is in the history
+            if self.signal_store is not None and raw_data:
+                self.signal_store.record(lane_id, initial_params, raw_data,
+                                         data_to_analyze if data_to_analyze is not raw_data else None, cycle_report)
+            cycle_span.set(disruption_detected=bool(analysis_result))
         
         # 3. Report to MCP if a disruption was found
         if analysis_result:
@@ -381,6 +908,9 @@ class DisruptionDetectionAgent:
             print("[Agent] No significant disruption detected.")
             
         print("[Agent] Analysis finished.")
+        if return_details:
+            return analysis_result, {"tool_timings": tool_timings, "compaction_report": compaction_report}
+        return analysis_result
 
 
 
@@ -424,11 +954,44 @@ async def main_agent_loop():
         "cik_company": "0000320193" # Apple Inc. CIK, for financial health monitoring
     }
 
+    # Each lane is analysed on its own interval; more lanes can be loaded from config the same way.
+    lanes = [
+        Lane(lane_id="USNYC-apple", params=initial_monitoring_params),
+    ]
+
     # Create and start the agent
     disruption_agent = DisruptionDetectionAgent(
         monitor_interval_seconds=monitoring_interval_sec
     )
-    await disruption_agent.run_single_analysis(initial_params=initial_monitoring_params)
+    await disruption_agent.start()
+    # A fleet risk sweep every FLEET_RISK_INTERVAL_SECONDS ranks the lanes and
+    # expedites those scoring FLEET_RISK_EXPEDITE_AT or more ("0" disables either)
+    scheduler = LaneScheduler(
+        disruption_agent, lanes,
+        fleet_risk_interval_seconds=float(os.getenv("FLEET_RISK_INTERVAL_SECONDS", "900")),
+        expedite_at=float(os.getenv("FLEET_RISK_EXPEDITE_AT", "7")) or None,
+    )
+
+    # Stop cleanly on SIGINT/SIGTERM: in-flight cycles finish before the pool closes
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, lambda: asyncio.ensure_future(scheduler.stop()))
+        except NotImplementedError:
+            pass  # e.g. Windows; KeyboardInterrupt still cancels the loop
+
+    try:
+        await scheduler.run()
+    finally:
+        print(f"[Agent] Scheduler stats: {json.dumps(scheduler.stats())}")
+        print(f"[Agent] LLM cache stats: {json.dumps(disruption_agent.llm_cache.stats())}")
+        print(f"[Agent] Pre-screen stats: {json.dumps(disruption_agent.prescreen.stats())}")
+        print(f"[Agent] Tool schema stats: {json.dumps(disruption_agent.tool_registry.stats())}")
+        if disruption_agent.signal_store is not None:
+            print(f"[Agent] Signal store stats: {json.dumps(disruption_agent.signal_store.stats())}")
+        if disruption_agent.recorder is not None:
+            print(f"[Agent] Recorder stats: {json.dumps(disruption_agent.recorder.stats())}")
+        await disruption_agent.close()
 
 
 if __name__ == "__main__":
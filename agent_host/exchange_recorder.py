@@ -0,0 +1,414 @@
+# exchange_recorder.py
+import asyncio
+import contextvars
+import functools
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from types import SimpleNamespace
+from typing import Optional
+
+from mcp.types import CallToolResult, ListToolsResult
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from llm_json import compact_json
+
+EXCHANGE_MODES = ("off", "record", "replay", "replay-tools")
+
+# Dates in requests (history_date, "today" in prompts) are keyed as a
+# placeholder, so a recording still matches when it is replayed on a later day
+_DATE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+
+# Set by ExchangeRecorder.scope(); part of every request key recorded or replayed under it
+_scope = contextvars.ContextVar("exchange_scope", default=None)
+
+_SCHEMA = (
+    # every payload once, zlib-compressed, addressed by the sha256 of its JSON
+    "CREATE TABLE IF NOT EXISTS blobs (hash BLOB PRIMARY KEY, data BLOB NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS exchanges ("
+    " id INTEGER PRIMARY KEY,"
+    " kind TEXT NOT NULL,"
+    " scope TEXT,"
+    " request_key TEXT NOT NULL,"
+    " request_hash BLOB NOT NULL REFERENCES blobs(hash),"
+    " response_hash BLOB NOT NULL REFERENCES blobs(hash),"
+    " recorded_at REAL NOT NULL,"
+    " duration_ms REAL NOT NULL,"
+    # streamed completions: per-chunk arrival offsets in ms, as JSON
+    " chunk_offsets TEXT)",
+    "CREATE INDEX IF NOT EXISTS idx_exchanges_key ON exchanges(request_key, id)",
+)
+
+
+class ReplayMiss(LookupError):
+    """
+    Raised in replay mode for a request the archive has no recording of.
+    """
+
+
+def request_key(kind: str, request: dict, scope: str = None) -> str:
+    return hashlib.sha256(f"{scope or ''}:{kind}:{_DATE.sub('<date>', compact_json(request))}".encode()).hexdigest()
+
+
+class ExchangeArchive:
+    """
+    SQLite file of recorded exchanges. Requests and responses are stored as
+    content-addressed blobs, so the same tool result or prompt recorded a
+    thousand times takes the space of one.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        # replays read the same few payloads over and over
+        self.blob = functools.lru_cache(maxsize=1024)(self._read_blob)
+
+    def _put_blob(self, value) -> bytes:
+        data = compact_json(value).encode()
+        digest = hashlib.sha256(data).digest()
+        if self._conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone() is None:
+            self._conn.execute("INSERT INTO blobs (hash, data) VALUES (?, ?)", (digest, zlib.compress(data)))
+        return digest
+
+    def _read_blob(self, digest: bytes):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        return json.loads(zlib.decompress(row[0]))
+
+    def append(self, kind: str, scope: Optional[str], request: dict, response, duration_ms: float,
+               chunk_offsets: list = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO exchanges (kind, scope, request_key, request_hash, response_hash, recorded_at,"
+                " duration_ms, chunk_offsets) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, scope, request_key(kind, request, scope), self._put_blob(request), self._put_blob(response),
+                 time.time(), duration_ms, compact_json(chunk_offsets) if chunk_offsets is not None else None),
+            )
+
+    def index(self) -> dict:
+        """
+        request_key -> recordings (response hash, duration_ms, chunk offsets), in recording order.
+        """
+        recordings = defaultdict(list)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT request_key, response_hash, duration_ms, chunk_offsets FROM exchanges ORDER BY id").fetchall()
+        for key, response_hash, duration_ms, offsets in rows:
+            recordings[key].append((response_hash, duration_ms, json.loads(offsets) if offsets else None))
+        return dict(recordings)
+
+    def summary(self) -> dict:
+        with self._lock:
+            exchanges = dict(self._conn.execute("SELECT kind, COUNT(*) FROM exchanges GROUP BY kind").fetchall())
+            blobs, stored = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM blobs").fetchone()
+        return {"exchanges": exchanges, "blobs": blobs, "stored_bytes": stored}
+
+    def close(self):
+        self._conn.close()
+
+
+class ExchangeRecorder:
+    """
+    Records or replays every MCP tool call (and tool listing) and every chat
+    completion that goes through the wrapped session pool and LLM client.
+
+    mode "record" passes calls through and archives them; "replay" serves
+    them from the archive without touching the network; "replay-tools"
+    serves tool results from the archive but calls the live LLM (for prompt
+    tuning against fixed data). A request is matched on its content (tool
+    and arguments, or the full completion request) within its `scope`;
+    repeated identical requests get their recordings in order, wrapping
+    around.
+
+    `speed` 0 replays as fast as possible, 1 at recorded timing, 2 twice as
+    fast, and so on. Archive writes run on one worker thread, off the event loop.
+    """
+    def __init__(self, archive: ExchangeArchive, mode: str = "record", speed: float = 0.0):
+        if mode not in EXCHANGE_MODES or mode == "off":
+            raise ValueError(f"mode must be one of {EXCHANGE_MODES[1:]}, got '{mode}'")
+        self.archive = archive
+        self.mode = mode
+        self.speed = speed
+        self._index = archive.index() if mode != "record" else {}
+        self._cursors = defaultdict(int)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="exchange-archive")
+        self._pending = set()
+        self._stats = {"recorded": 0, "replayed": 0, "misses": 0, "live": 0}
+
+    @classmethod
+    def from_env(cls) -> Optional["ExchangeRecorder"]:
+        """
+        EXCHANGE_MODE is "off" (default), "record", "replay" or "replay-tools";
+        EXCHANGE_ARCHIVE is the archive path (exchanges.db) and REPLAY_SPEED
+        the replay speed (0, as fast as possible).
+        """
+        mode = os.getenv("EXCHANGE_MODE", "off").strip().lower()
+        if mode == "off":
+            return None
+        archive = ExchangeArchive(os.getenv("EXCHANGE_ARCHIVE", "exchanges.db"))
+        print(f"[Recorder] {mode} mode, archive {archive.path}")
+        return cls(archive, mode=mode, speed=float(os.getenv("REPLAY_SPEED", "0")))
+
+    @property
+    def replays_tools(self) -> bool:
+        return self.mode in ("replay", "replay-tools")
+
+    @property
+    def replays_llm(self) -> bool:
+        return self.mode == "replay"
+
+    def wrap_session_pool(self, session_pool) -> "RecordingSessionPool":
+        return RecordingSessionPool(session_pool, self)
+
+    def wrap_llm_client(self, llm_client) -> "RecordingLLMClient":
+        return RecordingLLMClient(llm_client, self)
+
+    @contextmanager
+    def scope(self, name: str):
+        """
+        Keys every exchange inside the block (in this task and the tasks it
+        starts) to `name`. Scenarios recorded under distinct scopes replay
+        exactly even when they run concurrently and repeat the same requests.
+        """
+        token = _scope.set(name)
+        try:
+            yield
+        finally:
+            _scope.reset(token)
+
+    def record(self, kind: str, request: dict, response, duration_ms: float, chunk_offsets: list = None,
+               scoped: bool = True):
+        self._stats["recorded"] += 1
+        # the scope is read here: the writer thread does not see this task's context
+        future = asyncio.get_running_loop().run_in_executor(
+            self._writer, self.archive.append, kind, _scope.get() if scoped else None, request, response, duration_ms,
+            chunk_offsets)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+
+    def lookup(self, kind: str, request: dict, scoped: bool = True):
+        """
+        The next recording for `request`: (response, duration_ms, chunk_offsets).
+        """
+        key = request_key(kind, request, _scope.get() if scoped else None)
+        recordings = self._index.get(key)
+        if not recordings:
+            self._stats["misses"] += 1
+            raise ReplayMiss(f"No recorded {kind} exchange for {compact_json(request)[:200]}")
+        response_hash, duration_ms, offsets = recordings[self._cursors[key] % len(recordings)]
+        self._cursors[key] += 1
+        self._stats["replayed"] += 1
+        return self.archive.blob(response_hash), duration_ms, offsets
+
+    def note_live_call(self):
+        self._stats["live"] += 1
+
+    async def pace(self, duration_ms: float):
+        if self.speed > 0 and duration_ms:
+            await asyncio.sleep(duration_ms / 1000 / self.speed)
+
+    async def flush(self):
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+    async def close(self):
+        await self.flush()
+        self._writer.shutdown(wait=True)
+        self.archive.close()
+
+    def stats(self) -> dict:
+        return {**self._stats, "mode": self.mode, "speed": self.speed}
+
+
+class _RecordingSession:
+    """
+    A ClientSession stand-in whose list_tools/call_tool go through the recorder;
+    in replay modes there is no real session behind it.
+    """
+    def __init__(self, session, recorder: ExchangeRecorder):
+        self._session = session
+        self._recorder = recorder
+
+    async def list_tools(self, cursor=None):
+        # the tool listing belongs to the server, not to whichever scenario happened to ask first
+        return await self._exchange("list_tools", {"cursor": cursor}, ListToolsResult,
+                                    lambda: self._session.list_tools(cursor) if cursor else self._session.list_tools(),
+                                    scoped=False)
+
+    async def call_tool(self, tool_name: str, tool_args: dict = None):
+        return await self._exchange("call_tool", {"name": tool_name, "arguments": tool_args or {}}, CallToolResult,
+                                    lambda: self._session.call_tool(tool_name, tool_args))
+
+    async def _exchange(self, kind, request, model, call, scoped=True):
+        recorder = self._recorder
+        if recorder.replays_tools:
+            response, duration_ms, _ = recorder.lookup(kind, request, scoped=scoped)
+            await recorder.pace(duration_ms)
+            return model.model_validate(response)
+        started = time.perf_counter()
+        result = await call()
+        recorder.record(kind, request, result.model_dump(mode="json"), (time.perf_counter() - started) * 1000,
+                        scoped=scoped)
+        return result
+
+    def __getattr__(self, name):
+        if self._session is None:
+            raise AttributeError(f"'{name}' is not available while replaying tool calls")
+        return getattr(self._session, name)
+
+
+class RecordingSessionPool:
+    """
+    MCPSessionPool wrapper; see ExchangeRecorder. While replaying tools the
+    real pool is never started, so no MCP server is needed.
+    """
+    def __init__(self, session_pool, recorder: ExchangeRecorder):
+        self.session_pool = session_pool
+        self.recorder = recorder
+
+    async def start(self):
+        if not self.recorder.replays_tools:
+            await self.session_pool.start()
+
+    async def close(self):
+        await self.session_pool.close()
+
+    @asynccontextmanager
+    async def session(self):
+        if self.recorder.replays_tools:
+            yield _RecordingSession(None, self.recorder)
+            return
+        async with self.session_pool.session() as session:
+            yield _RecordingSession(session, self.recorder)
+
+    async def call_tool(self, tool_name: str, tool_args: dict):
+        # through the pool's own call_tool, so recording keeps its reconnect-and-retry
+        proxy = _RecordingSession(SimpleNamespace(call_tool=self.session_pool.call_tool), self.recorder)
+        return await proxy.call_tool(tool_name, tool_args)
+
+    def stats(self) -> dict:
+        return {**self.session_pool.stats(), "recorder": self.recorder.stats()}
+
+    def __getattr__(self, name):
+        return getattr(self.session_pool, name)
+
+
+class _ReplayStream:
+    """
+    Async iterator over recorded completion chunks, paced by their recorded offsets.
+    """
+    def __init__(self, chunks: list, offsets: list, recorder: ExchangeRecorder):
+        self._chunks = chunks
+        self._offsets = offsets or [0.0] * len(chunks)
+        self._recorder = recorder
+        self._position = 0
+        self._previous_ms = 0.0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._position >= len(self._chunks):
+            raise StopAsyncIteration
+        offset = self._offsets[self._position]
+        await self._recorder.pace(offset - self._previous_ms)
+        self._previous_ms = offset
+        chunk = ChatCompletionChunk.model_validate(self._chunks[self._position])
+        self._position += 1
+        return chunk
+
+    async def close(self):
+        pass
+
+
+class _RecordingStream:
+    """
+    Passes a live completion stream through, then archives its chunks.
+    """
+    def __init__(self, stream, request: dict, recorder: ExchangeRecorder, started: float):
+        self._stream = stream
+        self._request = request
+        self._recorder = recorder
+        self._started = started
+        self._chunks = []
+        self._offsets = []
+        self._recorded = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            chunk = await self._stream.__anext__()
+        except StopAsyncIteration:
+            self._finish()
+            raise
+        self._chunks.append(chunk.model_dump(mode="json"))
+        self._offsets.append(round((time.perf_counter() - self._started) * 1000, 3))
+        return chunk
+
+    def _finish(self):
+        if not self._recorded:
+            self._recorded = True
+            self._recorder.record("chat_completion", self._request, self._chunks,
+                                  (time.perf_counter() - self._started) * 1000, chunk_offsets=self._offsets)
+
+    async def close(self):
+        # a stream abandoned half-way is not a complete recording
+        await self._stream.close()
+
+
+class _RecordingCompletions:
+    def __init__(self, llm_client, recorder: ExchangeRecorder):
+        self._llm_client = llm_client
+        self._recorder = recorder
+
+    async def create(self, **kwargs):
+        recorder = self._recorder
+        request = {key: value for key, value in kwargs.items() if key not in ("timeout", "extra_headers")}
+        if recorder.replays_llm:
+            response, duration_ms, offsets = recorder.lookup("chat_completion", request)
+            if kwargs.get("stream"):
+                return _ReplayStream(response, offsets, recorder)
+            await recorder.pace(duration_ms)
+            return ChatCompletion.model_validate(response)
+
+        started = time.perf_counter()
+        response = await self._llm_client.chat.completions.create(**kwargs)
+        if recorder.mode == "replay-tools":
+            recorder.note_live_call()
+            return response
+        if kwargs.get("stream"):
+            return _RecordingStream(response, request, recorder, started)
+        recorder.record("chat_completion", request, response.model_dump(mode="json"),
+                        (time.perf_counter() - started) * 1000)
+        return response
+
+
+class RecordingLLMClient:
+    """
+    AsyncOpenAI wrapper; see ExchangeRecorder. Only chat.completions.create
+    is intercepted.
+    """
+    def __init__(self, llm_client, recorder: ExchangeRecorder):
+        self.llm_client = llm_client
+        self.chat = SimpleNamespace(completions=_RecordingCompletions(llm_client, recorder))
+
+    async def close(self):
+        await self.llm_client.close()
+
+    def __getattr__(self, name):
+        return getattr(self.llm_client, name)
@@ -0,0 +1,298 @@
+# fleet_features.py
+import os
+import re
+from operator import itemgetter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from risk_features import congestion_features_from_payload, decode_content
+from risk_prescreen import CONGESTED_LEVELS, PrescreenThresholds
+from tool_planner import KNOWN_PORTS
+
+# Hourly fields packed per location: forecast hours, then marine hours
+FORECAST_FIELDS = ("wind_kph", "gust_kph", "pressure_mb", "precip_mm")
+MARINE_FIELDS = ("sig_ht_mt", "swell_ht_mt")
+
+_LOCODE = re.compile(r"^[A-Z]{2}[A-Z2-9]{3}$")
+
+
+@dataclass
+class FleetRiskTable:
+    """
+    One row per location, one NumPy column per feature. `risk_score` uses
+    the pre-screen's weights (alert 4, wind/gusts 2.5, waves/swell 2.5,
+    congestion 3, capped at 10); `complete` is False when the location's
+    forecast or marine data was missing.
+    """
+    locations: List[str]
+    port_codes: List[Optional[str]]
+    columns: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    @property
+    def risk_scores(self) -> np.ndarray:
+        return self.columns["risk_score"]
+
+    def order(self) -> np.ndarray:
+        """
+        Row indices, riskiest first: by risk score, then hours over the wind
+        threshold, then peak gust.
+        """
+        def descending(values):
+            return -np.nan_to_num(values.astype(float), nan=-np.inf)
+        return np.lexsort((descending(self.columns["peak_gust_kph"]),
+                           descending(self.columns["wind_exceed_hours"]),
+                           descending(self.columns["risk_score"])))
+
+    def to_compact(self, top: int = None, digits: int = 1, include=()) -> dict:
+        """
+        The table for a prompt: column names once, then one row per location,
+        riskiest first, numbers rounded and NaN as null. With `top`, only the
+        riskiest rows plus those of the port codes in `include`.
+        """
+        names = list(self.columns)
+        order = self.order()
+        if top is not None:
+            include = set(include)
+            order = [index for rank, index in enumerate(order.tolist())
+                     if rank < top or self.port_codes[index] in include]
+        rows = []
+        for index in order:
+            row = [self.locations[index], self.port_codes[index]]
+            for name in names:
+                value = self.columns[name][index].item()
+                if isinstance(value, float):
+                    # + 0.0 turns a rounded -0.0 into 0.0
+                    value = None if value != value else round(value, digits) + 0.0
+                row.append(value)
+            rows.append(row)
+        return {"columns": ["location", "port_code"] + names, "rows": rows}
+
+    def scores_by_port(self) -> Dict[str, float]:
+        """
+        Risk score per port code, for LaneScheduler.update_risk.
+        """
+        scores = {}
+        for port_code, score in zip(self.port_codes, self.risk_scores.tolist()):
+            if port_code:
+                scores[port_code] = max(score, scores.get(port_code, 0.0))
+        return scores
+
+
+def _hour_rows(days: list) -> list:
+    return [hour for day in days for hour in day.get("hour") or []]
+
+
+class _Packer:
+    """
+    Collects hourly fields location by location (while that location's
+    dicts are still in cache), then packs them into one NaN-padded
+    (locations, hours, fields) array with a single conversion per field.
+    """
+    def __init__(self, fields: tuple):
+        self.fields = fields
+        self.getters = [itemgetter(name) for name in fields]
+        self.values = [[] for _ in fields]
+        self.lengths = []
+
+    def add(self, hours: list):
+        for name, getter, values in zip(self.fields, self.getters, self.values):
+            start = len(values)
+            try:
+                values.extend(map(getter, hours))
+            except KeyError:
+                # an hour without the field: redo this location tolerating it
+                del values[start:]
+                values.extend(hour.get(name) for hour in hours)
+        self.lengths.append(len(hours))
+
+    def pack(self) -> np.ndarray:
+        lengths = np.array(self.lengths, dtype=np.intp)
+        packed = np.full((len(lengths), int(lengths.max(initial=0)), len(self.fields)), np.nan)
+        if lengths.sum():
+            location = np.repeat(np.arange(len(lengths)), lengths)
+            hour = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            for index, values in enumerate(self.values):
+                # None -> NaN on conversion
+                packed[location, hour, index] = np.array(values, dtype=float)
+        return packed
+
+
+def _peak(values: np.ndarray) -> np.ndarray:
+    # fmax skips NaN without nanmax's all-NaN warning; rows with no data come out -inf
+    return np.fmax.reduce(values, axis=1, initial=-np.inf)
+
+
+def _slope(values: np.ndarray) -> np.ndarray:
+    """
+    Least-squares slope per row over the hour index, ignoring NaN hours.
+    """
+    valid = ~np.isnan(values)
+    x = np.broadcast_to(np.arange(values.shape[1], dtype=float), values.shape)
+    y = np.where(valid, values, 0.0)
+    n = valid.sum(axis=1)
+    sx = np.where(valid, x, 0.0).sum(axis=1)
+    sy = y.sum(axis=1)
+    sxx = np.where(valid, x * x, 0.0).sum(axis=1)
+    sxy = (np.where(valid, x, 0.0) * y).sum(axis=1)
+    denominator = n * sxx - sx * sx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, (n * sxy - sx * sy) / denominator, np.nan)
+
+
+class FleetFeatureEngine:
+    """
+    Reduces hourly weather, marine and congestion data for many locations in
+    one vectorized pass: windowed maxima, threshold-exceedance hours and
+    trend slopes, without sending the hourly arrays to an LLM.
+
+    Only reading the values out of the JSON is per location; every reduction
+    runs over a single (locations, hours, fields) array.
+    """
+    def __init__(self, thresholds: PrescreenThresholds = None, windows_hours=(24,)):
+        """
+        Args:
+            thresholds (PrescreenThresholds): Exceedance thresholds, shared with
+                the pre-screen. From the PRESCREEN_* env vars when not given.
+            windows_hours (tuple): Leading windows for extra peak columns, e.g.
+                24 adds peak_wind_kph_24h; the full horizon is always covered.
+        """
+        self.thresholds = thresholds or PrescreenThresholds.from_env()
+        self.windows_hours = tuple(windows_hours)
+
+    @classmethod
+    def from_env(cls) -> "FleetFeatureEngine":
+        """
+        FLEET_RISK_WINDOWS_HOURS (comma-separated, default "24") sets the
+        leading windows; thresholds come from the PRESCREEN_* env vars.
+        """
+        windows = os.getenv("FLEET_RISK_WINDOWS_HOURS", "24")
+        return cls(windows_hours=tuple(int(hours) for hours in windows.split(",") if hours.strip()))
+
+    def compute(self, weather: Dict[str, dict], congestion: Dict[str, Any] = None,
+                port_codes: Dict[str, str] = None) -> FleetRiskTable:
+        """
+        Args:
+            weather: location -> get_weather sections ("forecast", "marine",
+                "alerts", optionally "section_status"), as in get_weather_batch results.
+            congestion: location -> raw congestion payload, same keys.
+            port_codes: location -> UN/LOCODE where the key is not one itself.
+        """
+        congestion = congestion or {}
+        port_codes = port_codes or {}
+        locations = list(dict.fromkeys([*weather, *congestion]))
+        t = self.thresholds
+
+        forecast, marine, alerts, complete = self._extract(weather, locations)
+        wind, gust, pressure, precip = (forecast[:, :, i] for i in range(len(FORECAST_FIELDS)))
+        wave, swell = (marine[:, :, i] for i in range(len(MARINE_FIELDS)))
+
+        columns = {}
+        for hours in self.windows_hours:
+            columns[f"peak_wind_kph_{hours}h"] = _peak(wind[:, :hours])
+            columns[f"peak_gust_kph_{hours}h"] = _peak(gust[:, :hours])
+        columns["peak_wind_kph"] = _peak(wind)
+        columns["peak_gust_kph"] = _peak(gust)
+        columns["wind_exceed_hours"] = ((wind >= t.wind_kph) | (gust >= t.gust_kph)).sum(axis=1)
+        columns["wind_trend_kph_per_h"] = _slope(wind)
+        columns["pressure_trend_mb_per_h"] = _slope(pressure)
+        columns["total_precip_mm"] = np.where(np.isnan(precip), 0.0, precip).sum(axis=1)
+        columns["max_wave_m"] = _peak(wave)
+        columns["max_swell_m"] = _peak(swell)
+        columns["wave_exceed_hours"] = ((wave >= t.wave_height_m) | (swell >= t.swell_height_m)).sum(axis=1)
+        columns["alerts"] = alerts
+        for name, values in columns.items():
+            if values.dtype.kind == "f":
+                values[np.isinf(values)] = np.nan
+
+        wait, anchored, congested = self._congestion(locations, congestion)
+        columns["wait_hours"] = wait
+        columns["vessels_at_anchor"] = anchored
+        columns["congested"] = congested | (np.nan_to_num(wait, nan=0.0) >= t.congestion_wait_hours)
+        columns["complete"] = complete
+
+        windy = (np.nan_to_num(columns["peak_wind_kph"], nan=0.0) >= t.wind_kph) | \
+                (np.nan_to_num(columns["peak_gust_kph"], nan=0.0) >= t.gust_kph)
+        rough = (np.nan_to_num(columns["max_wave_m"], nan=0.0) >= t.wave_height_m) | \
+                (np.nan_to_num(columns["max_swell_m"], nan=0.0) >= t.swell_height_m)
+        columns["risk_score"] = np.minimum(
+            10.0, 4.0 * (columns["alerts"] > 0) + 2.5 * windy + 2.5 * rough + 3.0 * columns["congested"])
+
+        return FleetRiskTable(
+            locations=locations,
+            port_codes=[port_codes.get(location) or (location if _LOCODE.match(location) else None)
+                        for location in locations],
+            columns=columns,
+        )
+
+    @staticmethod
+    def _extract(weather: dict, locations: list):
+        """
+        The only per-location part of the weather: pulls the hourly values
+        out of the JSON into packed arrays.
+        """
+        forecast, marine, alerts, complete = _Packer(FORECAST_FIELDS), _Packer(MARINE_FIELDS), [], []
+        for location in locations:
+            sections = weather.get(location) or {}
+            forecast_hours = _hour_rows(((sections.get("forecast") or {}).get("forecast") or {})
+                                        .get("forecastday") or [])
+            marine_hours = _hour_rows(((sections.get("marine") or {}).get("forecast") or {})
+                                      .get("forecastday") or [])
+            forecast.add(forecast_hours)
+            marine.add(marine_hours)
+            alerts.append(len(((sections.get("alerts") or {}).get("alerts") or {}).get("alert") or []))
+            complete.append(bool(forecast_hours) and bool(marine_hours))
+        return forecast.pack(), marine.pack(), np.array(alerts, dtype=np.int64), np.array(complete, dtype=bool)
+
+    @staticmethod
+    def _congestion(locations: list, congestion: dict):
+        wait = np.full(len(locations), np.nan)
+        anchored = np.full(len(locations), np.nan)
+        congested = np.zeros(len(locations), dtype=bool)
+        for index, location in enumerate(locations):
+            if location not in congestion:
+                continue
+            features = congestion_features_from_payload(congestion[location])
+            waits = [v for path, v in features.metrics.items() if "wait" in path.lower()]
+            anchors = [v for path, v in features.metrics.items() if "anchor" in path.lower()]
+            wait[index] = max(waits, default=np.nan)
+            anchored[index] = max(anchors, default=np.nan)
+            congested[index] = str(features.level or "").lower() in CONGESTED_LEVELS
+        return wait, anchored, congested
+
+    def from_batch_results(self, weather_batches=None, congestion_batches=None,
+                           port_codes: Dict[str, str] = None) -> FleetRiskTable:
+        """
+        The table for raw (model_dump()-ed) get_weather_batch /
+        get_port_congestion_batch MCP results, one result or a list of them.
+        Cities are keyed by their port code, from `port_codes` (city ->
+        UN/LOCODE) or the known ports, so weather and congestion for the same
+        port share a row. Failed results and locations are left out.
+        """
+        weather, congestion, row_ports = {}, {}, {}
+        port_codes = {city.strip().lower(): code for city, code in (port_codes or {}).items()}
+        for city, sections in _batch_results(weather_batches).items():
+            known = KNOWN_PORTS.get(city.strip().lower())
+            port_code = port_codes.get(city.strip().lower()) or (known[1] if known else None)
+            key = port_code or city
+            weather[key] = sections if isinstance(sections, dict) else {}
+            if port_code:
+                row_ports[key] = port_code
+        for port_code, value in _batch_results(congestion_batches).items():
+            congestion[port_code.upper()] = value
+        return self.compute(weather, congestion, row_ports)
+
+
+def _batch_results(batches) -> dict:
+    if isinstance(batches, dict):
+        batches = [batches]
+    results = {}
+    for batch in batches or ():
+        payload = next(iter(decode_content(batch)), None) if isinstance(batch, dict) else None
+        if isinstance(payload, dict) and isinstance(payload.get("results"), dict):
+            results.update(payload["results"])
+    return results
@@ -0,0 +1,133 @@
+# handoffs.py
+"""
+Typed payloads passed between the agents of a workflow.
+
+DisruptionDetectionAgent reports carry a `data_for_impact_agent` and a
+`data_for_response_agent` section; they are validated into ImpactHandoff and
+ResponseHandoff here instead of being passed on as loose dicts, and the
+downstream agents reply with an ImpactAssessment and a ResponsePlan.
+"""
+import re
+from typing import Annotated, List, Literal, Optional
+
+from pydantic import BaseModel, BeforeValidator, Field, field_validator
+
+EVENT_TYPES = ("weather", "geopolitical", "congestion", "supplier_financial", "other")
+SEVERITIES = ("low", "medium", "high", "critical")
+
+_INT = re.compile(r"-?\d+")
+
+
+def _as_int(value) -> int:
+    """
+    LLMs write durations as 3, "3", "2-3 days" or null; take the first integer.
+    """
+    if value is None or isinstance(value, bool):
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = _INT.search(str(value))
+    return int(match.group()) if match else 0
+
+
+def _as_list(value) -> list:
+    if not value:
+        return []
+    if isinstance(value, (str, dict)):
+        return [value]
+    return [v for v in value if v not in (None, "")]
+
+
+def _as_str_list(value) -> List[str]:
+    return [str(v) for v in _as_list(value)]
+
+
+LooseInt = Annotated[int, BeforeValidator(_as_int)]
+StrList = Annotated[List[str], BeforeValidator(_as_str_list)]
+
+
+class ImpactHandoff(BaseModel):
+    """
+    What the impact agent needs from a disruption report.
+    """
+    affected_port_codes: StrList = Field(default_factory=list)
+    expected_duration_days: LooseInt = 0
+    triggering_event_type: Literal[EVENT_TYPES] = "other"
+    risk_score: float = 0.0
+    summary: str = ""
+
+    @field_validator("triggering_event_type", mode="before")
+    @classmethod
+    def _known_event_type(cls, value):
+        value = str(value or "").strip().lower()
+        return value if value in EVENT_TYPES else "other"
+
+    @classmethod
+    def from_report(cls, report: dict) -> "ImpactHandoff":
+        return cls(**{**(report.get("data_for_impact_agent") or {}),
+                      "risk_score": report.get("risk_score") or 0.0, "summary": report.get("summary") or ""})
+
+
+class ImpactAssessment(BaseModel):
+    """
+    The impact agent's reply.
+    """
+    severity: Literal[SEVERITIES] = "medium"
+    estimated_delay_days: LooseInt = 0
+    estimated_cost_usd: Optional[float] = None
+    affected_port_codes: StrList = Field(default_factory=list)
+    affected_suppliers: StrList = Field(default_factory=list)
+    key_impacts: StrList = Field(default_factory=list)
+    summary: str = ""
+
+    @field_validator("severity", mode="before")
+    @classmethod
+    def _known_severity(cls, value):
+        value = str(value or "").strip().lower()
+        return value if value in SEVERITIES else "medium"
+
+
+class ResponseHandoff(BaseModel):
+    """
+    What the response agent needs: the report's `data_for_response_agent`,
+    and the impact assessment when the workflow ran one first.
+    """
+    immediate_actions_recommended: StrList = Field(default_factory=list)
+    critical_skus_at_risk: StrList = Field(default_factory=list)
+    risk_score: float = 0.0
+    summary: str = ""
+    impact: Optional[ImpactAssessment] = None
+
+    @classmethod
+    def from_report(cls, report: dict, impact: ImpactAssessment = None) -> "ResponseHandoff":
+        return cls(**{**(report.get("data_for_response_agent") or {}),
+                      "risk_score": report.get("risk_score") or 0.0, "summary": report.get("summary") or "",
+                      "impact": impact})
+
+
+class ResponseAction(BaseModel):
+    action: str
+    owner: str = "logistics"
+    priority: Literal["immediate", "24h", "week"] = "24h"
+
+    @field_validator("priority", mode="before")
+    @classmethod
+    def _known_priority(cls, value):
+        value = str(value or "").strip().lower()
+        return value if value in ("immediate", "24h", "week") else "24h"
+
+
+class ResponsePlan(BaseModel):
+    """
+    The response agent's reply.
+    """
+    actions: List[ResponseAction] = Field(default_factory=list)
+    notify: StrList = Field(default_factory=list)
+    summary: str = ""
+
+    @field_validator("actions", mode="before")
+    @classmethod
+    def _plain_actions(cls, value):
+        # a bare list of strings is a plan too
+        return [{"action": item} if isinstance(item, str) else item for item in _as_list(value)]
+
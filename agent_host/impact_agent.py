@@ -0,0 +1,136 @@
+# impact_agent.py
+import asyncio
+import os
+
+from openai import AsyncOpenAI
+from pydantic import ValidationError
+
+from handoffs import ImpactAssessment, ImpactHandoff
+from llm_json import compact_json, extract_json_object
+from mcp_session_pool import MCPSessionPool
+from risk_features import extract_features
+from tracing import tracer
+
+
+class ImpactAssessmentAgent:
+    """
+    Estimates the financial and logistical impact of a detected disruption.
+
+    Split in two so a workflow can overlap it with detection: `prefetch`
+    gathers supplier and company data (news, SEC filings), which does not
+    depend on the disruption report, and `assess` combines it with the
+    detection agent's ImpactHandoff once that exists.
+    """
+    def __init__(self, session_pool=None, llm_client=None, tool_timeout_seconds=30):
+        """
+        Args:
+            session_pool (MCPSessionPool): Shared pool of MCP sessions. A private
+                pool is created when none is given.
+            llm_client (AsyncOpenAI): Shared LLM client. A private client is
+                created, and closed by `close()`, when none is given.
+            tool_timeout_seconds (float): Deadline for a single MCP tool call.
+        """
+        self.client = llm_client or AsyncOpenAI(
+            api_key=os.getenv("PERPLEXITY_API_KEY"),
+            base_url=os.getenv("PERPLEXITY_BASE_URL", "https://api.perplexity.ai")
+        )
+        self._owns_llm_client = llm_client is None
+        self.model = "sonar"
+        self.session_pool = session_pool or MCPSessionPool(os.getenv("MCP_URL", "http://127.0.0.1:8001/mcp"))
+        self._owns_session_pool = session_pool is None
+        self.tool_timeout_seconds = tool_timeout_seconds
+
+    async def close(self):
+        if self._owns_session_pool:
+            await self.session_pool.close()
+        if self._owns_llm_client:
+            await self.client.close()
+
+    async def _call_tool(self, tool_name, tool_args):
+        with tracer.span("mcp.tool_call", tool=tool_name) as span:
+            try:
+                result = await asyncio.wait_for(self.session_pool.call_tool(tool_name, tool_args),
+                                                timeout=self.tool_timeout_seconds)
+                if result.isError:
+                    span.fail("tool_error")
+                return result.model_dump()
+            except Exception as e:
+                span.fail(type(e).__name__)
+                print(f"[Impact]   - Tool '{tool_name}' failed: {e}")
+                return {"error": f"Tool '{tool_name}' failed", "details": str(e)}
+
+    async def prefetch(self, params: dict) -> dict:
+        """
+        Fetches supplier / company intelligence for `params` (the orchestrator's
+        parsed_data) and returns it as risk features. Empty when the params
+        name no supplier, company or CIK.
+        """
+        names = []
+        for key in ("suppliers", "companies_involved"):
+            value = params.get(key) or []
+            names += [value] if isinstance(value, str) else [str(v) for v in value if v]
+        names = list(dict.fromkeys(names))
+        cik = params.get("cik_company") or params.get("cik")
+
+        calls = {}
+        if names:
+            calls["get_news"] = {"news": [f"{name} {topic}" for name in names for topic in ("production", "financial")]}
+        if cik and str(cik).strip().isdigit():
+            calls["get_sec_filing"] = {"cik_company": str(cik).strip()}
+        if not calls:
+            return {}
+
+        print(f"[Impact] Prefetching supplier data for {names or [cik]}...")
+        results = await asyncio.gather(*(self._call_tool(name, args) for name, args in calls.items()))
+        return extract_features(dict(zip(calls, results)))
+
+    async def assess(self, handoff: ImpactHandoff, supplier_data: dict = None, params: dict = None) -> ImpactAssessment:
+        """
+        Asks the LLM for the impact of the disruption described by `handoff`.
+
+        Returns:
+            ImpactAssessment or None if the LLM response was unusable.
+        """
+        system_prompt = """
+            You are the impact assessment agent of a supply chain resilience system. You receive a disruption handoff from the detection agent (affected ports, expected duration, trigger, risk score), the customer's supply chain details and recent supplier intelligence.
+            Estimate the financial and logistical impact on this customer's supply chain. Be concrete and concise.
+
+            Your entire output must be a single, valid JSON object:
+            {
+            "severity": "<one of 'low', 'medium', 'high', 'critical'>",
+            "estimated_delay_days": <integer>,
+            "estimated_cost_usd": <number or null>,
+            "affected_port_codes": ["<port codes>"],
+            "affected_suppliers": ["<suppliers exposed to the disruption>"],
+            "key_impacts": ["<the most important impacts>"],
+            "summary": "<one sentence>"
+            }
+
+            your output should start with {
+            """
+        user_input = compact_json({
+            "handoff": handoff.model_dump(),
+            "supply_chain": params or {},
+            "supplier_intelligence": supplier_data or {},
+        })
+
+        raw_output = None
+        try:
+            with tracer.span("impact.llm", prompt_bytes=len(system_prompt) + len(user_input)) as span:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_input}
+                    ],
+                    temperature=0.1,
+                    max_tokens=500,
+                )
+                span.set_usage(response)
+            raw_output = response.choices[0].message.content
+            assessment = ImpactAssessment.model_validate(extract_json_object(raw_output))
+        except (ValueError, ValidationError) as e:
+            print(f"[Impact] Unusable impact assessment from the LLM: {e}. Response: {raw_output}")
+            return None
+        print(f"[Impact] Severity {assessment.severity}, ~{assessment.estimated_delay_days} day(s) of delay.")
+        return assessment
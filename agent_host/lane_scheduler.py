@@ -0,0 +1,284 @@
+# lane_scheduler.py
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from tool_planner import port_code_for
+
+
+@dataclass
+class Lane:
+    """
+    One monitored port/supplier lane.
+
+    lane_id: Stable identifier, e.g. "USBAL-foxconn".
+    params: The structured params handed to run_single_analysis.
+    interval_seconds: Seconds between cycles; defaults to the agent's
+        monitor_interval_seconds.
+    """
+    lane_id: str
+    params: dict
+    interval_seconds: float = None
+
+
+@dataclass
+class _LaneState:
+    lane: Lane
+    next_run: float
+    running: bool = False
+    risk_score: float = 0.0
+    cycles: int = 0
+    errors: int = 0
+    skipped_overlaps: int = 0
+    last_latency_ms: float = 0.0
+    max_latency_ms: float = 0.0
+    total_latency_ms: float = 0.0
+    latencies_ms: List[float] = field(default_factory=list)
+
+
+class _AdaptiveLimit:
+    """
+    Concurrency limit that can shrink and grow while permits are held
+    (additive increase, multiplicative decrease).
+    """
+    def __init__(self, maximum: int):
+        self.maximum = maximum
+        self.limit = maximum
+        self.in_flight = 0
+        self._changed = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._changed:
+            self.in_flight -= 1
+            self._changed.notify_all()
+
+    async def decrease(self):
+        async with self._changed:
+            self.limit = max(1, self.limit // 2)
+
+    async def increase(self):
+        async with self._changed:
+            if self.limit < self.maximum:
+                self.limit += 1
+                self._changed.notify_all()
+
+
+class LaneScheduler:
+    """
+    Runs DisruptionDetectionAgent analyses for many lanes, each on its own
+    jittered interval.
+
+    Every tick, the lanes that are due start together and share a per-tick
+    tool-call table, so two lanes needing the same call (e.g. Baltimore
+    weather) make it once. A global limit caps concurrent analyses and backs
+    off when cycles get slow or fail, then recovers one slot per healthy cycle.
+
+    With a fleet risk interval, a sweep periodically refreshes the agent's
+    fleet-wide risk table (one batched weather and congestion fetch for all
+    lanes) and applies it with update_risk: due lanes start riskiest first
+    and high-risk lanes are expedited.
+    """
+    def __init__(self, agent, lanes: List[Lane], max_concurrent_analyses: int = 8, jitter_ratio: float = 0.1,
+                 tick_seconds: float = 1.0, slow_cycle_seconds: float = 120.0,
+                 fleet_risk_interval_seconds: float = None, expedite_at: float = None):
+        """
+        Args:
+            agent (DisruptionDetectionAgent): Agent shared by every lane.
+            lanes (list[Lane]): Lanes to monitor.
+            max_concurrent_analyses (int): Global cap on analyses in flight.
+            jitter_ratio (float): Each interval is randomized by +/- this fraction
+                so lanes with equal intervals do not fire in lockstep.
+            tick_seconds (float): How often due lanes are collected.
+            slow_cycle_seconds (float): A cycle slower than this counts as
+                upstream/LLM pressure and halves the concurrency limit.
+            fleet_risk_interval_seconds (float): Seconds between fleet risk sweeps
+                (agent.refresh_fleet_risk); None or 0 disables them.
+            expedite_at (float): Fleet risk score at which a lane runs right away
+                instead of waiting out its interval; None never expedites.
+        """
+        self.agent = agent
+        self.jitter_ratio = jitter_ratio
+        self.tick_seconds = tick_seconds
+        self.slow_cycle_seconds = slow_cycle_seconds
+        self._limit = _AdaptiveLimit(max_concurrent_analyses)
+        self._stopping = asyncio.Event()
+        self._tasks = set()
+        self._ticks = 0
+        self.fleet_risk_interval_seconds = fleet_risk_interval_seconds
+        self.expedite_at = expedite_at
+        self._next_fleet_refresh = time.monotonic()
+        self._fleet_task = None
+        self._fleet_refreshes = 0
+        self._expedited = 0
+
+        now = time.monotonic()
+        self._lanes: Dict[str, _LaneState] = {}
+        for lane in lanes:
+            # spread the first run over one jitter window instead of a thundering herd
+            first_delay = random.uniform(0, self._interval(lane) * self.jitter_ratio)
+            self._lanes[lane.lane_id] = _LaneState(lane=lane, next_run=now + first_delay)
+
+    def _interval(self, lane: Lane) -> float:
+        return lane.interval_seconds or self.agent.monitor_interval_seconds
+
+    def _next_run(self, lane: Lane, now: float) -> float:
+        interval = self._interval(lane)
+        jitter = interval * self.jitter_ratio
+        return now + interval + random.uniform(-jitter, jitter)
+
+    async def run(self):
+        """
+        Schedules lanes until stop() is called, then waits for in-flight cycles.
+        """
+        print(f"[Scheduler] Monitoring {len(self._lanes)} lane(s), max {self._limit.maximum} concurrent analyses.")
+        try:
+            while not self._stopping.is_set():
+                self._start_fleet_refresh()
+                self._dispatch_due_lanes()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.tick_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self._drain()
+            print("[Scheduler] Stopped.")
+
+    def _start_fleet_refresh(self):
+        if not self.fleet_risk_interval_seconds or time.monotonic() < self._next_fleet_refresh:
+            return
+        if self._fleet_task is not None and not self._fleet_task.done():
+            return
+        self._next_fleet_refresh = time.monotonic() + self.fleet_risk_interval_seconds
+        self._fleet_task = asyncio.create_task(self._refresh_fleet_risk())
+        self._tasks.add(self._fleet_task)
+        self._fleet_task.add_done_callback(self._tasks.discard)
+
+    async def _refresh_fleet_risk(self):
+        try:
+            table = await self.agent.refresh_fleet_risk([state.lane.params for state in self._lanes.values()])
+        except Exception as e:
+            print(f"[Scheduler] Fleet risk sweep failed: {e}")
+            return
+        if table is None:
+            return
+        self._fleet_refreshes += 1
+        self._expedited += len(self.update_risk(table.scores_by_port(), expedite_at=self.expedite_at))
+        # expedited lanes start now, not on the next tick
+        if not self._stopping.is_set():
+            self._dispatch_due_lanes()
+
+    def _dispatch_due_lanes(self):
+        now = time.monotonic()
+        due = [state for state in self._lanes.values() if state.next_run <= now]
+        if not due:
+            return
+
+        self._ticks += 1
+        shared_calls = {}  # tool call key -> task, shared by this tick's lanes only
+        # riskiest first, so they get the concurrency slots when there are not enough
+        due.sort(key=lambda state: state.risk_score, reverse=True)
+        for state in due:
+            state.next_run = self._next_run(state.lane, now)
+            if state.running:
+                state.skipped_overlaps += 1
+                continue
+            state.running = True
+            task = asyncio.create_task(self._run_lane(state, shared_calls))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_lane(self, state: _LaneState, shared_calls: dict):
+        await self._limit.acquire()
+        started = time.perf_counter()
+        failed = False
+        try:
+            await self.agent.run_single_analysis(initial_params=state.lane.params, shared_calls=shared_calls,
+                                                  lane_id=state.lane.lane_id)
+        except Exception as e:
+            failed = True
+            state.errors += 1
+            print(f"[Scheduler] Lane '{state.lane.lane_id}' cycle failed: {e}")
+        finally:
+            latency_ms = (time.perf_counter() - started) * 1000
+            await self._limit.release()
+            state.running = False
+
+        state.cycles += 1
+        state.last_latency_ms = round(latency_ms, 2)
+        state.max_latency_ms = max(state.max_latency_ms, state.last_latency_ms)
+        state.total_latency_ms += latency_ms
+        state.latencies_ms = (state.latencies_ms + [state.last_latency_ms])[-100:]
+        print(f"[Scheduler] Lane '{state.lane.lane_id}' cycle took {state.last_latency_ms} ms")
+
+        if failed or latency_ms > self.slow_cycle_seconds * 1000:
+            await self._limit.decrease()
+            print(f"[Scheduler] Backing off: concurrency limit now {self._limit.limit}")
+        else:
+            await self._limit.increase()
+
+    def update_risk(self, scores_by_port: Dict[str, float], expedite_at: float = None):
+        """
+        Applies fleet-wide risk scores (e.g. FleetRiskTable.scores_by_port())
+        to the lanes on those ports. Due lanes are dispatched riskiest first;
+        lanes scoring `expedite_at` or more are made due now instead of
+        waiting out their interval.
+
+        Returns:
+            list[str]: The lanes that were expedited.
+        """
+        now = time.monotonic()
+        expedited = []
+        for lane_id, state in self._lanes.items():
+            port_code = port_code_for(state.lane.params)
+            if port_code not in scores_by_port:
+                continue
+            state.risk_score = scores_by_port[port_code]
+            if expedite_at is not None and state.risk_score >= expedite_at and not state.running \
+                    and state.next_run > now:
+                state.next_run = now
+                expedited.append(lane_id)
+        if expedited:
+            print(f"[Scheduler] Expedited {len(expedited)} lane(s) on fleet risk: {', '.join(expedited)}")
+        return expedited
+
+    async def stop(self):
+        self._stopping.set()
+
+    async def _drain(self, timeout: float = 30.0):
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> dict:
+        lanes = {}
+        for lane_id, state in self._lanes.items():
+            recent = sorted(state.latencies_ms)
+            lanes[lane_id] = {
+                "cycles": state.cycles,
+                "errors": state.errors,
+                "skipped_overlaps": state.skipped_overlaps,
+                "last_latency_ms": state.last_latency_ms,
+                "avg_latency_ms": round(state.total_latency_ms / state.cycles, 2) if state.cycles else 0.0,
+                "p95_latency_ms": recent[int(0.95 * (len(recent) - 1))] if recent else 0.0,
+                "max_latency_ms": state.max_latency_ms,
+                "risk_score": state.risk_score,
+            }
+        return {
+            "ticks": self._ticks,
+            "concurrency_limit": self._limit.limit,
+            "in_flight": self._limit.in_flight,
+            "shared_call_hits": self.agent.shared_call_hits,
+            "fleet_risk_refreshes": self._fleet_refreshes,
+            "expedited_lanes": self._expedited,
+            "lanes": lanes,
+        }
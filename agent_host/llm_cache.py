@@ -0,0 +1,332 @@
+# llm_cache.py
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from tool_planner import KNOWN_PORTS
+
+# Alternative spellings mapped onto one canonical entity name before keying,
+# so "Port of Baltimore" and "baltimore port" share an entry
+ENTITY_ALIASES = {
+    "la": "los angeles", "l.a.": "los angeles", "nyc": "new york", "ny/nj": "new york",
+    "new york and new jersey": "new york", "new york/new jersey": "new york",
+    "hon hai": "foxconn", "hon hai precision": "foxconn", "foxconn technology": "foxconn",
+    "electronics": "electronic", "containers": "container", "containerized": "container",
+}
+for _name, (_city, _code) in KNOWN_PORTS.items():
+    ENTITY_ALIASES[_code.lower()] = _name
+    ENTITY_ALIASES[f"port of {_name}"] = _name
+    ENTITY_ALIASES[f"{_name} port"] = _name
+
+_ALIAS_PATTERN = re.compile(
+    r"(?<![\w.])(" + "|".join(re.escape(alias) for alias in sorted(ENTITY_ALIASES, key=len, reverse=True)) + r")(?![\w])"
+)
+_STRIP_PUNCTUATION = re.compile(r"[\"'`“”‘’]|[.!?;,:]+(?=\s|$)")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Embedding-free normalization for cache keys: case-folds, collapses
+    whitespace, drops quotes and trailing punctuation, and canonicalizes
+    known ports (names, "port of", UN/LOCODEs), suppliers and shipment wording.
+    """
+    text = " ".join(str(text).split()).casefold()
+    text = _ALIAS_PATTERN.sub(lambda m: ENTITY_ALIASES[m.group(1)], text)
+    return _STRIP_PUNCTUATION.sub("", text).strip()
+
+
+def normalize_value(value):
+    """
+    normalize_text for every string in a JSON-like value; dict keys are
+    sorted and empty values dropped, lists keep their order.
+    """
+    if isinstance(value, str):
+        return normalize_text(value)
+    if isinstance(value, dict):
+        return {str(k): normalize_value(v) for k, v in sorted(value.items()) if v not in (None, "", [], {})}
+    if isinstance(value, (list, tuple)):
+        return [normalize_value(v) for v in value]
+    return value
+
+
+@functools.lru_cache(maxsize=64)
+def _prompt_digest(system_prompt: str) -> str:
+    # system prompts are a handful of module constants, hashed once each
+    return hashlib.sha256(system_prompt.encode()).hexdigest()
+
+
+def make_llm_cache_key(namespace: str, model: str, system_prompt: str, user_input, **params) -> str:
+    """
+    Hash of the model, the system prompt, the normalized user input and any
+    sampling parameters that change the output.
+    """
+    payload = json.dumps({
+        "model": model,
+        "system": _prompt_digest(system_prompt),
+        "input": normalize_value(user_input),
+        "params": params,
+    }, sort_keys=True, separators=(",", ":"))
+    return f"{namespace}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+@dataclass
+class CachedCompletion:
+    content: str
+    prompt_tokens: int
+    completion_tokens: int
+    stored_at: float
+    expires_at: float
+
+
+class SQLiteLLMCacheBackend:
+    """
+    On-disk tier so cached completions survive restarts; least recently used
+    entries are evicted once `max_entries` is exceeded.
+
+    Lookups read on the caller's thread (WAL: they never wait for a write).
+    Stores, deletions and the last-access times that drive eviction run on
+    one writer thread with its own connection, the same way as the MCP
+    server's response cache, so the event loop never waits on a commit;
+    access times from many hits are batched into one transaction.
+    """
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._write_conn = self._connect(check_same_thread=False)
+        self._write_conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " content TEXT NOT NULL,"
+            " prompt_tokens INTEGER NOT NULL,"
+            " completion_tokens INTEGER NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._write_conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+        self._write_conn.commit()
+        self._read_conn = self._connect()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache-writer")
+        self._lock = threading.Lock()
+        self._pending_access: Dict[str, float] = {}
+        # entries queued for the writer (None: a queued delete), served to get() until committed
+        self._pending_writes: Dict[str, Optional[CachedCompletion]] = {}
+        self._access_flush_queued = False
+        self.write_errors = 0
+
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, **kwargs)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _submit(self, fn, *args):
+        def run():
+            try:
+                fn(*args)
+            except Exception as e:
+                self.write_errors += 1
+                print(f"[Agent] LLM cache write failed: {e}")
+        return self._writer.submit(run)
+
+    def get(self, key: str) -> Optional[CachedCompletion]:
+        with self._lock:
+            if key in self._pending_writes:
+                entry = self._pending_writes[key]
+                return entry if entry is not None and entry.expires_at >= time.time() else None
+        row = self._read_conn.execute(
+            "SELECT content, prompt_tokens, completion_tokens, stored_at, expires_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[4] < time.time():
+            self.delete(key)
+            return None
+        with self._lock:
+            self._pending_access[key] = time.time()
+            queue_flush = not self._access_flush_queued
+            self._access_flush_queued = True
+        if queue_flush:
+            self._submit(self._flush_access)
+        return CachedCompletion(*row)
+
+    def _flush_access(self):
+        with self._lock:
+            pending, self._pending_access = self._pending_access, {}
+            self._access_flush_queued = False
+        with self._write_conn:
+            self._write_conn.executemany("UPDATE llm_cache SET last_access = ? WHERE key = ?",
+                                         [(accessed, key) for key, accessed in pending.items()])
+
+    def set(self, key: str, entry: CachedCompletion):
+        with self._lock:
+            self._pending_writes[key] = entry
+        self._submit(self._write_entry, key, entry, time.time())
+
+    def _written(self, key: str, entry: Optional[CachedCompletion]):
+        with self._lock:
+            if key in self._pending_writes and self._pending_writes[key] is entry:
+                del self._pending_writes[key]
+
+    def _write_entry(self, key: str, entry: CachedCompletion, accessed: float):
+        try:
+            with self._write_conn:
+                self._write_conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, entry.content, entry.prompt_tokens, entry.completion_tokens, entry.stored_at,
+                     entry.expires_at, accessed),
+                )
+                self._write_conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    " SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+        finally:
+            self._written(key, entry)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._pending_writes[key] = None
+        self._submit(self._delete_entry, key)
+
+    def _delete_entry(self, key: str):
+        try:
+            with self._write_conn:
+                self._write_conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+        finally:
+            self._written(key, None)
+
+    def flush(self):
+        """
+        Blocks until every queued write has been committed.
+        """
+        self._writer.submit(lambda: None).result()
+
+    def __len__(self):
+        return self._read_conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        self._read_conn.close()
+        self._write_conn.close()
+
+
+class LLMResponseCache:
+    """
+    TTL + LRU cache of LLM completions for calls whose output only depends on
+    their input (orchestrator parsing, tool planning), keyed by
+    make_llm_cache_key. Only store completions that parsed successfully.
+
+    A bounded in-memory tier serves hot keys; an optional SQLite tier is read
+    on memory misses and written through. max_entries=0 disables the cache.
+    """
+    def __init__(self, ttl: float = 3600.0, max_entries: int = 512, persistent_backend: SQLiteLLMCacheBackend = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.persistent_backend = persistent_backend
+        self._entries: "OrderedDict[str, CachedCompletion]" = OrderedDict()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "disk_hits": 0,
+            "stores": 0,
+            "evictions": 0,
+            "saved_prompt_tokens": 0,
+            "saved_completion_tokens": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "LLMResponseCache":
+        """
+        LLM_CACHE_MAX_ENTRIES bounds the memory tier (0 disables the cache),
+        LLM_CACHE_TTL is in seconds and LLM_CACHE_PATH, when set, enables the
+        SQLite tier at that path.
+        """
+        max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+        ttl = float(os.getenv("LLM_CACHE_TTL", "3600"))
+        path = os.getenv("LLM_CACHE_PATH")
+        backend = SQLiteLLMCacheBackend(path, max_entries=max_entries * 8) if path and max_entries > 0 else None
+        return cls(ttl=ttl, max_entries=max_entries, persistent_backend=backend)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def get(self, key: str) -> Optional[CachedCompletion]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at < time.time():
+            del self._entries[key]
+            entry = None
+        if entry is None and self.persistent_backend is not None:
+            entry = self.persistent_backend.get(key)
+            if entry is not None:
+                self._stats["disk_hits"] += 1
+                self._remember(key, entry)
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        self._stats["saved_prompt_tokens"] += entry.prompt_tokens
+        self._stats["saved_completion_tokens"] += entry.completion_tokens
+        return entry
+
+    def _remember(self, key: str, entry: CachedCompletion):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def put(self, key: str, content: str, usage=None):
+        """
+        Stores a completion. `usage` is the response's usage object (or None),
+        used to count the tokens later hits save.
+        """
+        if not self.enabled:
+            return
+        now = time.time()
+        entry = CachedCompletion(
+            content=content,
+            prompt_tokens=getattr(usage, "prompt_tokens", None) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", None) or 0,
+            stored_at=now,
+            expires_at=now + self.ttl,
+        )
+        self._remember(key, entry)
+        if self.persistent_backend is not None:
+            self.persistent_backend.set(key, entry)
+        self._stats["stores"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "saved_total_tokens": self._stats["saved_prompt_tokens"] + self._stats["saved_completion_tokens"],
+            "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "persistent_entries": len(self.persistent_backend) if self.persistent_backend is not None else None,
+            "persistent_write_errors": self.persistent_backend.write_errors if self.persistent_backend is not None else None,
+        }
+
+    def close(self):
+        if self.persistent_backend is not None:
+            self.persistent_backend.close()
+
+    async def aclose(self):
+        if self.persistent_backend is not None:
+            # queued writes are waited for on a thread, not on the loop
+            await asyncio.to_thread(self.persistent_backend.flush)
+            self.persistent_backend.close()
@@ -0,0 +1,43 @@
+# llm_json.py
+import json
+
+_decoder = json.JSONDecoder()
+
+
+def extract_json_object(raw: str) -> dict:
+    """
+    Parses the JSON object in an LLM reply in a single pass and returns it.
+
+    Anything before the first "{" (prose, a ```json fence) and anything after
+    the object's closing brace (a closing fence, trailing commentary, even
+    another "}") is ignored. Raises ValueError when there is no parsable
+    object (json.JSONDecodeError is a ValueError).
+    """
+    if not isinstance(raw, str):
+        raise ValueError(f"Expected the LLM reply as text, got {type(raw).__name__}")
+    start = raw.find("{")
+    if start == -1:
+        raise ValueError("No valid JSON object found in input")
+    value, _ = _decoder.raw_decode(raw, start)
+    return value
+
+
+def compact_json(value) -> str:
+    """
+    The one serialization a payload gets on its way into a prompt: no
+    indentation or spaces after separators, non-ASCII kept as is.
+    """
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def with_json_key(text: str, key: str, value) -> str:
+    """
+    Adds `key` to an object already serialized with compact_json, without
+    serializing the rest of it again.
+    """
+    extra = f"{compact_json(key)}:{compact_json(value)}"
+    if text == "{}":
+        return "{" + extra + "}"
+    if not (text.startswith("{") and text.endswith("}")):
+        raise ValueError("Expected a serialized JSON object")
+    return text[:-1] + "," + extra + "}"
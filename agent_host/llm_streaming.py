@@ -0,0 +1,152 @@
+# llm_streaming.py
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+
+def streaming_enabled() -> bool:
+    """
+    LLM_STREAMING=0 makes the agents wait for whole completions again.
+    """
+    return os.getenv("LLM_STREAMING", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+class IncrementalJSONParser:
+    """
+    Parses the top-level object of a JSON document while it streams in.
+
+    feed() returns the top-level fields whose values completed in that chunk,
+    so a caller can act on `"risk_score": 7.5` long before the closing brace.
+    Text before the first "{" (e.g. a ```json fence) is skipped. Values are
+    reported when the "," or "}" after them arrives; a value that does not
+    parse is left out and only shows up in the final document.
+    """
+    def __init__(self):
+        self.text = ""
+        self.fields: Dict[str, Any] = {}
+        self.complete = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        # "start" -> "key" -> "key_string" -> "colon" -> "value" -> "in_value" -> "key" ...
+        self._state = "start"
+        self._key = None
+        self._mark = 0
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        self.text += chunk
+        completed = {}
+        text = self.text
+        for i in range(self._pos, len(text)):
+            if self.complete:
+                break
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._state == "key_string":
+                        self._key = json.loads(text[self._mark:i + 1])
+                        self._state = "colon"
+                continue
+
+            if self._state == "start":
+                if ch == "{":
+                    self._depth = 1
+                    self._state = "key"
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._state == "key":
+                    self._mark = i
+                    self._state = "key_string"
+                elif self._depth == 1 and self._state == "value":
+                    self._mark = i
+                    self._state = "in_value"
+            elif ch == ":" and self._depth == 1 and self._state == "colon":
+                self._state = "value"
+            elif ch in "{[":
+                if self._depth == 1 and self._state == "value":
+                    self._mark = i
+                    self._state = "in_value"
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete_value(text[self._mark:i], completed)
+                    self.complete = True
+            elif ch == "," and self._depth == 1:
+                self._complete_value(text[self._mark:i], completed)
+                self._state = "key"
+            elif not ch.isspace() and self._depth == 1 and self._state == "value":
+                # number, true, false or null
+                self._mark = i
+                self._state = "in_value"
+        self._pos = len(text)
+        return completed
+
+    def _complete_value(self, raw: str, completed: dict):
+        if self._state != "in_value":
+            return
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return
+        self.fields[self._key] = value
+        completed[self._key] = value
+
+
+@dataclass
+class StreamedCompletion:
+    """
+    A streamed chat completion, duck-typed like a response for Span.set_usage().
+    """
+    content: str = ""
+    fields: Dict[str, Any] = field(default_factory=dict)
+    usage: Any = None
+    first_token_ms: Optional[float] = None
+    total_ms: float = 0.0
+
+
+async def stream_json_completion(client, on_field: Callable[[str, Any], None] = None, **create_kwargs) -> StreamedCompletion:
+    """
+    Streams a chat completion whose content is a JSON object, calling
+    `on_field(key, value)` as each top-level field completes.
+
+    Args:
+        client: An AsyncOpenAI(-compatible) client.
+        on_field: Called synchronously from the stream loop; keep it quick and
+            hand longer work to a task.
+        **create_kwargs: Passed to client.chat.completions.create (stream is forced on).
+    """
+    started = time.perf_counter()
+    parser = IncrementalJSONParser()
+    completion = StreamedCompletion()
+    stream = await client.chat.completions.create(stream=True, **create_kwargs)
+    try:
+        async for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                completion.usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if completion.first_token_ms is None:
+                completion.first_token_ms = round((time.perf_counter() - started) * 1000, 3)
+            for key, value in parser.feed(delta).items():
+                if on_field is not None:
+                    on_field(key, value)
+    finally:
+        await stream.close()
+    completion.content = parser.text
+    completion.fields = parser.fields
+    completion.total_ms = round((time.perf_counter() - started) * 1000, 3)
+    return completion
@@ -0,0 +1,204 @@
+# mcp_session_pool.py
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+
+from tracing import tracer
+
+
+class _PooledSession:
+    """
+    One long-lived MCP session. The transport and ClientSession are entered and
+    exited inside a dedicated task, because their anyio cancel scopes must be
+    closed by the same task that opened them.
+    """
+    def __init__(self, url: str, index: int):
+        self.url = url
+        self.index = index
+        self.session = None
+        self.in_flight = 0
+        self.uses = 0
+        self.last_used = 0.0
+        self.last_checked = 0.0
+        self._task = None
+        self._ready = None
+        self._closing = None
+        self._error = None
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def open(self, timeout: float):
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error = None
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            await self.close()
+            raise ConnectionError(f"Timed out opening MCP session to {self.url}")
+        if self._error is not None:
+            raise ConnectionError(f"Failed to open MCP session to {self.url}: {self._error}")
+        self.last_checked = time.monotonic()
+
+    async def _run(self):
+        try:
+            async with streamablehttp_client(self.url) as (read_stream, write_stream, _):
+                async with ClientSession(read_stream, write_stream) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    await self._closing.wait()
+        except Exception as e:
+            self._error = e
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._closing.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=5)
+        except (asyncio.TimeoutError, Exception):
+            self._task.cancel()
+        self._task = None
+        self.session = None
+
+
+class MCPSessionPool:
+    """
+    Long-lived, health-checked pool of MCP sessions to a single server URL.
+
+    Sessions are opened (and `initialize()`d) once at warm-up and then shared:
+    a ClientSession multiplexes concurrent requests, so many analyses can use
+    the same session at once. Acquisition prefers the least busy live session,
+    pings sessions that have been idle longer than `health_check_interval`,
+    and transparently reconnects dead ones.
+    """
+    def __init__(self, url: str, size: int = 2, health_check_interval: float = 30.0, connect_timeout: float = 10.0):
+        self.url = url
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self.connect_timeout = connect_timeout
+        self._sessions = [_PooledSession(url, i) for i in range(size)]
+        self._locks = [asyncio.Lock() for _ in range(size)]
+        self._stats = {
+            "handshakes": 0,
+            "acquisitions": 0,
+            "reconnects": 0,
+            "health_checks": 0,
+            "health_check_failures": 0,
+            "retried_calls": 0,
+        }
+
+    async def start(self):
+        """
+        Warms the pool up by opening every session. Failures are logged and
+        retried lazily on the next acquisition.
+        """
+        results = await asyncio.gather(*[self._ensure_open(i) for i in range(self.size)], return_exceptions=True)
+        opened = sum(1 for r in results if not isinstance(r, Exception))
+        print(f"[SessionPool] Warmed up {opened}/{self.size} MCP session(s) to {self.url}")
+
+    async def _ensure_open(self, index: int) -> _PooledSession:
+        pooled = self._sessions[index]
+        async with self._locks[index]:
+            if not pooled.alive:
+                if pooled.uses:
+                    self._stats["reconnects"] += 1
+                    print(f"[SessionPool] Reconnecting MCP session #{index}...")
+                await pooled.close()
+                # transport connect + initialize() handshake
+                with tracer.span("mcp.connect", session=index, reconnect=bool(pooled.uses)):
+                    await pooled.open(self.connect_timeout)
+                self._stats["handshakes"] += 1
+        return pooled
+
+    async def _health_check(self, pooled: _PooledSession) -> bool:
+        self._stats["health_checks"] += 1
+        try:
+            await asyncio.wait_for(pooled.session.send_ping(), timeout=self.connect_timeout)
+            pooled.last_checked = time.monotonic()
+            return True
+        except Exception as e:
+            self._stats["health_check_failures"] += 1
+            print(f"[SessionPool] Health check failed for MCP session #{pooled.index}: {e}")
+            await pooled.close()
+            return False
+
+    async def _acquire(self) -> _PooledSession:
+        self._stats["acquisitions"] += 1
+        # least busy live session first; dead ones sort last and get reopened
+        for pooled in sorted(self._sessions, key=lambda p: (not p.alive, p.in_flight)):
+            try:
+                pooled = await self._ensure_open(pooled.index)
+            except ConnectionError as e:
+                print(f"[SessionPool] {e}")
+                continue
+            idle_for = time.monotonic() - max(pooled.last_used, pooled.last_checked)
+            if idle_for > self.health_check_interval and not await self._health_check(pooled):
+                try:
+                    pooled = await self._ensure_open(pooled.index)
+                except ConnectionError as e:
+                    print(f"[SessionPool] {e}")
+                    continue
+            return pooled
+        raise ConnectionError(f"No MCP session to {self.url} could be opened")
+
+    @asynccontextmanager
+    async def _using(self, pooled: _PooledSession):
+        pooled.in_flight += 1
+        pooled.uses += 1
+        try:
+            yield pooled.session
+        finally:
+            pooled.in_flight -= 1
+            pooled.last_used = time.monotonic()
+
+    @asynccontextmanager
+    async def session(self):
+        """
+        Yields a shared, initialized ClientSession.
+        """
+        pooled = await self._acquire()
+        async with self._using(pooled) as session:
+            yield session
+
+    async def call_tool(self, tool_name: str, tool_args: dict):
+        """
+        Calls a tool on a pooled session. If the call raises, the session is
+        pinged: a healthy session means the error is genuine and it is raised,
+        a dead one (e.g. the server restarted) is reconnected and the call is
+        retried once. Tool-level errors come back as results, not exceptions.
+        """
+        pooled = await self._acquire()
+        try:
+            async with self._using(pooled) as session:
+                return await session.call_tool(tool_name, tool_args)
+        except Exception as e:
+            if pooled.alive and await self._health_check(pooled):
+                raise
+            print(f"[SessionPool] Retrying '{tool_name}' on a fresh session after: {e}")
+            self._stats["retried_calls"] += 1
+            async with self.session() as session:
+                return await session.call_tool(tool_name, tool_args)
+
+    def stats(self) -> dict:
+        acquisitions = self._stats["acquisitions"]
+        return {
+            **self._stats,
+            "handshakes_avoided": max(acquisitions - self._stats["handshakes"], 0),
+            "live_sessions": sum(1 for p in self._sessions if p.alive),
+            "session_uses": [p.uses for p in self._sessions],
+            "in_flight": sum(p.in_flight for p in self._sessions),
+        }
+
+    async def close(self):
+        await asyncio.gather(*[p.close() for p in self._sessions], return_exceptions=True)
@@ -3,25 +3,75 @@ import asyncio
 import sys
 from openai import AsyncOpenAI
 from disrup_detect_agent import DisruptionDetectionAgent
+from impact_agent import ImpactAssessmentAgent
+from response_agent import ResponseCoordinationAgent
+from handoffs import ImpactHandoff, ResponseHandoff
+from workflow_engine import StepSkipped, WorkflowEngine, WorkflowStep
+from exchange_recorder import ExchangeRecorder
+from mcp_session_pool import MCPSessionPool
+from llm_streaming import stream_json_completion, streaming_enabled
+from llm_cache import LLMResponseCache, make_llm_cache_key
+from llm_json import extract_json_object
+from tracing import tracer
 from dotenv import load_dotenv
 import os 
-import json 
 import uuid
 
 load_dotenv()
 
+DETECTION_AGENT = "DisruptionDetectionAgent"
+IMPACT_AGENT = "ImpactAssessmentAgent"
+RESPONSE_AGENT = "ResponseCoordinationAgent"
+
 class OrchestratorAgent:
-    def __init__(self):
+    def __init__(self, preliminary_alert_handler=None, stream_llm=None, llm_cache=None):
         """
         Initializes the OrchestratorAgent.
         AI agent client
+
+        Args:
+            preliminary_alert_handler (callable): Handed to the DisruptionDetectionAgent;
+                called with the early alert while the full report is still streaming.
+            stream_llm (bool): Stream LLM completions (default: LLM_STREAMING env, on).
+            llm_cache (LLMResponseCache): Cache for the input parse and the agents'
+                tool planning. Built from the LLM_CACHE_* env vars when not given.
         """
         self.client = AsyncOpenAI(
         api_key= os.getenv("PERPLEXITY_API_KEY"),
-        base_url="https://api.perplexity.ai"
+        base_url=os.getenv("PERPLEXITY_BASE_URL", "https://api.perplexity.ai")
         )
+        # records or replays every tool call and completion below (EXCHANGE_MODE)
+        self.recorder = ExchangeRecorder.from_env()
+        if self.recorder is not None:
+            self.client = self.recorder.wrap_llm_client(self.client)
         self.model = "sonar"
+        self.stream_llm = streaming_enabled() if stream_llm is None else stream_llm
+        self.preliminary_alert_handler = preliminary_alert_handler
+        # near-identical requests arrive all day; their parse (and plan) is reused
+        self.llm_cache = llm_cache or LLMResponseCache.from_env()
+        # MCP sessions outlive individual workflows so each run skips the handshake
+        self.mcp_session_pool = MCPSessionPool(os.getenv("MCP_URL", "http://127.0.0.1:8001/mcp"))
+        if self.recorder is not None:
+            self.mcp_session_pool = self.recorder.wrap_session_pool(self.mcp_session_pool)
+        # one agent for every workflow: it shares the LLM client, MCP sessions and caches above
+        self.disruption_agent = DisruptionDetectionAgent(session_pool=self.mcp_session_pool, llm_client=self.client,
+                                                         llm_cache=self.llm_cache, stream_llm=self.stream_llm,
+                                                         preliminary_alert_handler=preliminary_alert_handler,
+                                                         recorder=self.recorder)
+        self.impact_agent = ImpactAssessmentAgent(session_pool=self.mcp_session_pool, llm_client=self.client)
+        self.response_agent = ResponseCoordinationAgent(llm_client=self.client)
         print(f"OrchestratorAgent initialized.")
+
+    async def start(self):
+        await self.mcp_session_pool.start()
+
+    async def close(self):
+        # the agent finishes its pending alert handlers, then closes the shared MCP pool
+        await self.disruption_agent.close()
+        await self.client.close()
+        await self.llm_cache.aclose()
+        if self.recorder is not None:
+            await self.recorder.close()
     
         
     def generate_agent_id(self , length=6, prefix="AGENT_", suffix=""):
@@ -33,7 +83,15 @@ class OrchestratorAgent:
     async def execute_workflow(self, user_input ):
         """
         Parses user input and launches the appropriate agent workflow.
+
+        Returns:
+            dict or None: The workflow result (see `_run_agent_graph`), or None
+                if the input could not be parsed into a workflow.
         """
+        with tracer.span("workflow", input_bytes=len(user_input)):
+            return await self._execute_workflow(user_input)
+
+    async def _execute_workflow(self, user_input):
         print(f"\n[Orchestrator] Starting workflow for: '{user_input}'")
 
         system_prompt = """
@@ -70,29 +128,47 @@ class OrchestratorAgent:
                         Now, analyze the user's request and generate the JSON output. nothing else than json not a single word out put start with : { 
                     """
         try:
-            response = await self.client.chat.completions.create(
-                model = self.model , 
-                messages = [
-                    {"role" : "system" ,  "content" : system_prompt },
-                    {"role" : "user" , "content" : user_input }
-                ],
-                temperature = 0.1, 
-                max_tokens = 500,
-                # response_format={"type": "json_object"},
-            )
-            
-            raw_content = response.choices[0].message.content
+            cache_key = make_llm_cache_key("orchestrator.parse", self.model, system_prompt, user_input,
+                                           temperature=0.1, max_tokens=500)
+            cached = self.llm_cache.get(cache_key)
+            with tracer.span("orchestrator.parse", prompt_bytes=len(system_prompt) + len(user_input),
+                             cache_hit=cached is not None) as span:
+                request = dict(
+                    model = self.model , 
+                    messages = [
+                        {"role" : "system" ,  "content" : system_prompt },
+                        {"role" : "user" , "content" : user_input }
+                    ],
+                    temperature = 0.1, 
+                    max_tokens = 500,
+                    # response_format={"type": "json_object"},
+                )
+                if cached is not None:
+                    response = None
+                    raw_content = cached.content
+                elif self.stream_llm:
+                    response = await stream_json_completion(self.client, **request)
+                    span.set(streamed=True, first_token_ms=response.first_token_ms)
+                    raw_content = response.content
+                else:
+                    response = await self.client.chat.completions.create(**request)
+                    raw_content = response.choices[0].message.content
+                span.set_usage(response)
+
             # print raw content
             print(f"Orchestrator: Received raw LLM response: {raw_content}")
             # parse json string into python dict object
-            result = json.loads(raw_content)
+            result = extract_json_object(raw_content)
 
             # user parsed data input 
             user_input_params = result["parsed_data"]
             # agentic call seq :
             agent_seq = result["agent_call_sequence"]   # list of str
 
-        except (json.JSONDecodeError, KeyError) as e:
+            if cached is None:
+                self.llm_cache.put(cache_key, raw_content, getattr(response, "usage", None))
+
+        except (ValueError, KeyError) as e:
                 print(f"Orchestrator: Error parsing LLM response - {e}")
                 return
         
@@ -101,16 +177,105 @@ class OrchestratorAgent:
                 return
 
 
-        if agent_seq and agent_seq[0] == "DisruptionDetectionAgent":
-            print("[Orchestrator] Instantiating DisruptionDetectionAgent...")
-            disruption_agent = DisruptionDetectionAgent()
-
-            print(f"[Orchestrator] Executing agent task with parameters: {user_input_params}")
-            await disruption_agent.run_single_analysis(initial_params=user_input_params)
-            
-            print("[Orchestrator] Agent task complete.")
-        else:
+        steps = self._build_agent_graph(agent_seq, user_input_params)
+        if not steps:
             print("[Orchestrator] No suitable agent found in the sequence to execute.")
+            return None
+        print(f"[Orchestrator] Executing {[step.name for step in steps]} with parameters: {user_input_params}")
+        return await self._run_agent_graph(steps, user_input_params, agent_seq)
+
+    def _build_agent_graph(self, agent_seq, params):
+        """
+        Turns agent_call_sequence into a dependency graph. Edges follow the
+        data, not the list order:
+
+            detection ----------------> impact ----> response
+            impact.prefetch (supplier news / SEC) --^
+
+        impact.prefetch needs nothing from detection, so it runs alongside it.
+        The response step waits for the impact step only when the sequence puts
+        impact before response; the emergency sequence (detection, response)
+        starts the response the moment the report is in. Impact and response
+        need the detection report, so detection joins the graph whenever
+        either of them is requested.
+        """
+        agents = [name for name in dict.fromkeys(agent_seq or [])
+                  if name in (DETECTION_AGENT, IMPACT_AGENT, RESPONSE_AGENT)]
+        for name in agent_seq or []:
+            if name not in agents:
+                print(f"[Orchestrator] Ignoring unknown agent '{name}' in the sequence.")
+        if not agents:
+            return []
+
+        async def detect(inputs):
+            report = await self.disruption_agent.run_single_analysis(initial_params=params)
+            if not report:
+                raise StepSkipped("no disruption detected")
+            return report
+
+        async def prefetch(inputs):
+            return await self.impact_agent.prefetch(params)
+
+        async def assess(inputs):
+            handoff = ImpactHandoff.from_report(inputs["detection"])
+            assessment = await self.impact_agent.assess(handoff, inputs["impact.prefetch"], params)
+            if assessment is None:
+                raise RuntimeError("impact assessment unusable")
+            return assessment
+
+        async def respond(inputs):
+            handoff = ResponseHandoff.from_report(inputs["detection"], impact=inputs.get("impact"))
+            plan = await self.response_agent.coordinate(handoff, params)
+            if plan is None:
+                raise RuntimeError("response plan unusable")
+            return plan
+
+        steps = [WorkflowStep("detection", detect)]
+        if IMPACT_AGENT in agents:
+            steps.append(WorkflowStep("impact.prefetch", prefetch))
+            steps.append(WorkflowStep("impact", assess, depends_on=("detection", "impact.prefetch")))
+        if RESPONSE_AGENT in agents:
+            impact_first = IMPACT_AGENT in agents and agents.index(IMPACT_AGENT) < agents.index(RESPONSE_AGENT)
+            # a failed impact step still leaves a response, planned from the report alone
+            steps.append(WorkflowStep("response", respond, depends_on=("detection",),
+                                      after=("impact",) if impact_first else ()))
+        return steps
+
+    async def _run_agent_graph(self, steps, params, agent_seq):
+        """
+        Returns:
+            dict: parsed_data, agent_call_sequence, the detection report (None
+                without a disruption), the impact assessment and response plan
+                (None when not run or unusable) and every step's status.
+        """
+        results = await WorkflowEngine(steps).run()
+
+        def output(name):
+            result = results.get(name)
+            if result is None or result.status != "ok":
+                return None
+            return result.output.model_dump() if hasattr(result.output, "model_dump") else result.output
+
+        for name, result in results.items():
+            print(f"[Orchestrator]   - {name}: {result.status} ({result.duration_ms} ms"
+                  f"{', ' + result.error if result.error else ''})")
+        print("[Orchestrator] Agent workflow complete.")
+        return {
+            "parsed_data": params,
+            "agent_call_sequence": agent_seq,
+            "detection": output("detection"),
+            "impact": output("impact"),
+            "response": output("response"),
+            "steps": {name: result.to_dict() for name, result in results.items()},
+        }
+
+
+async def run_once(orchestrator, user_task):
+    await orchestrator.start()
+    try:
+        await orchestrator.execute_workflow(user_task)
+    finally:
+        await orchestrator.close()
 
 
 
@@ -127,7 +292,7 @@ if __name__ == "__main__":
 
     try:
         # The main execution block is now a simple, direct call to execute the workflow once.
-        asyncio.run(orchestrator.execute_workflow(user_task))
+        asyncio.run(run_once(orchestrator, user_task))
         print("\nOrchestrator workflow finished.")
     except KeyboardInterrupt:
         print("\nOrchestrator run interrupted by user.")
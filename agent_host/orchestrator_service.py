@@ -0,0 +1,294 @@
+# orchestrator_service.py
+"""
+Long-running orchestrator: accepts many workflow requests over HTTP and runs
+them through one shared OrchestratorAgent (one LLM client, one MCP session
+pool, one DisruptionDetectionAgent).
+
+    python agent_host/orchestrator_service.py
+
+    POST /workflows   {"input": "...", "tenant": "acme", "urgency": "high", "wait": true}
+    GET  /workflows/{id}
+    GET  /stats
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from orchestrator_agent import OrchestratorAgent
+
+# Lower runs first; urgency_level values the orchestrator prompt produces
+PRIORITIES = {"high": 0, "medium": 1, "normal": 1, "low": 2}
+DEFAULT_URGENCY = "normal"
+
+# Same cues the orchestrator prompt treats as an emergency, checked before any LLM call
+URGENT_WORDS = ("emergency", "critical", "immediate", "urgent", "port closure")
+
+
+class QueueFull(Exception):
+    pass
+
+
+def infer_urgency(user_input: str) -> str:
+    text = user_input.lower()
+    return "high" if any(word in text for word in URGENT_WORDS) else DEFAULT_URGENCY
+
+
+def _percentiles(samples) -> dict:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+    return {
+        "p50_ms": round(ordered[int(0.5 * (len(ordered) - 1))], 2),
+        "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))], 2),
+        "max_ms": round(ordered[-1], 2),
+    }
+
+
+@dataclass
+class WorkflowRequest:
+    request_id: str
+    tenant: str
+    user_input: str
+    urgency: str
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    status: str = "queued"
+    result: Any = None
+    error: Optional[str] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def to_dict(self) -> dict:
+        def ms(start, end):
+            return round((end - start) * 1000, 2) if start is not None and end is not None else None
+        return {
+            "id": self.request_id,
+            "tenant": self.tenant,
+            "urgency": self.urgency,
+            "status": self.status,
+            "queue_ms": ms(self.enqueued_at, self.started_at),
+            "run_ms": ms(self.started_at, self.finished_at),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class OrchestratorService:
+    """
+    Priority queue in front of a shared OrchestratorAgent.
+
+    At most `max_concurrent` workflows run at once, and at most
+    `per_tenant_limit` per tenant, so one noisy tenant cannot starve the
+    others. Excess requests wait in the queue; high urgency ones are
+    dispatched first, FIFO within a priority. A queued request whose tenant is
+    at its limit is passed over until a slot of that tenant frees up.
+    """
+    def __init__(self, orchestrator: OrchestratorAgent, max_concurrent: int = 16, per_tenant_limit: int = 4,
+                 max_queue: int = 1000, keep_results: int = 1000):
+        self.orchestrator = orchestrator
+        self.max_concurrent = max_concurrent
+        self.per_tenant_limit = per_tenant_limit
+        self.max_queue = max_queue
+        self.keep_results = keep_results
+        self._queue = []  # heap of (priority, seq, request)
+        self._seq = itertools.count()
+        self._running: Dict[str, int] = {}
+        self._in_flight = 0
+        self._tasks = set()
+        self._requests: "OrderedDict[str, WorkflowRequest]" = OrderedDict()
+        self._queue_ms = deque(maxlen=1000)
+        self._run_ms = deque(maxlen=1000)
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "max_queue_depth": 0}
+
+    @classmethod
+    def from_env(cls, orchestrator: OrchestratorAgent) -> "OrchestratorService":
+        """
+        ORCHESTRATOR_MAX_CONCURRENT, ORCHESTRATOR_TENANT_LIMIT and ORCHESTRATOR_MAX_QUEUE.
+        """
+        return cls(
+            orchestrator,
+            max_concurrent=int(os.getenv("ORCHESTRATOR_MAX_CONCURRENT", "16")),
+            per_tenant_limit=int(os.getenv("ORCHESTRATOR_TENANT_LIMIT", "4")),
+            max_queue=int(os.getenv("ORCHESTRATOR_MAX_QUEUE", "1000")),
+        )
+
+    def submit(self, user_input: str, tenant: str = "default", urgency: str = None) -> WorkflowRequest:
+        """
+        Queues a workflow and returns its request; await `request.done` for the result.
+        Raises QueueFull when `max_queue` requests are already waiting.
+        """
+        if len(self._queue) >= self.max_queue:
+            self._stats["rejected"] += 1
+            raise QueueFull(f"{len(self._queue)} workflows already queued")
+        urgency = (urgency or infer_urgency(user_input)).lower()
+        if urgency not in PRIORITIES:
+            raise ValueError(f"urgency must be one of {sorted(PRIORITIES)}, got '{urgency}'")
+
+        request = WorkflowRequest(request_id=uuid.uuid4().hex[:12], tenant=tenant, user_input=user_input, urgency=urgency)
+        self._requests[request.request_id] = request
+        while len(self._requests) > self.keep_results:
+            oldest_id, oldest = next(iter(self._requests.items()))
+            if not oldest.done.is_set():
+                break
+            del self._requests[oldest_id]
+
+        heapq.heappush(self._queue, (PRIORITIES[urgency], next(self._seq), request))
+        self._stats["submitted"] += 1
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._queue))
+        self._dispatch()
+        return request
+
+    async def run(self, user_input: str, tenant: str = "default", urgency: str = None) -> WorkflowRequest:
+        request = self.submit(user_input, tenant=tenant, urgency=urgency)
+        await request.done.wait()
+        return request
+
+    def get(self, request_id: str) -> Optional[WorkflowRequest]:
+        return self._requests.get(request_id)
+
+    def _dispatch(self):
+        """
+        Starts queued requests, best priority first, while global and tenant slots allow.
+        """
+        skipped = []
+        while self._queue and self._in_flight < self.max_concurrent:
+            entry = heapq.heappop(self._queue)
+            request = entry[2]
+            if self._running.get(request.tenant, 0) >= self.per_tenant_limit:
+                skipped.append(entry)
+                continue
+            self._in_flight += 1
+            self._running[request.tenant] = self._running.get(request.tenant, 0) + 1
+            task = asyncio.create_task(self._execute(request))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+
+    async def _execute(self, request: WorkflowRequest):
+        request.started_at = time.perf_counter()
+        request.status = "running"
+        self._queue_ms.append((request.started_at - request.enqueued_at) * 1000)
+        try:
+            request.result = await self.orchestrator.execute_workflow(request.user_input)
+            request.status = "completed"
+            self._stats["completed"] += 1
+        except Exception as e:
+            request.status = "failed"
+            request.error = f"{type(e).__name__}: {e}"
+            self._stats["failed"] += 1
+            print(f"[Service] Workflow {request.request_id} failed: {e}")
+        finally:
+            request.finished_at = time.perf_counter()
+            self._run_ms.append((request.finished_at - request.started_at) * 1000)
+            self._in_flight -= 1
+            self._running[request.tenant] -= 1
+            if not self._running[request.tenant]:
+                del self._running[request.tenant]
+            request.done.set()
+            self._dispatch()
+
+    async def drain(self, timeout: float = 30.0):
+        """
+        Lets running workflows finish; queued ones are failed.
+        """
+        for _, _, request in self._queue:
+            request.status = "failed"
+            request.error = "service shutting down"
+            request.done.set()
+        self._queue.clear()
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+    def stats(self) -> dict:
+        depth_by_urgency = {}
+        depth_by_tenant = {}
+        for _, _, request in self._queue:
+            depth_by_urgency[request.urgency] = depth_by_urgency.get(request.urgency, 0) + 1
+            depth_by_tenant[request.tenant] = depth_by_tenant.get(request.tenant, 0) + 1
+        return {
+            **self._stats,
+            "max_concurrent": self.max_concurrent,
+            "per_tenant_limit": self.per_tenant_limit,
+            "in_flight": self._in_flight,
+            "in_flight_by_tenant": dict(self._running),
+            "queue_depth": len(self._queue),
+            "queue_depth_by_urgency": depth_by_urgency,
+            "queue_depth_by_tenant": depth_by_tenant,
+            "queue_latency": _percentiles(self._queue_ms),
+            "run_latency": _percentiles(self._run_ms),
+        }
+
+
+def build_service_app(service: OrchestratorService) -> Starlette:
+    async def submit_workflow(request: Request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return JSONResponse({"error": "body must be JSON"}, status_code=400)
+        user_input = body.get("input") if isinstance(body, dict) else None
+        if not user_input or not isinstance(user_input, str):
+            return JSONResponse({"error": "'input' (string) is required"}, status_code=400)
+        try:
+            workflow = service.submit(user_input, tenant=str(body.get("tenant") or "default"), urgency=body.get("urgency"))
+        except QueueFull as e:
+            return JSONResponse({"error": f"queue full: {e}"}, status_code=429, headers={"Retry-After": "1"})
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+
+        if body.get("wait", True):
+            await workflow.done.wait()
+            return JSONResponse(workflow.to_dict(), status_code=200 if workflow.status == "completed" else 500)
+        return JSONResponse({"id": workflow.request_id, "status": workflow.status}, status_code=202)
+
+    async def get_workflow(request: Request):
+        workflow = service.get(request.path_params["request_id"])
+        if workflow is None:
+            return JSONResponse({"error": "unknown workflow id"}, status_code=404)
+        return JSONResponse(workflow.to_dict())
+
+    async def stats(request: Request):
+        orchestrator = service.orchestrator
+        return JSONResponse({
+            "service": service.stats(),
+            "llm_cache": orchestrator.llm_cache.stats(),
+            "mcp_session_pool": orchestrator.mcp_session_pool.stats(),
+        })
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await service.orchestrator.start()
+        print(f"[Service] Accepting workflows (max {service.max_concurrent} concurrent, "
+              f"{service.per_tenant_limit} per tenant).")
+        try:
+            yield
+        finally:
+            await service.drain()
+            await service.orchestrator.close()
+            print("[Service] Stopped.")
+
+    return Starlette(routes=[
+        Route("/workflows", submit_workflow, methods=["POST"]),
+        Route("/workflows/{request_id}", get_workflow),
+        Route("/stats", stats),
+    ], lifespan=lifespan)
+
+
+if __name__ == "__main__":
+    print("Starting Orchestrator service...")
+    service = OrchestratorService.from_env(OrchestratorAgent())
+    uvicorn.run(build_service_app(service), host=os.getenv("ORCHESTRATOR_HOST", "127.0.0.1"),
+                port=int(os.getenv("ORCHESTRATOR_PORT", "8002")), log_level="warning")
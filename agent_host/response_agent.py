@@ -0,0 +1,78 @@
+# response_agent.py
+import os
+
+from openai import AsyncOpenAI
+from pydantic import ValidationError
+
+from handoffs import ResponseHandoff, ResponsePlan
+from llm_json import compact_json, extract_json_object
+from tracing import tracer
+
+
+class ResponseCoordinationAgent:
+    """
+    Turns a disruption handoff (and the impact assessment, when the workflow
+    ran one) into a prioritized mitigation plan.
+    """
+    def __init__(self, llm_client=None):
+        """
+        Args:
+            llm_client (AsyncOpenAI): Shared LLM client. A private client is
+                created, and closed by `close()`, when none is given.
+        """
+        self.client = llm_client or AsyncOpenAI(
+            api_key=os.getenv("PERPLEXITY_API_KEY"),
+            base_url=os.getenv("PERPLEXITY_BASE_URL", "https://api.perplexity.ai")
+        )
+        self._owns_llm_client = llm_client is None
+        self.model = "sonar"
+
+    async def close(self):
+        if self._owns_llm_client:
+            await self.client.close()
+
+    async def coordinate(self, handoff: ResponseHandoff, params: dict = None) -> ResponsePlan:
+        """
+        Asks the LLM for the mitigation plan.
+
+        Returns:
+            ResponsePlan or None if the LLM response was unusable.
+        """
+        system_prompt = """
+            You are the response coordination agent of a supply chain resilience system. You receive a detected disruption with the detection agent's recommended actions, optionally an impact assessment, and the customer's supply chain details.
+            Produce a concrete, prioritized mitigation plan: who does what, and how soon. Without an impact assessment this is an emergency; favour immediate, reversible actions.
+
+            Your entire output must be a single, valid JSON object:
+            {
+            "actions": [
+                {"action": "<what to do>", "owner": "<team, e.g. 'logistics', 'procurement', 'customer_service'>", "priority": "<one of 'immediate', '24h', 'week'>"}
+            ],
+            "notify": ["<stakeholders to notify>"],
+            "summary": "<one sentence>"
+            }
+
+            your output should start with {
+            """
+        user_input = compact_json({"handoff": handoff.model_dump(), "supply_chain": params or {}})
+
+        raw_output = None
+        try:
+            with tracer.span("response.llm", prompt_bytes=len(system_prompt) + len(user_input),
+                             with_impact=handoff.impact is not None) as span:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_input}
+                    ],
+                    temperature=0.1,
+                    max_tokens=500,
+                )
+                span.set_usage(response)
+            raw_output = response.choices[0].message.content
+            plan = ResponsePlan.model_validate(extract_json_object(raw_output))
+        except (ValueError, ValidationError) as e:
+            print(f"[Response] Unusable response plan from the LLM: {e}. Response: {raw_output}")
+            return None
+        print(f"[Response] Plan with {len(plan.actions)} action(s): {plan.summary}")
+        return plan
@@ -0,0 +1,353 @@
+# risk_features.py
+import json
+import re
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, List, Optional
+
+from llm_json import compact_json
+
+# get_weather's sections; older servers returned them as content blocks in this order
+WEATHER_SECTIONS = ["current", "forecast", "history", "alerts", "marine"]
+
+MAX_HEADLINES = 10
+
+
+@dataclass
+class WeatherFeatures:
+    location: Optional[str] = None
+    condition: Optional[str] = None
+    temp_c: Optional[float] = None
+    wind_kph: Optional[float] = None
+    gust_kph: Optional[float] = None
+    precip_mm: Optional[float] = None
+    visibility_km: Optional[float] = None
+    peak_wind_kph: Optional[float] = None
+    peak_gust_kph: Optional[float] = None
+    total_precip_mm: Optional[float] = None
+    max_chance_of_rain: Optional[float] = None
+    forecast_conditions: List[str] = field(default_factory=list)
+    history_peak_wind_kph: Optional[float] = None
+    history_total_precip_mm: Optional[float] = None
+    active_alerts: int = 0
+    alert_headlines: List[str] = field(default_factory=list)
+    max_wave_height_m: Optional[float] = None
+    max_swell_height_m: Optional[float] = None
+    marine_peak_gust_kph: Optional[float] = None
+    missing_sections: List[str] = field(default_factory=list)
+    stale_sections: List[str] = field(default_factory=list)
+
+
+@dataclass
+class NewsFeatures:
+    total_results: Optional[int] = None
+    headlines: List[dict] = field(default_factory=list)
+
+
+@dataclass
+class CongestionFeatures:
+    port_code: Optional[str] = None
+    level: Optional[str] = None
+    metrics: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class VesselFeatures:
+    vessels: List[dict] = field(default_factory=list)
+
+
+@dataclass
+class SecFilingFeatures:
+    company: Optional[str] = None
+    form_type: Optional[str] = None
+    filed_at: Optional[str] = None
+    period_of_report: Optional[str] = None
+    link: Optional[str] = None
+
+
+def decode_content(result) -> list:
+    """
+    Returns the JSON-decoded content blocks of a model_dump()-ed MCP tool result.
+    """
+    blocks = []
+    for block in (result or {}).get("content") or []:
+        text = block.get("text") if isinstance(block, dict) else None
+        if text is None:
+            continue
+        try:
+            blocks.append(json.loads(text))
+        except (TypeError, ValueError):
+            blocks.append(text)
+    return blocks
+
+
+def _max(values):
+    values = [v for v in values if isinstance(v, (int, float))]
+    return max(values) if values else None
+
+
+def _hours(payload) -> list:
+    days = ((payload or {}).get("forecast") or {}).get("forecastday") or []
+    return [hour for day in days for hour in day.get("hour") or []]
+
+
+def _days(payload) -> list:
+    return [day.get("day") or {} for day in ((payload or {}).get("forecast") or {}).get("forecastday") or []]
+
+
+def extract_weather_features(result) -> WeatherFeatures:
+    blocks = decode_content(result)
+    if len(blocks) == 1 and isinstance(blocks[0], dict) and "section_status" in blocks[0]:
+        return weather_features_from_sections(blocks[0])
+    return weather_features_from_sections(dict(zip(WEATHER_SECTIONS, blocks)))
+
+
+def weather_features_from_sections(sections: dict) -> WeatherFeatures:
+    """
+    Features from the weatherapi responses keyed by section name ("current", "forecast", ...),
+    honouring the server's "section_status" when present.
+    """
+    status = sections.get("section_status") or {}
+    sections = {name: sections[name] for name in WEATHER_SECTIONS if isinstance(sections.get(name), dict)}
+    if status:
+        # sections the caller did not ask for are not missing
+        missing = [name for name, s in status.items() if s.get("status") == "missing"]
+    else:
+        missing = [name for name in WEATHER_SECTIONS if name not in sections]
+    features = WeatherFeatures(
+        missing_sections=missing,
+        stale_sections=[name for name, s in status.items() if s.get("status") == "stale"],
+    )
+
+    current_payload = sections.get("current") or {}
+    current = current_payload.get("current") or {}
+    features.location = (current_payload.get("location") or {}).get("name")
+    features.condition = (current.get("condition") or {}).get("text")
+    features.temp_c = current.get("temp_c")
+    features.wind_kph = current.get("wind_kph")
+    features.gust_kph = current.get("gust_kph")
+    features.precip_mm = current.get("precip_mm")
+    features.visibility_km = current.get("vis_km")
+
+    forecast = sections.get("forecast")
+    if forecast:
+        hours = _hours(forecast)
+        days = _days(forecast)
+        features.peak_wind_kph = _max(h.get("wind_kph") for h in hours) or _max(d.get("maxwind_kph") for d in days)
+        features.peak_gust_kph = _max(h.get("gust_kph") for h in hours)
+        features.total_precip_mm = round(sum(d.get("totalprecip_mm") or 0 for d in days), 2)
+        features.max_chance_of_rain = _max(d.get("daily_chance_of_rain") for d in days)
+        features.forecast_conditions = [(d.get("condition") or {}).get("text") for d in days if d.get("condition")]
+
+    history = sections.get("history")
+    if history:
+        days = _days(history)
+        features.history_peak_wind_kph = _max(d.get("maxwind_kph") for d in days)
+        features.history_total_precip_mm = round(sum(d.get("totalprecip_mm") or 0 for d in days), 2)
+
+    alerts = ((sections.get("alerts") or {}).get("alerts") or {}).get("alert") or []
+    features.active_alerts = len(alerts)
+    features.alert_headlines = [a.get("headline") or a.get("event") for a in alerts if a.get("headline") or a.get("event")]
+
+    marine_hours = _hours(sections.get("marine"))
+    if marine_hours:
+        features.max_wave_height_m = _max(h.get("sig_ht_mt") for h in marine_hours)
+        features.max_swell_height_m = _max(h.get("swell_ht_mt") for h in marine_hours)
+        features.marine_peak_gust_kph = _max(h.get("gust_kph") for h in marine_hours)
+    return features
+
+
+def extract_news_features(result) -> NewsFeatures:
+    return news_features_from_payload(next(iter(decode_content(result)), None))
+
+
+def news_features_from_payload(payload) -> NewsFeatures:
+    payload = payload or {}
+    articles = (payload.get("articles") or []) if isinstance(payload, dict) else []
+    return NewsFeatures(
+        total_results=payload.get("totalResults") if isinstance(payload, dict) else None,
+        headlines=[
+            {
+                "title": article.get("title"),
+                "source": (article.get("source") or {}).get("name"),
+                "published_at": article.get("publishedAt"),
+            }
+            for article in articles[:MAX_HEADLINES]
+        ],
+    )
+
+
+_CONGESTION_KEY = re.compile(r"wait|congestion|anchor|queue|berth|delay|dwell", re.IGNORECASE)
+
+
+def extract_congestion_features(result) -> CongestionFeatures:
+    """
+    Keeps the numeric congestion indicators (waiting time, vessels at anchor,
+    congestion level, ...) wherever they sit in the response.
+    """
+    return congestion_features_from_payload(next(iter(decode_content(result)), None))
+
+
+def congestion_features_from_payload(payload) -> CongestionFeatures:
+    features = CongestionFeatures()
+    metrics = {}
+
+    def walk(value, path):
+        if isinstance(value, dict):
+            for key, child in value.items():
+                if key.lower() in ("portcode", "port_code", "unlocode") and isinstance(child, str):
+                    features.port_code = features.port_code or child
+                elif "congestion" in key.lower() and isinstance(child, str):
+                    features.level = features.level or child
+                walk(child, f"{path}.{key}" if path else key)
+        elif isinstance(value, list):
+            for index, child in enumerate(value[:20]):
+                walk(child, f"{path}[{index}]")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and _CONGESTION_KEY.search(path):
+            metrics[path] = value
+
+    walk(payload, "")
+    features.metrics = metrics
+    return features
+
+
+VESSEL_FIELDS = ("name", "vesselName", "imo", "mmsi", "type", "vesselType", "flag", "status", "destination", "eta")
+
+
+def extract_vessel_features(result) -> VesselFeatures:
+    return vessel_features_from_payload(next(iter(decode_content(result)), None))
+
+
+def vessel_features_from_payload(payload) -> VesselFeatures:
+    if isinstance(payload, dict):
+        payload = next((v for v in payload.values() if isinstance(v, list)), [payload])
+    vessels = payload if isinstance(payload, list) else []
+    return VesselFeatures(vessels=[
+        {key: vessel[key] for key in VESSEL_FIELDS if key in vessel}
+        for vessel in vessels if isinstance(vessel, dict)
+    ])
+
+
+def extract_sec_filing_features(result) -> SecFilingFeatures:
+    return sec_filing_features_from_payload(next(iter(decode_content(result)), None))
+
+
+def sec_filing_features_from_payload(payload) -> SecFilingFeatures:
+    payload = payload or {}
+    filing = next(iter(payload.get("filings") or []), None) if isinstance(payload, dict) else None
+    if not filing:
+        return SecFilingFeatures()
+    return SecFilingFeatures(
+        company=filing.get("companyName"),
+        form_type=filing.get("formType"),
+        filed_at=filing.get("filedAt"),
+        period_of_report=filing.get("periodOfReport"),
+        link=filing.get("linkToFilingDetails") or filing.get("linkToHtml"),
+    )
+
+
+@dataclass
+class BatchFeatures:
+    """
+    Per-location features from a *_batch tool, plus the locations that failed.
+    """
+    locations: Dict[str, dict] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+
+def _batch_features(result, location_features: Callable) -> BatchFeatures:
+    payload = next(iter(decode_content(result)), None)
+    if not isinstance(payload, dict):
+        return BatchFeatures()
+    locations = {}
+    for location, value in (payload.get("results") or {}).items():
+        if isinstance(value, dict) and value.get("mode") == "summary":
+            # called with summary=True, already aggregated server-side
+            locations[location] = value
+        else:
+            locations[location] = asdict(location_features(value))
+    return BatchFeatures(locations=locations, errors=dict(payload.get("errors") or {}))
+
+
+def extract_weather_batch_features(result) -> BatchFeatures:
+    return _batch_features(result, lambda sections: weather_features_from_sections(sections or {}))
+
+
+def extract_congestion_batch_features(result) -> BatchFeatures:
+    return _batch_features(result, congestion_features_from_payload)
+
+
+FEATURE_EXTRACTORS: Dict[str, Callable] = {
+    "get_weather": extract_weather_features,
+    "get_news": extract_news_features,
+    "get_port_congestion": extract_congestion_features,
+    "get_vessel_detail": extract_vessel_features,
+    "get_sec_filing": extract_sec_filing_features,
+    "get_weather_batch": extract_weather_batch_features,
+    "get_port_congestion_batch": extract_congestion_batch_features,
+}
+
+
+def register_extractor(tool_name: str):
+    """
+    Decorator to plug in (or replace) the extractor for a tool.
+    """
+    def decorator(func):
+        FEATURE_EXTRACTORS[tool_name] = func
+        return func
+    return decorator
+
+
+def _is_server_summary(result) -> bool:
+    blocks = decode_content(result)
+    return len(blocks) == 1 and isinstance(blocks[0], dict) and blocks[0].get("mode") == "summary"
+
+
+def extract_features(fetched_data: dict) -> dict:
+    """
+    Turns each tool's raw MCP result into a compact risk-feature record.
+    Tools without an extractor, and failed calls, pass through unchanged so
+    the analysis still sees them.
+    """
+    features = {}
+    for tool_name, result in fetched_data.items():
+        extractor = FEATURE_EXTRACTORS.get(tool_name)
+        if extractor is None or not isinstance(result, dict) or "error" in result:
+            features[tool_name] = result
+        elif result.get("isError"):
+            features[tool_name] = {"error": " ".join(str(b) for b in decode_content(result))}
+        elif _is_server_summary(result):
+            # the tool was called with summary=True and already aggregated server-side
+            features[tool_name] = decode_content(result)[0]
+        else:
+            features[tool_name] = asdict(extractor(result))
+    return features
+
+
+def _serialized_size(value) -> int:
+    """
+    Characters `value` puts into a prompt. MCP tool results are measured by
+    their content text, so the raw payload is never re-serialized just to be
+    measured.
+    """
+    if isinstance(value, dict) and isinstance(value.get("content"), list):
+        return sum(len(block.get("text") or "") for block in value["content"] if isinstance(block, dict))
+    if isinstance(value, dict):
+        return sum(len(str(key)) + _serialized_size(child) for key, child in value.items())
+    return len(compact_json(value))
+
+
+def payload_size_report(raw: dict, compact: dict, compact_text: str = None) -> dict:
+    """
+    Prompt size before/after compaction, with a rough token estimate (~4
+    bytes per token). Sizes are characters, i.e. bytes for ASCII payloads.
+    Pass `compact_text` when the compact payload is already serialized.
+    """
+    raw_bytes = _serialized_size(raw)
+    compact_bytes = len(compact_text if compact_text is not None else compact_json(compact))
+    return {
+        "raw_bytes": raw_bytes,
+        "compact_bytes": compact_bytes,
+        "raw_tokens_est": raw_bytes // 4,
+        "compact_tokens_est": compact_bytes // 4,
+        "reduction_pct": round(100 * (1 - compact_bytes / raw_bytes), 2) if raw_bytes else 0.0,
+    }
@@ -0,0 +1,247 @@
+# risk_prescreen.py
+import os
+import re
+from datetime import datetime, timezone
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+# Headline words that point at an operational disruption
+DEFAULT_KEYWORDS = (
+    "strike", "closure", "closes", "closed", "shutdown", "halt", "crane failure", "collision", "grounding", "fire",
+    "explosion", "cyberattack", "blockade", "embargo", "sanction", "bankruptcy", "recall", "storm", "hurricane",
+    "typhoon", "cyclone", "flood", "earthquake", "tsunami", "derail",
+)
+
+PRESCREEN_MODES = ("on", "shadow", "off")
+
+# congestionLevel values that count as congested
+CONGESTED_LEVELS = ("high", "severe", "critical", "very high")
+
+# Tools whose data carries no risk signal of its own (context for the LLM only)
+UNSCORED_TOOLS = ("get_vessel_detail",)
+
+
+@dataclass
+class PrescreenThresholds:
+    wind_kph: float = 50.0
+    gust_kph: float = 75.0
+    wave_height_m: float = 2.5
+    swell_height_m: float = 2.5
+    congestion_wait_hours: float = 24.0
+    # an 8-K filed within this many days counts as a signal
+    filing_fresh_days: float = 7.0
+    # baseline scores at or above this still go to the LLM
+    llm_threshold: float = 2.0
+    keywords: tuple = DEFAULT_KEYWORDS
+
+    @classmethod
+    def from_env(cls) -> "PrescreenThresholds":
+        """
+        PRESCREEN_WIND_KPH, PRESCREEN_GUST_KPH, PRESCREEN_WAVE_M, PRESCREEN_SWELL_M,
+        PRESCREEN_CONGESTION_WAIT_HOURS, PRESCREEN_8K_DAYS, PRESCREEN_LLM_THRESHOLD and
+        PRESCREEN_KEYWORDS (comma-separated, replaces the defaults).
+        """
+        keywords = os.getenv("PRESCREEN_KEYWORDS")
+        return cls(
+            wind_kph=float(os.getenv("PRESCREEN_WIND_KPH", "50")),
+            gust_kph=float(os.getenv("PRESCREEN_GUST_KPH", "75")),
+            wave_height_m=float(os.getenv("PRESCREEN_WAVE_M", "2.5")),
+            swell_height_m=float(os.getenv("PRESCREEN_SWELL_M", "2.5")),
+            congestion_wait_hours=float(os.getenv("PRESCREEN_CONGESTION_WAIT_HOURS", "24")),
+            filing_fresh_days=float(os.getenv("PRESCREEN_8K_DAYS", "7")),
+            llm_threshold=float(os.getenv("PRESCREEN_LLM_THRESHOLD", "2")),
+            keywords=tuple(k.strip().lower() for k in keywords.split(",") if k.strip()) if keywords else DEFAULT_KEYWORDS,
+        )
+
+
+@dataclass
+class PrescreenResult:
+    """
+    Deterministic verdict on one cycle's features. `risk_score` is a cheap
+    0-10 baseline; `needs_llm` is False only when every source was readable
+    and nothing crossed a threshold.
+    """
+    risk_score: float = 0.0
+    needs_llm: bool = False
+    signals: List[str] = field(default_factory=list)
+    uncertain: List[str] = field(default_factory=list)
+
+    def as_report(self) -> dict:
+        """
+        The report a quiet cycle stands on instead of an LLM assessment.
+        """
+        return {
+            "is_disruption_detected": False,
+            "risk_score": self.risk_score,
+            "confidence": None,
+            "summary": "Pre-screen: no weather, congestion or news signal above its threshold.",
+            "key_findings": [],
+            "prescreen": True,
+        }
+
+
+def _num(value) -> Optional[float]:
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+class RiskPrescreen:
+    """
+    Rule-based first pass over compacted risk features (see
+    risk_features.extract_features) that decides whether a cycle needs the
+    LLM at all.
+
+    Each source adds to the baseline score: a weather alert 4, wind or gusts
+    over threshold 2.5, waves or swell over threshold 2.5, a congested port
+    3, headline keyword hits 1.5 each (at most 3), an 8-K filed in the last
+    `filing_fresh_days` 2. Failed tools, missing weather sections and
+    undated 8-Ks make the cycle uncertain, and uncertain cycles always go to
+    the LLM. Tools in UNSCORED_TOOLS are not scored.
+
+    mode "on" skips the LLM for quiet cycles, "shadow" only scores them (the
+    LLM still runs, so agreement can be measured on every cycle) and "off"
+    disables the pre-screen.
+    """
+    def __init__(self, thresholds: PrescreenThresholds = None, mode: str = "on"):
+        if mode not in PRESCREEN_MODES:
+            raise ValueError(f"mode must be one of {PRESCREEN_MODES}, got '{mode}'")
+        self.thresholds = thresholds or PrescreenThresholds()
+        self.mode = mode
+        self._keyword_pattern = re.compile(
+            r"\b(" + "|".join(re.escape(k) for k in self.thresholds.keywords) + r")", re.IGNORECASE
+        ) if self.thresholds.keywords else None
+        self._stats = {"cycles": 0, "skipped": 0, "uncertain": 0, "compared": 0, "agreed": 0,
+                       "missed_disruptions": 0, "false_alarms": 0}
+
+    @classmethod
+    def from_env(cls) -> "RiskPrescreen":
+        """
+        RISK_PRESCREEN is "on" (default), "shadow" or "off"; thresholds from PrescreenThresholds.from_env.
+        """
+        return cls(PrescreenThresholds.from_env(), mode=os.getenv("RISK_PRESCREEN", "on").strip().lower())
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def score(self, features: dict) -> PrescreenResult:
+        result = PrescreenResult()
+        if not features:
+            result.uncertain.append("no data")
+        for tool_name, value in (features or {}).items():
+            if not isinstance(value, dict) or "error" in value:
+                result.uncertain.append(f"{tool_name} failed")
+                continue
+            if tool_name in UNSCORED_TOOLS:
+                continue
+            scorer = getattr(self, f"_score_{tool_name}", None)
+            if scorer is None:
+                result.uncertain.append(f"no rules for {tool_name}")
+            else:
+                scorer(value, result)
+
+        result.risk_score = round(min(10.0, result.risk_score), 2)
+        result.needs_llm = bool(result.uncertain) or result.risk_score >= self.thresholds.llm_threshold
+        self._stats["cycles"] += 1
+        if result.uncertain:
+            self._stats["uncertain"] += 1
+        return result
+
+    def _score_weather(self, weather: dict, result: PrescreenResult, where: str = ""):
+        t = self.thresholds
+        if weather.get("missing_sections"):
+            result.uncertain.append(f"weather{where} missing {', '.join(weather['missing_sections'])}")
+        if weather.get("active_alerts"):
+            result.risk_score += 4.0
+            result.signals.append(f"{weather['active_alerts']} weather alert(s){where}")
+        wind = max(filter(None, map(_num, (weather.get("wind_kph"), weather.get("peak_wind_kph")))), default=0)
+        gust = max(filter(None, map(_num, (weather.get("gust_kph"), weather.get("peak_gust_kph"),
+                                           weather.get("marine_peak_gust_kph")))), default=0)
+        if wind >= t.wind_kph or gust >= t.gust_kph:
+            result.risk_score += 2.5
+            result.signals.append(f"wind {wind} kph / gusts {gust} kph{where}")
+        wave = _num(weather.get("max_wave_height_m")) or 0
+        swell = _num(weather.get("max_swell_height_m")) or 0
+        if wave >= t.wave_height_m or swell >= t.swell_height_m:
+            result.risk_score += 2.5
+            result.signals.append(f"waves {wave} m / swell {swell} m{where}")
+
+    def _score_congestion(self, congestion: dict, result: PrescreenResult, where: str = ""):
+        waits = [v for path, v in (congestion.get("metrics") or {}).items() if "wait" in path.lower() and _num(v) is not None]
+        level = str(congestion.get("level") or "").lower()
+        if level in CONGESTED_LEVELS or (waits and max(waits) >= self.thresholds.congestion_wait_hours):
+            result.risk_score += 3.0
+            result.signals.append(f"port congestion{where}: level {level or 'n/a'}, wait {max(waits, default=None)} h")
+
+    def _score_batch(self, batch: dict, result: PrescreenResult, scorer):
+        for location, error in (batch.get("errors") or {}).items():
+            result.uncertain.append(f"{location} failed")
+        for location, features in (batch.get("locations") or {}).items():
+            scorer(features, result, where=f" at {location}")
+
+    def _score_get_weather(self, weather: dict, result: PrescreenResult):
+        self._score_weather(weather, result)
+
+    def _score_get_weather_batch(self, batch: dict, result: PrescreenResult):
+        self._score_batch(batch, result, self._score_weather)
+
+    def _score_get_port_congestion(self, congestion: dict, result: PrescreenResult):
+        self._score_congestion(congestion, result)
+
+    def _score_get_port_congestion_batch(self, batch: dict, result: PrescreenResult):
+        self._score_batch(batch, result, self._score_congestion)
+
+    def _score_get_news(self, news: dict, result: PrescreenResult):
+        if self._keyword_pattern is None:
+            return
+        hits = [h.get("title") for h in news.get("headlines") or []
+                if isinstance(h, dict) and h.get("title") and self._keyword_pattern.search(h["title"])]
+        if hits:
+            result.risk_score += min(3.0, 1.5 * len(hits))
+            result.signals.append(f"{len(hits)} headline(s) like '{hits[0]}'")
+
+    def _score_get_sec_filing(self, filing: dict, result: PrescreenResult):
+        # an 8-K reports a material event; periodic filings say nothing about this week
+        if not str(filing.get("form_type") or "").upper().startswith("8-K"):
+            return
+        try:
+            filed_at = datetime.fromisoformat(str(filing["filed_at"]))
+        except (KeyError, TypeError, ValueError):
+            # an 8-K we cannot date may or may not be this week's: let the LLM look
+            result.uncertain.append(f"8-K without a usable filing date ({filing.get('filed_at')})")
+            return
+        if filed_at.tzinfo is None:
+            filed_at = filed_at.replace(tzinfo=timezone.utc)
+        age_days = (datetime.now(timezone.utc) - filed_at).total_seconds() / 86400
+        if age_days <= self.thresholds.filing_fresh_days:
+            result.risk_score += 2.0
+            result.signals.append(f"8-K filed {filing['filed_at']}")
+
+    def record_llm_verdict(self, prescreen: PrescreenResult, report: Optional[dict]):
+        """
+        Compares a pre-screen verdict with the LLM's report for the same cycle.
+        """
+        if report is None or prescreen.uncertain:
+            return
+        detected = bool(report.get("is_disruption_detected"))
+        flagged = prescreen.needs_llm
+        self._stats["compared"] += 1
+        if detected == flagged:
+            self._stats["agreed"] += 1
+        elif detected:
+            self._stats["missed_disruptions"] += 1
+        else:
+            self._stats["false_alarms"] += 1
+
+    def record_skip(self):
+        self._stats["skipped"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        cycles = self._stats["cycles"]
+        compared = self._stats["compared"]
+        return {
+            **self._stats,
+            "mode": self.mode,
+            "skip_rate": round(self._stats["skipped"] / cycles, 4) if cycles else 0.0,
+            "agreement_rate": round(self._stats["agreed"] / compared, 4) if compared else None,
+            "thresholds": {k: v for k, v in asdict(self.thresholds).items() if k != "keywords"},
+        }
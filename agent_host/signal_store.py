@@ -0,0 +1,247 @@
+# signal_store.py
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from llm_json import compact_json
+from tool_planner import port_code_for
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cycles ("
+    " id INTEGER PRIMARY KEY,"
+    " lane_id TEXT,"
+    " port_code TEXT,"
+    " ts REAL NOT NULL,"
+    " risk_score REAL,"
+    " baseline_risk_score REAL,"
+    " disruption INTEGER,"
+    " prescreen INTEGER NOT NULL DEFAULT 0,"
+    " params TEXT,"
+    " report TEXT)",
+    "CREATE INDEX IF NOT EXISTS idx_cycles_port_ts ON cycles(port_code, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_cycles_lane_ts ON cycles(lane_id, ts)",
+    # one row per tool and cycle: compacted features as JSON, the raw result by content hash
+    "CREATE TABLE IF NOT EXISTS signals ("
+    " cycle_id INTEGER NOT NULL REFERENCES cycles(id),"
+    " tool TEXT NOT NULL,"
+    " features TEXT,"
+    " raw_hash BLOB REFERENCES blobs(hash),"
+    " PRIMARY KEY (cycle_id, tool)) WITHOUT ROWID",
+    # raw results zlib-compressed, stored once however many cycles saw them
+    "CREATE TABLE IF NOT EXISTS blobs (hash BLOB PRIMARY KEY, data BLOB NOT NULL)",
+)
+
+
+class SignalStore:
+    """
+    Append-only history of monitoring cycles: the fetched tool results, their
+    compacted features and the risk report, keyed by lane, port and time.
+    Raw results are content-addressed, so a payload that did not change
+    between cycles (a filing, a quiet news feed) is stored once.
+
+    SQLite in WAL mode, so range queries never wait for the writer. `record`
+    only queues the cycle; a background task writes queued cycles in batches
+    (up to `batch_size`, at least every `flush_interval` seconds) on a worker
+    thread, one transaction per batch. When more than `max_pending` cycles
+    are waiting, new ones are dropped and counted rather than slowing the
+    agent down.
+    """
+    def __init__(self, path: str, batch_size: int = 256, flush_interval: float = 1.0, max_pending: int = 10000,
+                 keep_raw: bool = True):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.keep_raw = keep_raw
+        self._write_conn = self._connect(check_same_thread=False)
+        for statement in _SCHEMA:
+            self._write_conn.execute(statement)
+        self._write_conn.commit()
+        self._read_conn = self._connect()
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._stats = {"queued": 0, "written": 0, "dropped": 0, "batches": 0, "write_errors": 0, "write_ms": 0.0,
+                       "blobs_stored": 0, "blobs_deduplicated": 0}
+
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, **kwargs)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: a crash can lose the last batch, never corrupt the file
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @classmethod
+    def from_env(cls) -> Optional["SignalStore"]:
+        """
+        SIGNAL_STORE_PATH enables the store (None when unset);
+        SIGNAL_STORE_BATCH, SIGNAL_STORE_FLUSH_SECONDS and SIGNAL_STORE_KEEP_RAW
+        ("0" keeps only features and reports) tune it.
+        """
+        path = os.getenv("SIGNAL_STORE_PATH")
+        if not path:
+            return None
+        return cls(
+            path,
+            batch_size=int(os.getenv("SIGNAL_STORE_BATCH", "256")),
+            flush_interval=float(os.getenv("SIGNAL_STORE_FLUSH_SECONDS", "1")),
+            keep_raw=os.getenv("SIGNAL_STORE_KEEP_RAW", "1") != "0",
+        )
+
+    def record(self, lane_id: Optional[str], params: dict, raw_data: dict, features: Optional[dict],
+               report: Optional[dict], ts: float = None):
+        """
+        Queues one cycle for writing and returns immediately. Serialization
+        happens on the writer thread, so callers must not mutate the dicts
+        afterwards. `report` is None when the assessment failed.
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._writer = asyncio.create_task(self._write_loop())
+        if self._queue.qsize() >= self.max_pending:
+            self._stats["dropped"] += 1
+            return
+        self._queue.put_nowait((lane_id, params, raw_data, features, report, time.time() if ts is None else ts))
+        self._stats["queued"] += 1
+
+    async def _write_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                self._stats["write_errors"] += 1
+                print(f"[Agent] Could not write {len(batch)} cycle(s) to the signal store: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch: list):
+        started = time.perf_counter()
+        with self._write_conn:
+            for lane_id, params, raw_data, features, report, ts in batch:
+                report = report or {}
+                cursor = self._write_conn.execute(
+                    "INSERT INTO cycles (lane_id, port_code, ts, risk_score, baseline_risk_score, disruption,"
+                    " prescreen, params, report) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (lane_id, port_code_for(params), ts, report.get("risk_score"), report.get("baseline_risk_score"),
+                     int(bool(report.get("is_disruption_detected"))) if report else None,
+                     int(bool(report.get("prescreen"))), compact_json(params or {}),
+                     compact_json(report) if report else None),
+                )
+                rows = []
+                for tool in sorted(set(raw_data or {}) | set(features or {})):
+                    raw_hash = None
+                    if self.keep_raw and raw_data and tool in raw_data:
+                        raw_hash = self._store_blob(compact_json(raw_data[tool]).encode())
+                    rows.append((cursor.lastrowid, tool,
+                                 compact_json(features[tool]) if features and tool in features else None, raw_hash))
+                self._write_conn.executemany(
+                    "INSERT INTO signals (cycle_id, tool, features, raw_hash) VALUES (?, ?, ?, ?)", rows)
+        self._stats["batches"] += 1
+        self._stats["written"] += len(batch)
+        self._stats["write_ms"] += (time.perf_counter() - started) * 1000
+
+    def _store_blob(self, data: bytes) -> bytes:
+        digest = hashlib.sha256(data).digest()
+        # compressing is most of the write cost; payloads seen before skip it
+        if self._write_conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone() is None:
+            self._write_conn.execute("INSERT INTO blobs (hash, data) VALUES (?, ?)", (digest, zlib.compress(data)))
+            self._stats["blobs_stored"] += 1
+        else:
+            self._stats["blobs_deduplicated"] += 1
+        return digest
+
+    async def flush(self):
+        """
+        Waits until every queued cycle has been written.
+        """
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self):
+        await self.flush()
+        if self._writer is not None:
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+        self._read_conn.close()
+        self._write_conn.close()
+
+    def risk_series(self, port_code: str = None, lane_id: str = None, since: float = None,
+                    until: float = None) -> List[dict]:
+        """
+        Risk scores over time for a port (UN/LOCODE) or a lane, oldest first,
+        e.g. risk_series("USBAL", since=time.time() - 30 * 86400).
+        """
+        if (port_code is None) == (lane_id is None):
+            raise ValueError("pass exactly one of port_code or lane_id")
+        column, key = ("port_code", port_code.upper()) if port_code else ("lane_id", lane_id)
+        rows = self._read_conn.execute(
+            f"SELECT id, ts, lane_id, port_code, risk_score, baseline_risk_score, disruption, prescreen FROM cycles"
+            f" WHERE {column} = ? AND ts >= ? AND ts < ? ORDER BY ts",
+            (key, since if since is not None else float("-inf"), until if until is not None else float("inf")),
+        ).fetchall()
+        return [{"cycle_id": r[0], "ts": r[1], "lane_id": r[2], "port_code": r[3], "risk_score": r[4],
+                 "baseline_risk_score": r[5], "disruption": None if r[6] is None else bool(r[6]),
+                 "prescreen": bool(r[7])} for r in rows]
+
+    def cycle_data(self, cycle_id: int) -> Dict[str, dict]:
+        """
+        One stored cycle's tool results, in the shape _fetch_data returned
+        them (features stand in for tools whose raw result was not kept).
+        """
+        data = {}
+        for tool, features, raw in self._read_conn.execute(
+                "SELECT s.tool, s.features, b.data FROM signals s LEFT JOIN blobs b ON b.hash = s.raw_hash"
+                " WHERE s.cycle_id = ?", (cycle_id,)):
+            data[tool] = json.loads(zlib.decompress(raw)) if raw is not None else json.loads(features)
+        return data
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "write_ms": round(self._stats["write_ms"], 2),
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+
+def main():
+    import argparse
+    from datetime import datetime, timezone
+
+    parser = argparse.ArgumentParser(description="Risk score history from a signal store.")
+    parser.add_argument("key", help="port UN/LOCODE, e.g. USBAL, or a lane id with --lane")
+    parser.add_argument("--lane", action="store_true", help="treat KEY as a lane id")
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--path", default=os.getenv("SIGNAL_STORE_PATH", "signals.db"))
+    args = parser.parse_args()
+
+    store = SignalStore(args.path)
+    since = time.time() - args.days * 86400
+    started = time.perf_counter()
+    series = store.risk_series(lane_id=args.key, since=since) if args.lane else store.risk_series(args.key, since=since)
+    query_ms = (time.perf_counter() - started) * 1000
+    for point in series:
+        stamp = datetime.fromtimestamp(point["ts"], tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
+        flag = " DISRUPTION" if point["disruption"] else ""
+        print(f"{stamp}  {point['lane_id'] or '-':<24} risk {point['risk_score']}{flag}")
+    print(f"{len(series)} cycle(s) over {args.days:g} days in {query_ms:.1f} ms")
+    store._read_conn.close()
+    store._write_conn.close()
+
+
+if __name__ == "__main__":
+    main()
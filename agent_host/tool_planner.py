@@ -0,0 +1,200 @@
+# tool_planner.py
+import re
+from datetime import date, timedelta
+
+# Ports we monitor, by name and UN/LOCODE. Lets the planner go from an
+# orchestrator "port" value to both a weather city and a congestion port code.
+KNOWN_PORTS = {
+    "baltimore": ("Baltimore", "USBAL"),
+    "los angeles": ("Los Angeles", "USLAX"),
+    "long beach": ("Long Beach", "USLGB"),
+    "new york": ("New York", "USNYC"),
+    "savannah": ("Savannah", "USSAV"),
+    "houston": ("Houston", "USHOU"),
+    "seattle": ("Seattle", "USSEA"),
+    "oakland": ("Oakland", "USOAK"),
+    "charleston": ("Charleston", "USCHS"),
+    "norfolk": ("Norfolk", "USORF"),
+    "rotterdam": ("Rotterdam", "NLRTM"),
+    "antwerp": ("Antwerp", "BEANR"),
+    "hamburg": ("Hamburg", "DEHAM"),
+    "felixstowe": ("Felixstowe", "GBFXT"),
+    "shanghai": ("Shanghai", "CNSHA"),
+    "shenzhen": ("Shenzhen", "CNSZX"),
+    "ningbo": ("Ningbo", "CNNGB"),
+    "busan": ("Busan", "KRPUS"),
+    "singapore": ("Singapore", "SGSIN"),
+    "dubai": ("Dubai", "AEJEA"),
+}
+PORTS_BY_CODE = {code: city for city, code in KNOWN_PORTS.values()}
+
+# shipment_type wording -> vessel_type accepted by get_port_congestion
+VESSEL_TYPES = {
+    "tanker": "tanker", "oil": "tanker", "crude": "tanker", "lng": "tanker", "chemical": "tanker",
+    "roro": "roro", "ro-ro": "roro", "vehicle": "roro", "car": "roro", "automotive": "roro",
+}
+DEFAULT_VESSEL_TYPE = "cargo"
+
+DEFAULT_NEWS_TOPICS = ["port congestion", "supply chain disruption"]
+
+PLANNER_MODES = ("rules", "llm", "auto")
+
+_LOCODE = re.compile(r"^[A-Z]{2}[A-Z2-9]{3}$")
+
+
+def _first(params: dict, *keys):
+    for key in keys:
+        value = params.get(key)
+        if value:
+            return value
+    return None
+
+
+def _as_list(value) -> list:
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(v) for v in value if v]
+
+
+def _resolve_location(params: dict):
+    """
+    Returns (city, port_code) from whichever location fields are present.
+    """
+    city = _first(params, "weather_city", "city")
+    port_code = _first(params, "port_code")
+    port = _first(params, "port", "port_name")
+
+    if isinstance(port, str):
+        if _LOCODE.match(port.strip()):
+            port_code = port_code or port.strip()
+        else:
+            known = KNOWN_PORTS.get(port.strip().lower())
+            city = city or (known[0] if known else port.strip())
+            port_code = port_code or (known[1] if known else None)
+
+    if port_code and not city:
+        city = PORTS_BY_CODE.get(port_code.upper())
+    if city and not port_code:
+        known = KNOWN_PORTS.get(city.strip().lower())
+        port_code = known[1] if known else None
+    return city, port_code
+
+
+def port_code_for(params: dict):
+    """
+    The UN/LOCODE the params point at (from port_code, port or city), or None.
+    """
+    if not isinstance(params, dict):
+        return None
+    port_code = _resolve_location(params)[1]
+    return port_code.upper() if port_code else None
+
+
+def lane_location(params: dict):
+    """
+    (city, UN/LOCODE) the params point at; either may be None.
+    """
+    if not isinstance(params, dict):
+        return None, None
+    city, port_code = _resolve_location(params)
+    return city, port_code.upper() if port_code else None
+
+
+def _vessel_type(params: dict) -> str:
+    shipment_type = str(_first(params, "vessel_type", "shipment_type") or "").lower()
+    for word, vessel_type in VESSEL_TYPES.items():
+        # whole words only: "car" must not match "cargo" or "carrier"
+        if re.search(rf"\b{re.escape(word)}\b", shipment_type):
+            return vessel_type
+    return DEFAULT_VESSEL_TYPE
+
+
+def _tool_call(name: str, arguments: dict) -> dict:
+    return {"function": {"name": name, "arguments": arguments}}
+
+
+def plan_tool_calls(params: dict, today: date = None):
+    """
+    Deterministically maps structured orchestrator params onto MCP tool calls.
+
+    Args:
+        params (dict): parsed_data from the orchestrator (port, city, suppliers,
+            companies, ...) or the monitoring params used by main_agent_loop.
+        today (date): Reference date for the weather history lookup.
+
+    Returns:
+        list or None: Tool calls in the same {"function": {"name", "arguments"}}
+            shape the LLM planner produces, or None when the input is too
+            ambiguous to plan without the LLM.
+    """
+    if not isinstance(params, dict):
+        return None
+
+    today = today or date.today()
+    city, port_code = _resolve_location(params)
+    vessel = _first(params, "vessel_identifier", "vessel", "vessel_name", "vesselNameOrCode")
+    cik = _first(params, "cik_company", "cik")
+
+    tool_calls = []
+    if city:
+        tool_calls.append(_tool_call("get_weather", {
+            "city": city,
+            "history_date": (today - timedelta(days=5)).isoformat(),
+        }))
+    if port_code:
+        tool_calls.append(_tool_call("get_port_congestion", {
+            "port_code": port_code.upper(),
+            "vessel_type": _vessel_type(params),
+        }))
+    if vessel:
+        tool_calls.append(_tool_call("get_vessel_detail", {"vesselNameOrCode": str(vessel)}))
+    if cik and str(cik).strip().isdigit():
+        tool_calls.append(_tool_call("get_sec_filing", {"cik_company": str(cik).strip()}))
+
+    # Nothing to anchor the news query or any other tool on: let the LLM decide
+    if not tool_calls:
+        return None
+
+    keywords = _as_list(params.get("news_keywords"))
+    if not keywords:
+        keywords = [f"{city} port"] if city else []
+        keywords += _as_list(params.get("suppliers")) + _as_list(params.get("companies_involved"))
+        keywords += _as_list(params.get("events")) or DEFAULT_NEWS_TOPICS
+    # get_news takes its keyword list as `news`
+    tool_calls.append(_tool_call("get_news", {"news": list(dict.fromkeys(keywords))}))
+    return tool_calls
+
+
+def plan_fleet_calls(params_list: list, today: date = None, max_locations: int = 100) -> list:
+    """
+    Batched weather and congestion calls covering every lane's port, for the
+    fleet-wide risk sweep (see fleet_features.FleetFeatureEngine). Weather is
+    limited to the forecast, alerts and marine sections the sweep reads;
+    locations are split into calls of at most `max_locations` (the server's
+    BATCH_MAX_LOCATIONS default).
+    """
+    today = today or date.today()
+    cities, port_codes = {}, {}
+    for params in params_list:
+        city, port_code = lane_location(params)
+        if city:
+            cities[city] = None
+        if port_code:
+            port_codes[port_code] = None
+    cities, port_codes = list(cities), list(port_codes)
+
+    tool_calls = []
+    for start in range(0, len(cities), max_locations):
+        tool_calls.append(_tool_call("get_weather_batch", {
+            "cities": cities[start:start + max_locations],
+            "history_date": (today - timedelta(days=5)).isoformat(),
+            "sections": ["forecast", "alerts", "marine"],
+        }))
+    for start in range(0, len(port_codes), max_locations):
+        tool_calls.append(_tool_call("get_port_congestion_batch", {
+            "port_codes": port_codes[start:start + max_locations],
+            "vessel_type": DEFAULT_VESSEL_TYPE,
+        }))
+    return tool_calls
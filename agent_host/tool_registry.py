@@ -0,0 +1,254 @@
+# tool_registry.py
+import asyncio
+import copy
+import difflib
+import hashlib
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from jsonschema import Draft202012Validator
+
+from llm_json import compact_json
+
+# Server error texts that mean our copy of the schemas is out of date
+_SCHEMA_ERROR = re.compile(r"validation error|unknown tool|missing required argument", re.IGNORECASE)
+_WORDS = re.compile(r"[A-Z]?[a-z0-9]+|[A-Z]+(?![a-z])")
+
+
+@dataclass
+class ToolCallCheck:
+    """
+    Outcome of checking one planned call against the server's schema:
+    the (possibly repaired) call, what was repaired, and why it was
+    rejected if it could not be made valid.
+    """
+    name: str
+    arguments: dict
+    repairs: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _allowed_types(schema: dict) -> set:
+    if "type" in schema:
+        types = schema["type"]
+        return set(types) if isinstance(types, list) else {types}
+    return {t for option in schema.get("anyOf") or [] for t in _allowed_types(option)}
+
+
+def _coerce(value, schema: dict):
+    """
+    Fixes the type mistakes planners make: a bare string for a list, a
+    one-item list for a string, numbers and booleans written as strings.
+    Returns the value unchanged when nothing applies.
+    """
+    types = _allowed_types(schema)
+    if not types or ("null" in types and value is None):
+        return value
+    if isinstance(value, str):
+        if "string" in types:
+            return value
+        if "array" in types:
+            return [value]
+        if "boolean" in types and value.strip().lower() in ("true", "false"):
+            return value.strip().lower() == "true"
+        if "integer" in types and re.fullmatch(r"-?\d+", value.strip()):
+            return int(value)
+        if "number" in types:
+            try:
+                return float(value)
+            except ValueError:
+                return value
+        return value
+    if isinstance(value, list) and "array" not in types and "string" in types and len(value) == 1:
+        return str(value[0])
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and "string" in types and not types & {"integer", "number"}:
+        return str(value)
+    return value
+
+
+def _fits(value, schema: dict) -> bool:
+    return Draft202012Validator(schema).is_valid(value)
+
+
+class ToolSchemaRegistry:
+    """
+    The MCP server's tool schemas, fetched once with list_tools and reused
+    for every planning prompt and every planned call.
+
+    The schema set is versioned by an ETag-like content hash. After `ttl`
+    seconds, or when the server rejects a call in a way that suggests the
+    schemas moved on (`note_tool_error`), the next `ensure_loaded()` lists
+    the tools again. Derived artifacts (validators, the planner's function
+    definitions) are only rebuilt when the hash changed.
+    """
+    def __init__(self, session_pool, ttl: float = 300.0):
+        self.session_pool = session_pool
+        self.ttl = ttl
+        self.etag = None
+        self.tools: Dict[str, dict] = {}
+        self.fetched_at = 0.0
+        self._validators: Dict[str, Draft202012Validator] = {}
+        self._definitions_json = None
+        self._lock = asyncio.Lock()
+        self._stats = {"fetches": 0, "fetch_failures": 0, "schema_changes": 0, "invalidations": 0,
+                       "checked": 0, "repaired": 0, "rejected": 0}
+
+    @classmethod
+    def from_env(cls, session_pool) -> "ToolSchemaRegistry":
+        """
+        TOOL_SCHEMA_TTL is in seconds.
+        """
+        return cls(session_pool, ttl=float(os.getenv("TOOL_SCHEMA_TTL", "300")))
+
+    @property
+    def loaded(self) -> bool:
+        return self.etag is not None
+
+    async def ensure_loaded(self) -> bool:
+        """
+        Lists the tools if the cache is empty or expired. Returns whether
+        schemas are available; a failed refresh keeps the previous version.
+        """
+        if self.loaded and time.monotonic() - self.fetched_at < self.ttl:
+            return True
+        async with self._lock:
+            # another caller may have refreshed while we waited
+            if not self.loaded or time.monotonic() - self.fetched_at >= self.ttl:
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    self._stats["fetch_failures"] += 1
+                    # back off for a full ttl instead of re-listing on every call
+                    self.fetched_at = time.monotonic()
+                    print(f"[Agent]   - Could not list MCP tools ({e}); "
+                          f"{'keeping schema version ' + self.etag if self.loaded else 'calls go out unchecked'}.")
+        return self.loaded
+
+    async def refresh(self):
+        tools, cursor = [], None
+        async with self.session_pool.session() as session:
+            while True:
+                result = await session.list_tools(cursor) if cursor else await session.list_tools()
+                tools += result.tools
+                cursor = result.nextCursor
+                if not cursor:
+                    break
+        self._stats["fetches"] += 1
+        self.fetched_at = time.monotonic()
+
+        schemas = {tool.name: {"name": tool.name, "description": tool.description or "", "inputSchema": tool.inputSchema}
+                   for tool in tools}
+        etag = hashlib.sha256(compact_json(sorted(schemas.items())).encode()).hexdigest()[:16]
+        if etag == self.etag:
+            return
+        self._stats["schema_changes"] += 1
+        self.tools = schemas
+        self._validators = {name: Draft202012Validator(tool["inputSchema"]) for name, tool in schemas.items()}
+        self._definitions_json = None
+        print(f"[Agent]   - Loaded {len(schemas)} MCP tool schema(s), version {etag}"
+              f"{' (was ' + self.etag + ')' if self.etag else ''}.")
+        self.etag = etag
+
+    def invalidate(self):
+        """
+        Forces the next ensure_loaded() to list the tools again.
+        """
+        self._stats["invalidations"] += 1
+        self.fetched_at = 0.0
+
+    def note_tool_error(self, error_text: str):
+        if self.loaded and _SCHEMA_ERROR.search(error_text or ""):
+            self.invalidate()
+
+    def definitions_json(self) -> str:
+        """
+        The tools as OpenAI-style function definitions, compact JSON, for the
+        planner prompt. Built once per schema version; pydantic's "title"
+        keys are dropped and descriptions squeezed to save prompt tokens.
+        """
+        if self._definitions_json is None:
+            definitions = []
+            for name in sorted(self.tools):
+                tool = self.tools[name]
+                parameters = copy.deepcopy(tool["inputSchema"])
+                parameters.pop("title", None)
+                for prop in (parameters.get("properties") or {}).values():
+                    prop.pop("title", None)
+                definitions.append({"type": "function", "function": {
+                    "name": name, "description": " ".join(tool["description"].split()), "parameters": parameters,
+                }})
+            self._definitions_json = compact_json(definitions)
+        return self._definitions_json
+
+    def check(self, name: str, arguments) -> ToolCallCheck:
+        """
+        Validates a planned call against the cached schema, repairing what
+        can be repaired locally: a misspelled tool or argument name, an
+        argument under a wrong name that clearly belongs to a missing
+        required one (`news_keywords` -> `news`), unknown arguments (dropped)
+        and simple type mistakes. Calls that are still invalid are rejected.
+        """
+        self._stats["checked"] += 1
+        check = ToolCallCheck(name=name, arguments=dict(arguments) if isinstance(arguments, dict) else {})
+        if not isinstance(arguments, dict):
+            return self._reject(check, f"arguments for '{name}' must be an object")
+
+        if name not in self.tools:
+            match = difflib.get_close_matches(name or "", self.tools, n=1, cutoff=0.8)
+            if not match:
+                return self._reject(check, f"unknown tool '{name}'")
+            check.name = match[0]
+            check.repairs.append(f"tool '{name}' -> '{check.name}'")
+
+        schema = self.tools[check.name]["inputSchema"]
+        properties = schema.get("properties") or {}
+        args = check.arguments
+        for key in [k for k in args if k not in properties]:
+            target = self._match_property(key, args[key], properties, args, schema.get("required") or [])
+            value = args.pop(key)
+            if target:
+                args[target] = value
+                check.repairs.append(f"argument '{key}' -> '{target}'")
+            else:
+                check.repairs.append(f"dropped unknown argument '{key}'")
+        for key, value in args.items():
+            coerced = _coerce(value, properties[key])
+            if coerced is not value:
+                args[key] = coerced
+                check.repairs.append(f"'{key}' coerced to {type(coerced).__name__}")
+
+        errors = sorted(self._validators[check.name].iter_errors(args), key=lambda e: list(e.path))
+        if errors:
+            return self._reject(check, "; ".join(e.message for e in errors[:3]))
+        if check.repairs:
+            self._stats["repaired"] += 1
+        return check
+
+    @staticmethod
+    def _match_property(key: str, value, properties: dict, args: dict, required: list) -> Optional[str]:
+        free = [p for p in properties if p not in args]
+        close = difflib.get_close_matches(key, free, n=1, cutoff=0.75)
+        if close:
+            return close[0]
+        words = {w.lower() for w in _WORDS.findall(key)}
+        by_word = [p for p in free if p.lower() in words]
+        if len(by_word) == 1:
+            return by_word[0]
+        # last resort: the one missing required argument this value already fits
+        missing = [p for p in required if p not in args and _fits(value, properties[p])]
+        return missing[0] if len(missing) == 1 else None
+
+    def _reject(self, check: ToolCallCheck, error: str) -> ToolCallCheck:
+        self._stats["rejected"] += 1
+        check.error = error
+        return check
+
+    def stats(self) -> dict:
+        return {**self._stats, "version": self.etag, "tools": len(self.tools)}
@@ -0,0 +1,239 @@
+# tracing.py
+import bisect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+# Histogram bucket upper bounds, in milliseconds
+DEFAULT_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+_current_span: ContextVar = ContextVar("current_span", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_time: float = field(default_factory=time.time)
+    duration_ms: float = 0.0
+    status: str = "ok"
+    attributes: Dict[str, object] = field(default_factory=dict)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error: str):
+        self.status = "error"
+        self.attributes["error"] = error
+
+    def set_usage(self, response):
+        """
+        Copies token counts from an OpenAI chat completion's `usage`.
+        """
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        self.attributes.update({
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "total_tokens": getattr(usage, "total_tokens", None),
+        })
+
+
+class _NoopSpan:
+    """
+    Handed out when tracing is disabled, so instrumented code pays for one
+    attribute lookup and nothing else.
+    """
+    def set(self, **attributes):
+        pass
+
+    def fail(self, error: str):
+        pass
+
+    def set_usage(self, response):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class MemoryHistogramSink:
+    """
+    Per-span-name latency histograms plus summed numeric attributes (token
+    counts, payload bytes), with recent samples kept for percentiles.
+    """
+    def __init__(self, buckets_ms=DEFAULT_BUCKETS_MS, max_samples: int = 1024):
+        self.buckets_ms = tuple(buckets_ms)
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._series: Dict[str, dict] = {}
+
+    def export(self, span: Span):
+        with self._lock:
+            series = self._series.get(span.name)
+            if series is None:
+                series = self._series[span.name] = {
+                    "count": 0, "errors": 0, "sum_ms": 0.0,
+                    "buckets": [0] * (len(self.buckets_ms) + 1),
+                    "samples": deque(maxlen=self.max_samples),
+                    "totals": {},
+                }
+            series["count"] += 1
+            series["errors"] += span.status != "ok"
+            series["sum_ms"] += span.duration_ms
+            series["buckets"][bisect.bisect_left(self.buckets_ms, span.duration_ms)] += 1
+            series["samples"].append(span.duration_ms)
+            for key, value in span.attributes.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    series["totals"][key] = series["totals"].get(key, 0) + value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {}
+            for name, series in self._series.items():
+                samples = sorted(series["samples"])
+                result[name] = {
+                    "count": series["count"],
+                    "errors": series["errors"],
+                    "mean_ms": round(series["sum_ms"] / series["count"], 2),
+                    "p50_ms": round(_percentile(samples, 50), 2),
+                    "p95_ms": round(_percentile(samples, 95), 2),
+                    "p99_ms": round(_percentile(samples, 99), 2),
+                    "buckets_ms": dict(zip([str(b) for b in self.buckets_ms] + ["+Inf"], series["buckets"])),
+                    "totals": dict(series["totals"]),
+                }
+            return result
+
+    def close(self):
+        pass
+
+
+class JsonlFileSink:
+    """
+    Appends one JSON object per finished span to `path`.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", buffering=1)
+
+    def export(self, span: Span):
+        line = json.dumps(asdict(span), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * pct / 100)))]
+
+
+class Tracer:
+    """
+    Minimal span tracer for the agent pipeline. Spans nest through a
+    contextvar, so concurrent workflows (one task each) get separate traces.
+    With no sinks attached, span() returns a shared no-op and records nothing.
+    """
+    def __init__(self, sinks: list = None):
+        self.sinks = list(sinks or [])
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """
+        TRACE_SINKS is a comma list of "memory" and/or "jsonl";
+        TRACE_JSONL_PATH sets the jsonl file (default traces.jsonl).
+        """
+        sinks = []
+        for name in filter(None, (s.strip().lower() for s in os.getenv("TRACE_SINKS", "").split(","))):
+            if name == "memory":
+                sinks.append(MemoryHistogramSink())
+            elif name == "jsonl":
+                sinks.append(JsonlFileSink(os.getenv("TRACE_JSONL_PATH", "traces.jsonl")))
+            else:
+                print(f"[Tracing] Unknown trace sink '{name}', ignoring it.")
+        return cls(sinks)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sinks)
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink):
+        self.sinks.remove(sink)
+
+    def sink(self, sink_type):
+        return next((s for s in self.sinks if isinstance(s, sink_type)), None)
+
+    @contextmanager
+    def _span(self, name: str, attributes: dict):
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes,
+        )
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.attributes.setdefault("error", type(e).__name__)
+            raise
+        finally:
+            span.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            _current_span.reset(token)
+            for sink in self.sinks:
+                try:
+                    sink.export(span)
+                except Exception as e:
+                    print(f"[Tracing] Sink {type(sink).__name__} failed: {e}")
+
+    def span(self, name: str, **attributes):
+        """
+        Context manager timing one pipeline stage, e.g.
+
+            with tracer.span("analysis.llm", prompt_bytes=len(data_str)) as span:
+                response = await client.chat.completions.create(...)
+                span.set_usage(response)
+        """
+        if not self.sinks:
+            return _NoopContext
+        return self._span(name, attributes)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+class _NoopContextManager:
+    def __enter__(self):
+        return _NOOP_SPAN
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NoopContext = _NoopContextManager()
+
+# Process-wide tracer used by the agents; attach sinks with TRACE_SINKS or add_sink()
+tracer = Tracer.from_env()
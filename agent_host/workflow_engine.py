@@ -0,0 +1,128 @@
+# workflow_engine.py
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from tracing import tracer
+
+
+class StepSkipped(Exception):
+    """
+    Raised by a step that has nothing to do (e.g. no disruption was detected);
+    steps that depend on it are skipped too.
+    """
+
+
+@dataclass
+class WorkflowStep:
+    """
+    One node of a workflow graph.
+
+    `run` is awaited with a dict of the outputs of its dependencies, keyed by
+    step name. A step starts as soon as everything in `depends_on` succeeded
+    and is skipped if any of them did not. `after` steps are waited for but
+    optional: their output is passed when they succeeded, None otherwise.
+    """
+    name: str
+    run: Callable[[Dict[str, Any]], Awaitable[Any]]
+    depends_on: Tuple[str, ...] = ()
+    after: Tuple[str, ...] = ()
+
+
+@dataclass
+class StepResult:
+    status: str  # "ok", "skipped" or "failed"
+    output: Any = None
+    error: Optional[str] = None
+    # relative to the start of the workflow
+    started_ms: Optional[float] = None
+    duration_ms: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {"status": self.status, "error": self.error, "started_ms": self.started_ms,
+                "duration_ms": self.duration_ms}
+
+
+class WorkflowEngine:
+    """
+    Runs a DAG of WorkflowSteps, every step in its own task, so independent
+    steps run concurrently and each one starts the moment its inputs exist.
+    """
+    def __init__(self, steps: List[WorkflowStep]):
+        self.steps = self._topological_order(steps)
+
+    @staticmethod
+    def _topological_order(steps: List[WorkflowStep]) -> List[WorkflowStep]:
+        by_name = {}
+        for step in steps:
+            if step.name in by_name:
+                raise ValueError(f"Duplicate workflow step '{step.name}'")
+            by_name[step.name] = step
+        for step in steps:
+            for dependency in step.depends_on + step.after:
+                if dependency not in by_name:
+                    raise ValueError(f"Step '{step.name}' depends on unknown step '{dependency}'")
+
+        ordered, done, visiting = [], set(), set()
+
+        def visit(step):
+            if step.name in done:
+                return
+            if step.name in visiting:
+                raise ValueError(f"Workflow has a dependency cycle through '{step.name}'")
+            visiting.add(step.name)
+            for dependency in step.depends_on + step.after:
+                visit(by_name[dependency])
+            visiting.discard(step.name)
+            done.add(step.name)
+            ordered.append(step)
+
+        for step in steps:
+            visit(step)
+        return ordered
+
+    async def run(self) -> Dict[str, StepResult]:
+        started = time.perf_counter()
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_step(step: WorkflowStep) -> StepResult:
+            waits = [tasks[name] for name in step.depends_on + step.after]
+            if waits:
+                await asyncio.wait(waits)
+
+            inputs = {}
+            for name in step.depends_on:
+                result = tasks[name].result()
+                if result.status != "ok":
+                    return StepResult("skipped", error=f"'{name}' {result.status}")
+                inputs[name] = result.output
+            for name in step.after:
+                result = tasks[name].result()
+                inputs[name] = result.output if result.status == "ok" else None
+
+            step_started = time.perf_counter()
+            with tracer.span(f"step.{step.name}") as span:
+                try:
+                    output = await step.run(inputs)
+                    result = StepResult("ok", output=output)
+                except StepSkipped as e:
+                    result = StepResult("skipped", error=str(e))
+                    span.set(skipped=str(e))
+                except Exception as e:
+                    result = StepResult("failed", error=f"{type(e).__name__}: {e}")
+                    span.fail(result.error)
+                    print(f"[Workflow] Step '{step.name}' failed: {result.error}")
+            result.started_ms = round((step_started - started) * 1000, 2)
+            result.duration_ms = round((time.perf_counter() - step_started) * 1000, 2)
+            return result
+
+        # dependencies come first, so their tasks exist when a dependent starts
+        for step in self.steps:
+            tasks[step.name] = asyncio.create_task(run_step(step))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        return {name: task.result() for name, task in tasks.items()}
@@ -0,0 +1,57 @@
+# bench_compaction.py
+"""
+Prompt-size reduction from the risk-feature extraction stage.
+
+    python benchmarks/bench_compaction.py [--payloads DIR] [--count N] [--json]
+
+DIR holds recorded fetched_data dumps (*.json); without it synthetic
+weatherapi/NewsAPI-shaped payloads are used.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent_host"))
+
+from risk_features import extract_features, payload_size_report
+from sample_payloads import load_payloads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payloads", help="directory of recorded fetched_data *.json dumps")
+    parser.add_argument("--count", type=int, default=20, help="synthetic payloads when --payloads is not given")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.payloads, args.count)
+
+    reports = []
+    started = time.perf_counter()
+    for payload in payloads:
+        reports.append(payload_size_report(payload, extract_features(payload)))
+    extract_ms = (time.perf_counter() - started) * 1000 / len(payloads)
+
+    raw_bytes = sum(r["raw_bytes"] for r in reports)
+    compact_bytes = sum(r["compact_bytes"] for r in reports)
+    summary = {
+        "payloads": len(payloads),
+        "avg_raw_bytes": raw_bytes // len(reports),
+        "avg_compact_bytes": compact_bytes // len(reports),
+        "avg_raw_tokens_est": raw_bytes // len(reports) // 4,
+        "avg_compact_tokens_est": compact_bytes // len(reports) // 4,
+        "reduction_pct": round(100 * (1 - compact_bytes / raw_bytes), 2),
+        "avg_extract_ms": round(extract_ms, 3),
+    }
+
+    if args.json:
+        print(json.dumps(summary))
+    else:
+        for key, value in summary.items():
+            print(f"{key:>24}: {value}")
+
+
+if __name__ == "__main__":
+    main()
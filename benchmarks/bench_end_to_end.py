@@ -0,0 +1,307 @@
+# bench_end_to_end.py
+"""
+End-to-end workflow latency and throughput, fully offline.
+
+Starts the local upstream/LLM stand-ins (mock_upstreams.py) in-process and the
+real MCP server (mcp_server/risk_intel_server.py) as a subprocess pointed at
+them, then runs N workflows through OrchestratorAgent.execute_workflow (the
+detection, impact and response agents, run as a dependency graph) at
+concurrency C.
+
+    python benchmarks/bench_end_to_end.py [--workflows 40] [--concurrency 8] [--json] [--output FILE]
+
+Reports p50/p95/p99 workflow latency, throughput and a per-stage breakdown
+(orchestrator parse, tool planning, tool fan-out, compaction, risk analysis,
+impact assessment, response planning)
+taken from the agents' tracer spans.
+"""
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import httpx
+import uvicorn
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, os.path.join(ROOT, "agent_host"))
+
+from mock_upstreams import MockConfig, build_mock_app
+from sample_payloads import CITIES
+
+# Tracer spans reported as stages, in pipeline order
+STAGES = ["orchestrator.parse", "planner.rules", "planner.llm", "mcp.connect", "tools.fanout", "mcp.tool_call",
+          "agent.compaction", "agent.prescreen", "analysis.llm", "agent.analysis", "step.detection", "step.impact.prefetch",
+          "impact.llm", "step.impact", "response.llm", "step.response"]
+
+SUPPLIERS = ["Foxconn", "Pegatron", "Flex", "Jabil"]
+INCIDENTS = ["", "There are reports of a major crane failure.", "Routine check, nothing reported."]
+
+
+# Per-workflow slot the preliminary alert handler stamps; each workflow runs in its own task
+_first_alert = contextvars.ContextVar("first_alert", default=None)
+
+
+def _record_preliminary_alert(alert: dict):
+    slot = _first_alert.get()
+    if slot is not None and "at" not in slot:
+        slot["at"] = time.perf_counter()
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def latency_summary(values_ms: list) -> dict:
+    return {
+        "p50_ms": round(percentile(values_ms, 50), 1),
+        "p95_ms": round(percentile(values_ms, 95), 1),
+        "p99_ms": round(percentile(values_ms, 99), 1),
+        "mean_ms": round(sum(values_ms) / len(values_ms), 1) if values_ms else 0.0,
+        "max_ms": round(max(values_ms), 1) if values_ms else 0.0,
+    }
+
+
+def user_task(index: int) -> str:
+    city = CITIES[index % len(CITIES)]
+    supplier = SUPPLIERS[index % len(SUPPLIERS)]
+    return (f"I want you to check for my supply chain resilience. My supply chain info: {city} port, "
+            f"electronic container shipment, my supplier is {supplier}. {INCIDENTS[index % len(INCIDENTS)]}\n")
+
+
+async def _wait_ready(url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up within {timeout}s")
+            await asyncio.sleep(0.2)
+
+
+async def _get_json(url: str) -> dict:
+    async with httpx.AsyncClient() as client:
+        return (await client.get(url)).json()
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_mcp_server(mock_base: str, port: int, server_cache: bool, log_path: str = None) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "MCP_PORT": str(port),
+        "WEATHER_API_BASE_URL": f"{mock_base}/weather/v1",
+        "NEWS_API_URL": f"{mock_base}/news/v2/everything",
+        "SINAY_API_BASE_URL": f"{mock_base}/sinay",
+        "SEC_API_URL": f"{mock_base}/sec",
+        "WEATHER_API_KEY": "bench", "NEWS_API_KEY": "bench", "PORT_API_KEY": "bench", "SEC_API_KEY": "bench",
+        "PYTHONUNBUFFERED": "1",
+        # the mock serves every upstream from one host, so a per-host limit would only measure itself
+        "UPSTREAM_RATE_LIMIT": "0",
+    }
+    if not server_cache:
+        # every workflow pays the upstream round trips
+        env["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+        env.pop("RESPONSE_CACHE_PATH", None)
+    log = open(log_path, "w") if log_path else subprocess.DEVNULL
+    return subprocess.Popen([sys.executable, "risk_intel_server.py"], cwd=os.path.join(ROOT, "mcp_server"),
+                            env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def run_benchmark(args) -> dict:
+    mock_base = f"http://127.0.0.1:{args.mock_port}"
+    mcp_base = f"http://127.0.0.1:{args.mcp_port}"
+
+    # The agents read these when they are constructed
+    os.environ["PERPLEXITY_BASE_URL"] = f"{mock_base}/llm"
+    os.environ["PERPLEXITY_API_KEY"] = "bench"
+    os.environ["MCP_URL"] = f"{mcp_base}/mcp"
+    os.environ["LLM_STREAMING"] = "0" if args.no_stream else "1"
+    if args.no_llm_cache:
+        os.environ["LLM_CACHE_MAX_ENTRIES"] = "0"
+    os.environ["RISK_PRESCREEN"] = args.prescreen
+
+    from orchestrator_agent import OrchestratorAgent
+    from tracing import MemoryHistogramSink, tracer
+
+    config = MockConfig(upstream_latency_ms=args.upstream_latency_ms, llm_latency_ms=args.llm_latency_ms,
+                        jitter=args.jitter, disruption_rate=args.disruption_rate,
+                        error_rate=args.upstream_error_rate)
+    mock_server = uvicorn.Server(uvicorn.Config(build_mock_app(config), host="127.0.0.1", port=args.mock_port,
+                                                log_level="warning"))
+    mock_task = asyncio.create_task(mock_server.serve())
+    mcp_process = start_mcp_server(mock_base, args.mcp_port, args.server_cache, args.server_log)
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        await _wait_ready(f"{mock_base}/stats", 10)
+        await _wait_ready(f"{mcp_base}/stats", 30)
+
+        with quiet:
+            orchestrator = OrchestratorAgent(preliminary_alert_handler=_record_preliminary_alert)
+            await orchestrator.start()
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def one(index):
+                async with semaphore:
+                    alert = {}
+                    _first_alert.set(alert)
+                    started = time.perf_counter()
+                    try:
+                        report = await orchestrator.execute_workflow(user_task(index))
+                        error = None
+                    except Exception as e:
+                        report, error = None, repr(e)
+                    finished = time.perf_counter()
+                    disruption = bool(report and report["detection"])
+                    # without streaming the first alert is the finished report
+                    alert_at = alert.get("at", finished if disruption else None)
+                    return {"total_ms": (finished - started) * 1000, "error": error, "disruption": disruption,
+                            "response_planned": bool(report and report["response"]),
+                            "first_alert_ms": (alert_at - started) * 1000 if alert_at else None}
+
+            spans = MemoryHistogramSink()
+            try:
+                for index in range(args.warmup):
+                    await one(index)
+                tracer.add_sink(spans)
+                started = time.perf_counter()
+                results = await asyncio.gather(*(one(index) for index in range(args.workflows)))
+                wall_seconds = time.perf_counter() - started
+                llm_cache_stats = orchestrator.llm_cache.stats()
+                prescreen_stats = orchestrator.disruption_agent.prescreen.stats()
+            finally:
+                if spans in tracer.sinks:
+                    tracer.remove_sink(spans)
+                await orchestrator.close()
+
+        server_stats = await _get_json(f"{mcp_base}/stats")
+    finally:
+        mcp_process.terminate()
+        try:
+            mcp_process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            mcp_process.kill()
+        mock_server.should_exit = True
+        await mock_task
+
+    span_stats = spans.snapshot()
+    cycles = span_stats.get("agent.analysis_cycle", {}).get("count", 0)
+    totals = [r["total_ms"] for r in results]
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "workflows": args.workflows, "concurrency": args.concurrency, "warmup": args.warmup,
+            "upstream_latency_ms": args.upstream_latency_ms, "llm_latency_ms": args.llm_latency_ms,
+            "jitter": args.jitter, "disruption_rate": args.disruption_rate, "server_cache": args.server_cache,
+            "upstream_error_rate": args.upstream_error_rate, "streaming": not args.no_stream,
+            "llm_cache": not args.no_llm_cache, "prescreen": args.prescreen,
+        },
+        "completed": cycles,
+        "failed": len(results) - cycles,
+        "disruptions_detected": sum(r["disruption"] for r in results),
+        "response_plans": sum(r["response_planned"] for r in results),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_wf_per_s": round(len(results) / wall_seconds, 3),
+        "latency": latency_summary(totals),
+        "time_to_first_alert": latency_summary([r["first_alert_ms"] for r in results if r["first_alert_ms"] is not None]),
+        "stages": {stage: {key: span_stats[stage][key] for key in ("count", "p50_ms", "p95_ms", "p99_ms", "mean_ms")}
+                   for stage in STAGES if stage in span_stats},
+        "tokens": {stage: {key: value for key, value in span_stats[stage]["totals"].items() if key.endswith("tokens")}
+                   for stage in STAGES if stage in span_stats and "total_tokens" in span_stats[stage]["totals"]},
+        "mock": dict(config.stats),
+        # includes the warmup workflows
+        "llm_cache": llm_cache_stats,
+        # "shadow" still calls the LLM on every cycle, so agreement covers quiet cycles too;
+        # "on" can only compare the cycles it sent to the LLM
+        "prescreen": prescreen_stats,
+        "mcp_server": server_stats,
+        "errors": sorted({r["error"] for r in results if r["error"]}),
+    }
+
+
+def print_report(report: dict):
+    print(f"commit {report['commit']}  python {report['python']}")
+    print("config: " + ", ".join(f"{k}={v}" for k, v in report["config"].items()))
+    print(f"completed {report['completed']}/{report['completed'] + report['failed']} "
+          f"({report['disruptions_detected']} disruptions, {report['response_plans']} response plans) in {report['wall_seconds']}s "
+          f"-> {report['throughput_wf_per_s']} workflows/s")
+    print(f"\n{'stage':>20} {'p50':>9} {'p95':>9} {'p99':>9} {'mean':>9}")
+    rows = [("workflow", report["latency"]), ("first alert", report["time_to_first_alert"])]
+    for stage, row in rows + list(report["stages"].items()):
+        print(f"{stage:>20} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} {row['mean_ms']:>9}")
+    for stage, tokens in report["tokens"].items():
+        print(f"tokens {stage}: {json.dumps(tokens)}")
+    print(f"\nmock: {json.dumps(report['mock'])}")
+    print(f"llm cache: {json.dumps(report['llm_cache'])}")
+    prescreen = report["prescreen"]
+    print(f"pre-screen ({prescreen['mode']}): skipped {prescreen['skipped']}/{prescreen['cycles']} LLM calls "
+          f"(skip rate {prescreen['skip_rate']}), agreement with the LLM {prescreen['agreement_rate']} "
+          f"over {prescreen['compared']} cycles, {prescreen['missed_disruptions']} missed, "
+          f"{prescreen['false_alarms']} false alarms")
+    for error in report["errors"]:
+        print(f"error: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workflows", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=2, help="sequential workflows run before measuring")
+    parser.add_argument("--upstream-latency-ms", type=float, default=50.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter", type=float, default=0.3, help="relative latency jitter, e.g. 0.3 = +/-30%%")
+    parser.add_argument("--disruption-rate", type=float, default=0.25)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0,
+                        help="share of mock upstream requests failing with 429/503, to exercise retries")
+    parser.add_argument("--no-stream", action="store_true", help="wait for whole LLM completions (LLM_STREAMING=0)")
+    parser.add_argument("--no-llm-cache", action="store_true", help="disable the agents' LLM response cache")
+    parser.add_argument("--prescreen", choices=("on", "shadow", "off"), default="on",
+                        help="rule-based pre-screen: skip quiet cycles' LLM calls, only score them, or disable it")
+    parser.add_argument("--server-cache", action="store_true", help="keep the MCP server's response cache enabled")
+    parser.add_argument("--mock-port", type=int, default=8100)
+    parser.add_argument("--mcp-port", type=int, default=8101)
+    parser.add_argument("--server-log", help="write the MCP server's output to this file")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the agents' own output")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
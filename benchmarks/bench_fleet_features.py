@@ -0,0 +1,208 @@
+# bench_fleet_features.py
+"""
+Fleet-wide risk features (agent_host/fleet_features.py) for N locations:
+the vectorized FleetFeatureEngine against a per-location pure-Python loop
+computing the same columns (windowed peaks, exceedance hours, trend slopes,
+congestion and risk score). Both start from the same decoded get_weather /
+congestion payloads; the time is also split into reading the hourly values
+out of the JSON (per location on both sides) and computing the features
+from them. The two tables are checked for equality.
+
+    python benchmarks/bench_fleet_features.py [--locations 1000 5000] [--storm-share 0.1] [--repeats 5] [--json]
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent_host"))
+
+from fleet_features import FORECAST_FIELDS, MARINE_FIELDS, FleetFeatureEngine
+from risk_features import congestion_features_from_payload
+from risk_prescreen import CONGESTED_LEVELS, PrescreenThresholds
+from sample_payloads import CITIES, congestion_payload, weather_sections
+
+SECTION_NAMES = ["current", "forecast", "history", "alerts", "marine"]
+
+
+def make_fleet(locations: int, storm_share: float, seed: int = 7):
+    rng = random.Random(seed)
+    weather, congestion = {}, {}
+    for index in range(locations):
+        code = f"X{index // 26 // 26 % 26 + 65:c}{index // 26 % 26 + 65:c}{index % 26 + 65:c}{index // 17576 % 10}"
+        storm = rng.random() < storm_share
+        sections = dict(zip(SECTION_NAMES, weather_sections(CITIES[index % len(CITIES)], rng, storm)))
+        if index % 50 == 49:
+            sections.pop("marine")  # a failed section now and then
+        weather[code] = sections
+        congestion[code] = congestion_payload(code, rng, congested=rng.random() < storm_share)
+    return weather, congestion
+
+
+def _hours(section: dict) -> list:
+    return [hour for day in ((section or {}).get("forecast") or {}).get("forecastday") or []
+            for hour in day.get("hour") or []]
+
+
+def _peak(values):
+    values = [v for v in values if v is not None]
+    return max(values) if values else math.nan
+
+
+def _slope(values):
+    points = [(x, y) for x, y in enumerate(values) if y is not None]
+    n = len(points)
+    sx = sum(x for x, _ in points)
+    sy = sum(y for _, y in points)
+    sxx = sum(x * x for x, _ in points)
+    sxy = sum(x * y for x, y in points)
+    denominator = n * sxx - sx * sx
+    return (n * sxy - sx * sy) / denominator if denominator > 0 else math.nan
+
+
+def loop_extract(weather: dict, congestion: dict) -> dict:
+    """
+    The hourly values per location as plain lists, the way a per-location
+    loop reads them.
+    """
+    series = {}
+    for location in dict.fromkeys([*weather, *congestion]):
+        sections = weather.get(location) or {}
+        forecast, marine = _hours(sections.get("forecast")), _hours(sections.get("marine"))
+        series[location] = {
+            "wind": [hour.get("wind_kph") for hour in forecast],
+            "gust": [hour.get("gust_kph") for hour in forecast],
+            "pressure": [hour.get("pressure_mb") for hour in forecast],
+            "precip": [hour.get("precip_mm") for hour in forecast],
+            "wave": [hour.get("sig_ht_mt") for hour in marine],
+            "swell": [hour.get("swell_ht_mt") for hour in marine],
+            "alerts": len(((sections.get("alerts") or {}).get("alerts") or {}).get("alert") or []),
+        }
+    return series
+
+
+def loop_features(series: dict, congestion: dict, t: PrescreenThresholds, windows_hours=(24,)) -> dict:
+    """
+    The same columns as FleetFeatureEngine.compute, one location at a time.
+    """
+    rows = {}
+    for location, values in series.items():
+        wind, gust, wave, swell = values["wind"], values["gust"], values["wave"], values["swell"]
+        row = {}
+        for hours in windows_hours:
+            row[f"peak_wind_kph_{hours}h"] = _peak(wind[:hours])
+            row[f"peak_gust_kph_{hours}h"] = _peak(gust[:hours])
+        row["peak_wind_kph"] = _peak(wind)
+        row["peak_gust_kph"] = _peak(gust)
+        row["wind_exceed_hours"] = sum(1 for w, g in zip(wind, gust)
+                                       if (w is not None and w >= t.wind_kph) or (g is not None and g >= t.gust_kph))
+        row["wind_trend_kph_per_h"] = _slope(wind)
+        row["pressure_trend_mb_per_h"] = _slope(values["pressure"])
+        row["total_precip_mm"] = sum(v or 0.0 for v in values["precip"])
+        row["max_wave_m"] = _peak(wave)
+        row["max_swell_m"] = _peak(swell)
+        row["wave_exceed_hours"] = sum(1 for w, s in zip(wave, swell) if (w is not None and w >= t.wave_height_m)
+                                       or (s is not None and s >= t.swell_height_m))
+        row["alerts"] = values["alerts"]
+
+        wait = anchored = math.nan
+        congested = False
+        if location in congestion:
+            features = congestion_features_from_payload(congestion[location])
+            wait = max((v for path, v in features.metrics.items() if "wait" in path.lower()), default=math.nan)
+            anchored = max((v for path, v in features.metrics.items() if "anchor" in path.lower()), default=math.nan)
+            congested = str(features.level or "").lower() in CONGESTED_LEVELS
+        row["wait_hours"] = wait
+        row["vessels_at_anchor"] = anchored
+        row["congested"] = congested or (wait == wait and wait >= t.congestion_wait_hours)
+        row["complete"] = bool(wind) and bool(wave)
+
+        def over(value, threshold):
+            return value == value and value >= threshold
+        windy = over(row["peak_wind_kph"], t.wind_kph) or over(row["peak_gust_kph"], t.gust_kph)
+        rough = over(row["max_wave_m"], t.wave_height_m) or over(row["max_swell_m"], t.swell_height_m)
+        row["risk_score"] = min(10.0, 4.0 * (row["alerts"] > 0) + 2.5 * windy + 2.5 * rough + 3.0 * row["congested"])
+        rows[location] = row
+    return rows
+
+
+def tables_match(table, rows: dict) -> bool:
+    if table.locations != list(rows):
+        return False
+    for name, column in table.columns.items():
+        expected = np.array([row[name] for row in rows.values()], dtype=float)
+        if not np.allclose(column.astype(float), expected, equal_nan=True):
+            print(f"column {name} differs")
+            return False
+    return True
+
+
+def best_of(repeats: int, fn):
+    timings, result = [], None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings), result
+
+
+def run(locations: int, storm_share: float, repeats: int) -> dict:
+    weather, congestion = make_fleet(locations, storm_share)
+    thresholds = PrescreenThresholds()
+    engine = FleetFeatureEngine(thresholds)
+    loop_extract_ms, series = best_of(repeats, lambda: loop_extract(weather, congestion))
+    loop_ms, rows = best_of(repeats, lambda: loop_features(loop_extract(weather, congestion), congestion, thresholds))
+    vector_ms, table = best_of(repeats, lambda: engine.compute(weather, congestion))
+    vector_extract_ms, _ = best_of(repeats, lambda: engine._extract(weather, table.locations))
+    # parsing congestion payloads is the same per-location helper on both sides
+    congestion_ms, _ = best_of(repeats, lambda: engine._congestion(table.locations, congestion))
+    loop_reduce_ms = loop_ms - loop_extract_ms - congestion_ms
+    vector_reduce_ms = vector_ms - vector_extract_ms - congestion_ms
+    compact = json.dumps(table.to_compact(top=20), separators=(",", ":"))
+    return {
+        "locations": locations,
+        "hours_per_location": len(_hours(next(iter(weather.values()))["forecast"])),
+        "loop_ms": round(loop_ms, 2),
+        "vectorized_ms": round(vector_ms, 2),
+        "speedup": round(loop_ms / vector_ms, 2),
+        "loop_extract_ms": round(loop_extract_ms, 2),
+        "vectorized_extract_ms": round(vector_extract_ms, 2),
+        "congestion_parse_ms": round(congestion_ms, 2),
+        "loop_reduce_ms": round(loop_reduce_ms, 2),
+        "vectorized_reduce_ms": round(vector_reduce_ms, 2),
+        "reduce_speedup": round(loop_reduce_ms / vector_reduce_ms, 1),
+        "tables_match": tables_match(table, rows),
+        "at_risk": int((table.risk_scores >= 5).sum()),
+        "top20_compact_bytes": len(compact),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--locations", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--storm-share", type=float, default=0.1, help="share of locations with storms/congestion")
+    parser.add_argument("--repeats", type=int, default=5, help="best-of runs per variant")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+
+    results = [run(locations, args.storm_share, args.repeats) for locations in args.locations]
+    if args.json:
+        print(json.dumps(results))
+        return
+    for result in results:
+        print(f"{result['locations']} locations x {result['hours_per_location']} h: "
+              f"loop {result['loop_ms']} ms, vectorized {result['vectorized_ms']} ms ({result['speedup']}x), "
+              f"tables match: {result['tables_match']}, {result['at_risk']} at risk, "
+              f"top-20 table {result['top20_compact_bytes']} bytes")
+        print(f"  reading the JSON: loop {result['loop_extract_ms']} ms, vectorized {result['vectorized_extract_ms']} ms; "
+              f"congestion payloads {result['congestion_parse_ms']} ms; features: loop {result['loop_reduce_ms']} ms, "
+              f"vectorized {result['vectorized_reduce_ms']} ms ({result['reduce_speedup']}x)")
+
+
+if __name__ == "__main__":
+    main()
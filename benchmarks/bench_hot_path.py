@@ -0,0 +1,135 @@
+# bench_hot_path.py
+"""
+CPU time and allocations of the per-cycle agent hot path, without any I/O:
+planner prompt + cache key, measuring and serializing the compacted
+payload, and parsing the LLM's reply. Feature extraction itself is the same
+in both variants and runs outside the measured loop. The "legacy" variant repeats what the agent did
+before prompts were precomputed and payloads serialized once in compact
+form (f-string prompt with the tool catalogue's repr, indent=2 dumps of the
+raw and compact payloads, parse -> re-dump -> parse of every reply).
+
+    python benchmarks/bench_hot_path.py [--lanes 1000] [--distinct-payloads 32] [--json]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent_host"))
+
+from disrup_detect_agent import PLANNER_SYSTEM_PROMPT, tools_definition_str
+from llm_cache import make_llm_cache_key, normalize_value
+from llm_json import compact_json, extract_json_object
+from mock_upstreams import scripted_reply
+from risk_features import extract_features, payload_size_report
+from sample_payloads import CITIES, fetched_data
+
+
+def legacy_cycle(params: dict, raw: dict, compact: dict, reply: str):
+    system_prompt = f"""
+        You are a data-fetching AI component. Based on the user's input, your sole purpose is to generate a single, valid JSON object that specifies which tools to call.
+
+        Available Tools:
+        {tools_definition_str}
+
+        Now, analyze the user's input and generate the corresponding tool calls in the specified JSON format.
+        """
+    user_input_str = json.dumps(params, indent=2)
+    key = json.dumps({"model": "sonar", "system": hashlib.sha256(system_prompt.encode()).hexdigest(),
+                      "input": normalize_value(params), "params": {}}, sort_keys=True, separators=(",", ":"))
+    hashlib.sha256(key.encode()).hexdigest()
+
+    len(json.dumps(raw, indent=2).encode())
+    len(json.dumps(compact, indent=2).encode())
+    data_str = json.dumps(compact, indent=2)
+
+    start, end = reply.find("{"), reply.rfind("}")
+    report = json.loads(json.dumps(json.loads(reply[start:end + 1]), indent=2))
+    return user_input_str, data_str, report
+
+
+def current_cycle(params: dict, raw: dict, compact: dict, reply: str):
+    user_input_str = compact_json(params)
+    make_llm_cache_key("planner.llm", "sonar", PLANNER_SYSTEM_PROMPT, params)
+
+    data_str = compact_json(compact)
+    payload_size_report(raw, compact, compact_text=data_str)
+
+    report = extract_json_object(reply)
+    return user_input_str, data_str, report
+
+
+def measure(cycle, lanes: list) -> dict:
+    started = time.process_time()
+    for lane in lanes:
+        cycle(*lane)
+    cpu_seconds = time.process_time() - started
+
+    peaks = []
+    tracemalloc.start()
+    for lane in lanes:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        cycle(*lane)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+    tracemalloc.stop()
+
+    return {
+        "cpu_us_per_cycle": round(cpu_seconds * 1e6 / len(lanes), 1),
+        "cpu_seconds_total": round(cpu_seconds, 3),
+        "peak_alloc_kb_per_cycle": round(sum(peaks) / len(peaks) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lanes", type=int, default=1000, help="monitoring cycles to run, one per lane")
+    parser.add_argument("--distinct-payloads", type=int, default=32, help="distinct fetched_data payloads to cycle through")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+
+    payloads = [fetched_data(seed) for seed in range(args.distinct_payloads)]
+    features = [extract_features(raw) for raw in payloads]
+    lanes = []
+    for index in range(args.lanes):
+        raw = payloads[index % len(payloads)]
+        compact = features[index % len(payloads)]
+        params = {"port": CITIES[index % len(CITIES)], "shipment_type": "electronic container",
+                  "suppliers": [f"Supplier {index}"], "urgency_level": "low"}
+        # replies arrive fenced now and then; both parsers have to cope
+        reply = json.dumps(scripted_reply("", json.dumps(compact)))
+        if index % 3 == 0:
+            reply = f"```json\n{reply}\n```"
+        lanes.append((params, raw, compact, reply))
+
+    # warm caches and imports so neither variant pays first-call costs
+    legacy_cycle(*lanes[0])
+    current_cycle(*lanes[0])
+
+    legacy = measure(legacy_cycle, lanes)
+    current = measure(current_cycle, lanes)
+    summary = {
+        "lanes": args.lanes,
+        "legacy": legacy,
+        "current": current,
+        "cpu_reduction_pct": round(100 * (1 - current["cpu_us_per_cycle"] / legacy["cpu_us_per_cycle"]), 1),
+        "peak_alloc_reduction_pct": round(
+            100 * (1 - current["peak_alloc_kb_per_cycle"] / legacy["peak_alloc_kb_per_cycle"]), 1),
+    }
+
+    if args.json:
+        print(json.dumps(summary))
+        return
+    print(f"{args.lanes} cycles over {args.distinct_payloads} distinct payloads")
+    print(f"{'':>28} {'legacy':>10} {'current':>10}")
+    for key in legacy:
+        print(f"{key:>28} {legacy[key]:>10} {current[key]:>10}")
+    print(f"cpu -{summary['cpu_reduction_pct']}%, peak allocation -{summary['peak_alloc_reduction_pct']}% per cycle")
+
+
+if __name__ == "__main__":
+    main()
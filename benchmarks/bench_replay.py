@@ -0,0 +1,192 @@
+# bench_replay.py
+"""
+Record-and-replay regression and throughput run of DisruptionDetectionAgent.
+
+Records S scenarios (one analysis cycle each) against the local upstream/LLM
+stand-ins and the real MCP server, then shuts both down and replays the
+archive R times, fully offline, checking every replayed report against the
+recorded one.
+
+    python benchmarks/bench_replay.py [--scenarios 200] [--replays 5] [--concurrency 16] [--speed 0] [--json]
+
+With --archive FILE an existing archive is replayed as is (no recording);
+its reference reports are read from FILE.reports.json. --speed 1 replays at
+recorded timing, 0 as fast as possible.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import uvicorn
+
+from bench_end_to_end import ROOT, SUPPLIERS, _wait_ready, latency_summary, start_mcp_server
+from mock_upstreams import MockConfig, build_mock_app
+from sample_payloads import CITIES
+
+sys.path.insert(0, os.path.join(ROOT, "agent_host"))
+
+
+def scenario_params(index: int) -> dict:
+    return {"port": CITIES[index % len(CITIES)], "shipment_type": "electronic container",
+            "suppliers": [SUPPLIERS[index % len(SUPPLIERS)]], "urgency_level": "low"}
+
+
+async def run_scenarios(recorder, scenarios: int, concurrency: int) -> dict:
+    from disrup_detect_agent import DisruptionDetectionAgent
+
+    agent = DisruptionDetectionAgent(recorder=recorder, planner_mode="auto")
+    await agent.start()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index):
+        async with semaphore:
+            started = time.perf_counter()
+            with recorder.scope(f"scenario-{index}"):
+                report = await agent.run_single_analysis(scenario_params(index))
+            return report, (time.perf_counter() - started) * 1000
+
+    try:
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(one(index) for index in range(scenarios)))
+        wall_seconds = time.perf_counter() - started
+    finally:
+        await agent.close()
+    return {
+        "reports": [report for report, _ in outcomes],
+        "wall_seconds": wall_seconds,
+        "latency": latency_summary([ms for _, ms in outcomes]),
+        "recorder": recorder.stats(),
+    }
+
+
+async def record(args, archive_path: str) -> dict:
+    from exchange_recorder import ExchangeArchive, ExchangeRecorder
+
+    mock_base = f"http://127.0.0.1:{args.mock_port}"
+    os.environ["PERPLEXITY_BASE_URL"] = f"{mock_base}/llm"
+    os.environ["PERPLEXITY_API_KEY"] = "bench"
+    os.environ["MCP_URL"] = f"http://127.0.0.1:{args.mcp_port}/mcp"
+
+    config = MockConfig(upstream_latency_ms=args.upstream_latency_ms, llm_latency_ms=args.llm_latency_ms)
+    mock_server = uvicorn.Server(uvicorn.Config(build_mock_app(config), host="127.0.0.1", port=args.mock_port,
+                                                log_level="warning"))
+    mock_task = asyncio.create_task(mock_server.serve())
+    mcp_process = start_mcp_server(mock_base, args.mcp_port, server_cache=False)
+    try:
+        await _wait_ready(f"{mock_base}/stats", 10)
+        await _wait_ready(f"http://127.0.0.1:{args.mcp_port}/stats", 30)
+        recorder = ExchangeRecorder(ExchangeArchive(archive_path), mode="record")
+        run = await run_scenarios(recorder, args.scenarios, args.concurrency)
+    finally:
+        mcp_process.terminate()
+        try:
+            mcp_process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            mcp_process.kill()
+        mock_server.should_exit = True
+        await mock_task
+    with open(archive_path + ".reports.json", "w") as f:
+        json.dump(run["reports"], f)
+    return run
+
+
+async def replay(args, archive_path: str, scenarios: int) -> dict:
+    from exchange_recorder import ExchangeArchive, ExchangeRecorder
+
+    # nothing listens here any more: a request that escaped the archive would fail loudly
+    os.environ["PERPLEXITY_BASE_URL"] = "http://127.0.0.1:9/llm"
+    os.environ["MCP_URL"] = "http://127.0.0.1:9/mcp"
+    runs = []
+    for _ in range(args.replays):
+        recorder = ExchangeRecorder(ExchangeArchive(archive_path), mode="replay", speed=args.speed)
+        runs.append(await run_scenarios(recorder, scenarios, args.concurrency))
+    return runs
+
+
+async def run_benchmark(args) -> dict:
+    # identical requests must reach the LLM identically in both passes, not hit a warm cache in one
+    os.environ["LLM_CACHE_MAX_ENTRIES"] = "0"
+    os.environ.pop("SIGNAL_STORE_PATH", None)
+    os.environ.pop("EXCHANGE_MODE", None)
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with tempfile.TemporaryDirectory() as tmp:
+        archive_path = args.archive or os.path.join(tmp, "exchanges.db")
+        recorded = None
+        with quiet:
+            if args.archive:
+                with open(archive_path + ".reports.json") as f:
+                    expected = json.load(f)
+            else:
+                recorded = await record(args, archive_path)
+                expected = recorded["reports"]
+            replays = await replay(args, archive_path, len(expected))
+
+        from exchange_recorder import ExchangeArchive
+        archive = ExchangeArchive(archive_path)
+        archive_summary = archive.summary()
+        archive_summary["file_bytes"] = sum(os.path.getsize(p) for p in (archive_path, archive_path + "-wal")
+                                            if os.path.exists(p))
+        archive.close()
+
+    mismatches = sum(report != want for run in replays for report, want in zip(run["reports"], expected))
+    replay_seconds = sum(run["wall_seconds"] for run in replays)
+    replayed_cycles = len(expected) * len(replays)
+    summary = {
+        "config": {"scenarios": len(expected), "replays": args.replays, "concurrency": args.concurrency,
+                   "speed": args.speed, "upstream_latency_ms": args.upstream_latency_ms,
+                   "llm_latency_ms": args.llm_latency_ms},
+        "archive": archive_summary,
+        "disruptions": sum(1 for report in expected if report),
+        "replayed_cycles": replayed_cycles,
+        "mismatched_reports": mismatches,
+        "replay_misses": sum(run["recorder"]["misses"] for run in replays),
+        "replay_cycles_per_s": round(replayed_cycles / replay_seconds, 1),
+        "replay_latency": replays[-1]["latency"],
+    }
+    if recorded is not None:
+        summary["record_cycles_per_s"] = round(len(expected) / recorded["wall_seconds"], 1)
+        summary["record_latency"] = recorded["latency"]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=int, default=200)
+    parser.add_argument("--replays", type=int, default=5, help="passes over the archive")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--speed", type=float, default=0.0, help="0 = as fast as possible, 1 = recorded timing")
+    parser.add_argument("--archive", help="replay this archive instead of recording a new one")
+    parser.add_argument("--upstream-latency-ms", type=float, default=50.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--mock-port", type=int, default=8100)
+    parser.add_argument("--mcp-port", type=int, default=8101)
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    parser.add_argument("--verbose", action="store_true", help="show the agent's own output")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_benchmark(args))
+    if args.json:
+        print(json.dumps(summary))
+        return
+    print("config: " + ", ".join(f"{k}={v}" for k, v in summary["config"].items()))
+    archive = summary["archive"]
+    print(f"archive: {json.dumps(archive['exchanges'])} exchanges in {archive['blobs']} blobs, "
+          f"{archive['file_bytes']} bytes on disk")
+    if "record_cycles_per_s" in summary:
+        print(f"record: {summary['record_cycles_per_s']} cycles/s, p50 {summary['record_latency']['p50_ms']} ms")
+    print(f"replay: {summary['replay_cycles_per_s']} cycles/s over {summary['replayed_cycles']} cycles, "
+          f"p50 {summary['replay_latency']['p50_ms']} ms")
+    print(f"regression: {summary['mismatched_reports']} mismatched report(s), {summary['replay_misses']} replay miss(es), "
+          f"{summary['disruptions']} recorded disruption(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# bench_signal_store.py
+"""
+Write and query cost of the signal store (agent_host/signal_store.py).
+
+Records a month of hourly cycles for one lane per port (synthetic payloads),
+then times 30-day risk_score range queries per port. Writes are compared
+between the batched background writer and a commit per cycle
+(--batch-size 1 shows the latter alone).
+
+    python benchmarks/bench_signal_store.py [--days 30] [--cycles-per-day 24] [--batch-size 256] [--json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent_host"))
+
+from risk_features import extract_features
+from sample_payloads import CITIES, fetched_data
+from signal_store import SignalStore
+from tool_planner import KNOWN_PORTS
+
+
+def make_cycles(days: int, cycles_per_day: int, distinct_payloads: int) -> list:
+    distinct_payloads = min(distinct_payloads, days * cycles_per_day * len(CITIES))
+    payloads = [fetched_data(seed) for seed in range(distinct_payloads)]
+    features = [extract_features(raw) for raw in payloads]
+    start = time.time() - days * 86400
+    step = 86400 / cycles_per_day
+    cycles = []
+    for index in range(days * cycles_per_day):
+        for lane, city in enumerate(CITIES):
+            seed = (index * len(CITIES) + lane) % distinct_payloads
+            report = {"is_disruption_detected": seed % 5 == 0, "risk_score": round((seed * 7) % 100 / 10, 1),
+                      "summary": f"cycle {index} at {city}", "key_findings": []}
+            cycles.append((f"{city.lower().replace(' ', '-')}-lane", {"port": city}, payloads[seed],
+                           features[seed], report, start + index * step))
+    return cycles
+
+
+async def write_all(path: str, cycles: list, batch_size: int) -> dict:
+    store = SignalStore(path, batch_size=batch_size, flush_interval=0.05, max_pending=len(cycles) + 1)
+    record_ns = 0
+    started = time.perf_counter()
+    for lane_id, params, raw, features, report, ts in cycles:
+        call_started = time.perf_counter_ns()
+        store.record(lane_id, params, raw, features, report, ts=ts)
+        record_ns += time.perf_counter_ns() - call_started
+        # let the writer run between cycles the way it would between agent awaits
+        await asyncio.sleep(0)
+    await store.flush()
+    elapsed = time.perf_counter() - started
+    stats = store.stats()
+    await store.close()
+    return {
+        "batch_size": batch_size,
+        "record_us_per_cycle": round(record_ns / 1000 / len(cycles), 2),
+        "cycles_per_second": round(len(cycles) / elapsed),
+        "batches": stats["batches"],
+        "write_ms_total": stats["write_ms"],
+        "dropped": stats["dropped"],
+    }
+
+
+def query_all(path: str, days: int, repeats: int) -> dict:
+    store = SignalStore(path)
+    since = time.time() - days * 86400 - 60
+    codes = [KNOWN_PORTS[city.lower()][1] for city in CITIES if city.lower() in KNOWN_PORTS]
+    points, timings = 0, []
+    for _ in range(repeats):
+        for code in codes:
+            started = time.perf_counter()
+            points = len(store.risk_series(code, since=since))
+            timings.append((time.perf_counter() - started) * 1000)
+    store._read_conn.close()
+    store._write_conn.close()
+    timings.sort()
+    return {
+        "ports_queried": len(codes),
+        "points_per_query": points,
+        "query_ms_p50": round(timings[len(timings) // 2], 3),
+        "query_ms_p95": round(timings[int(len(timings) * 0.95)], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--cycles-per-day", type=int, default=24, help="cycles per lane per day")
+    parser.add_argument("--distinct-payloads", type=int, default=32,
+                        help="distinct fetched_data payloads to cycle through (repeats are deduplicated on disk)")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--repeats", type=int, default=20, help="query rounds over all ports")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+
+    cycles = make_cycles(args.days, args.cycles_per_day, args.distinct_payloads)
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = {}
+        for batch_size in sorted({1, args.batch_size}):
+            path = os.path.join(tmp, f"signals-{batch_size}.db")
+            runs[f"batch_{batch_size}"] = asyncio.run(write_all(path, cycles, batch_size))
+        path = os.path.join(tmp, f"signals-{args.batch_size}.db")
+        db_bytes = sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+        summary = {
+            "cycles": len(cycles),
+            "lanes": len(CITIES),
+            "writes": runs,
+            "queries": query_all(path, args.days, args.repeats),
+            "db_bytes_per_cycle": db_bytes // len(cycles),
+        }
+
+    if args.json:
+        print(json.dumps(summary))
+        return
+    print(f"{summary['cycles']} cycles ({summary['lanes']} lanes x {args.days} days x {args.cycles_per_day}/day), "
+          f"{summary['db_bytes_per_cycle']} bytes/cycle on disk")
+    for name, run in runs.items():
+        print(f"{name:>10}: record() {run['record_us_per_cycle']} us, {run['cycles_per_second']} cycles/s, "
+              f"{run['batches']} batch(es), {run['write_ms_total']} ms writing")
+    queries = summary["queries"]
+    print(f"{args.days}-day risk_score range per port: {queries['points_per_query']} points, "
+          f"p50 {queries['query_ms_p50']} ms, p95 {queries['query_ms_p95']} ms")
+
+
+if __name__ == "__main__":
+    main()
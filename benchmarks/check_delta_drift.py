@@ -0,0 +1,84 @@
+# check_delta_drift.py
+"""
+Regression check for delta analysis (agent_host/delta_analysis.py): a
+signal that moves by less than the per-cycle tolerance every cycle must
+still reach the LLM once its total move since the last assessment is
+material, and `seconds_since_previous` must count from that assessment,
+not from the last skipped cycle.
+
+Drives DisruptionDetectionAgent._assess_cycle with the LLM stubbed out.
+
+    python benchmarks/check_delta_drift.py [--step 0.04] [--cycles 40]
+
+Exits non-zero when a check fails.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent_host"))
+
+from delta_analysis import LaneSnapshotStore
+from disrup_detect_agent import DisruptionDetectionAgent
+
+
+async def run(step: float, cycles: int) -> list:
+    agent = DisruptionDetectionAgent.__new__(DisruptionDetectionAgent)
+    agent.snapshots = LaneSnapshotStore(numeric_tolerance=0.05)
+    sent = []
+
+    async def assess(payload, lane_id, prescreen, text=None, fleet_risk=None):
+        sent.append(payload)
+        return {"is_disruption_detected": False, "risk_score": 1.0, "summary": "", "key_findings": []}
+
+    agent._assess = assess
+    failures = []
+    wind, pressure = 20.0, 1000.0
+    for cycle in range(cycles):
+        data = {"get_weather": {"current": {"wind_kph": round(wind, 3), "pressure_mb": round(pressure, 3)},
+                                "location": {"name": "Baltimore"}}}
+        before = len(sent)
+        with contextlib.redirect_stdout(io.StringIO()):
+            await agent._assess_cycle(data, lane_id="drift-lane")
+        if cycle == 0:
+            # pretend the full assessment was an hour ago
+            agent.snapshots.get("drift-lane").taken_at -= 3600
+        elif len(sent) > before and sent[-1].get("mode") == "delta":
+            changes = sent[-1]["changes"]["changed"]
+            if "get_weather.current.pressure_mb" in changes and \
+                    abs(changes["get_weather.current.pressure_mb"]["new"] / 1000.0 - 1) <= 0.05:
+                failures.append(f"cycle {cycle}: pressure sent before drifting 5% from its baseline")
+            if len(sent) == 2 and sent[-1]["seconds_since_previous"] < 3600:
+                failures.append(f"cycle {cycle}: seconds_since_previous {sent[-1]['seconds_since_previous']} "
+                                f"counts from a skipped cycle, not the assessment")
+        wind *= 1 + step
+        pressure *= 1 + step / 4
+
+    deltas = [payload for payload in sent if payload.get("mode") == "delta"]
+    if not any("get_weather.current.wind_kph" in p["changes"]["changed"] for p in deltas):
+        failures.append(f"wind rising {step:.0%} per cycle never produced a delta in {cycles} cycles")
+    if not any("get_weather.current.pressure_mb" in p["changes"]["changed"] for p in deltas):
+        failures.append(f"pressure rising {step / 4:.0%} per cycle never produced a delta in {cycles} cycles")
+    print(f"{cycles} cycles: {len(deltas)} delta assessment(s), {agent.snapshots.stats()}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--step", type=float, default=0.04, help="relative wind increase per cycle")
+    parser.add_argument("--cycles", type=int, default=40)
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args.step, args.cycles))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# check_tool_planner.py
+"""
+Regression check for the rule-based planner (agent_host/tool_planner.py):
+shipment_type wording must map to the right get_port_congestion vessel_type
+on whole words, so "cargo" and "bulk carrier" stay cargo instead of matching
+"car" -> roro.
+
+    python benchmarks/check_tool_planner.py
+
+Exits non-zero when a check fails.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent_host"))
+
+from tool_planner import plan_tool_calls
+
+EXPECTED_VESSEL_TYPES = {
+    "cargo": "cargo",
+    "general cargo": "cargo",
+    "Bulk carrier": "cargo",
+    "container": "cargo",
+    "crude oil": "tanker",
+    "LNG carrier": "tanker",
+    "car": "roro",
+    "Ro-Ro": "roro",
+    "vehicle carrier": "roro",
+    "automotive parts": "roro",
+}
+
+
+def congestion_vessel_type(shipment_type: str):
+    calls = plan_tool_calls({"port": "Baltimore", "shipment_type": shipment_type})
+    for call in calls or []:
+        if call["function"]["name"] == "get_port_congestion":
+            return call["function"]["arguments"]["vessel_type"]
+    return None
+
+
+def main():
+    failures = []
+    for shipment_type, expected in EXPECTED_VESSEL_TYPES.items():
+        planned = congestion_vessel_type(shipment_type)
+        if planned != expected:
+            failures.append(f"shipment_type {shipment_type!r} planned vessel_type {planned!r}, expected {expected!r}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"OK ({len(EXPECTED_VESSEL_TYPES)} shipment types)")
+
+
+if __name__ == "__main__":
+    main()
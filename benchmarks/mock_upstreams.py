@@ -0,0 +1,297 @@
+# mock_upstreams.py
+"""
+Local stand-ins for weatherapi.com, NewsAPI, sinay.ai, sec-api.io and the
+Perplexity (OpenAI-compatible) chat endpoint, all on one Starlette app.
+
+Point the MCP server at it with WEATHER_API_BASE_URL=<base>/weather/v1,
+NEWS_API_URL=<base>/news/v2/everything, SINAY_API_BASE_URL=<base>/sinay and
+SEC_API_URL=<base>/sec, and the agents with PERPLEXITY_BASE_URL=<base>/llm.
+
+    python benchmarks/mock_upstreams.py [--port 8100] [--upstream-latency-ms 50] [--llm-latency-ms 300]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+import uuid
+import zlib
+from dataclasses import dataclass, field
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent_host"))
+
+from tool_planner import PORTS_BY_CODE
+from sample_payloads import CITIES, congestion_payload, news_payload, sec_payload, vessel_payload, weather_sections
+
+WEATHER_ENDPOINTS = ["current", "forecast", "history", "alerts", "marine"]
+
+# Words in the analysis input that make the scripted analyst report a disruption
+DISRUPTION_MARKERS = ("Gale", "crane failure", "strike closes", "grounding", "HIGH")
+
+
+@dataclass
+class MockConfig:
+    upstream_latency_ms: float = 50.0
+    llm_latency_ms: float = 300.0
+    # extra LLM latency per 1k prompt tokens (~4 chars each), so prompt size shows up in timings
+    llm_ms_per_1k_prompt_tokens: float = 20.0
+    # generation speed (~4 chars per token); streamed replies pay it chunk by chunk
+    llm_ms_per_completion_token: float = 5.0
+    # extra latency on marine.json, the usual weatherapi straggler
+    marine_extra_latency_ms: float = 0.0
+    jitter: float = 0.3
+    # share of cities whose upstream data shows a storm / incident / congestion
+    disruption_rate: float = 0.25
+    # share of upstream requests answered with a 503 (half of them) or a 429 with Retry-After
+    error_rate: float = 0.0
+    seed: int = 7
+    stats: dict = field(default_factory=lambda: {"upstream_requests": 0, "upstream_errors": 0, "llm_requests": 0,
+                                                 "llm_prompt_chars": 0})
+
+
+def _is_disrupted(config: MockConfig, city: str) -> bool:
+    return zlib.crc32(f"{config.seed}:{city.lower()}".encode()) % 1000 < config.disruption_rate * 1000
+
+
+def _rng(config: MockConfig, *parts) -> random.Random:
+    return random.Random(zlib.crc32(":".join(str(p) for p in (config.seed,) + parts).encode()))
+
+
+async def _delay(config: MockConfig, base_ms: float):
+    jitter = random.uniform(-config.jitter, config.jitter)
+    await asyncio.sleep(max(0.0, base_ms * (1 + jitter)) / 1000)
+
+
+def _injected_error(config: MockConfig):
+    if config.error_rate <= 0 or random.random() >= config.error_rate:
+        return None
+    config.stats["upstream_errors"] += 1
+    if random.random() < 0.5:
+        return JSONResponse({"error": "rate limit exceeded"}, status_code=429, headers={"Retry-After": "1"})
+    return JSONResponse({"error": "service unavailable"}, status_code=503)
+
+
+def _city_for(value: str) -> str:
+    value = (value or "").strip()
+    return next((city for city in CITIES if city.lower() == value.lower()), value or CITIES[0])
+
+
+def _city_in(text: str) -> str:
+    return next((city for city in CITIES if city.lower() in text.lower()), None)
+
+
+def build_mock_app(config: MockConfig = None) -> Starlette:
+    config = config or MockConfig()
+
+    async def weather(request: Request):
+        endpoint = request.path_params["endpoint"]
+        if endpoint not in WEATHER_ENDPOINTS:
+            return JSONResponse({"error": {"code": 1005, "message": "API request url is invalid."}}, status_code=400)
+        city = _city_for(request.query_params.get("q"))
+        config.stats["upstream_requests"] += 1
+        await _delay(config, config.upstream_latency_ms + (config.marine_extra_latency_ms if endpoint == "marine" else 0))
+        error = _injected_error(config)
+        if error is not None:
+            return error
+        sections = weather_sections(city, _rng(config, "weather", city), storm=_is_disrupted(config, city))
+        return JSONResponse(sections[WEATHER_ENDPOINTS.index(endpoint)])
+
+    async def news(request: Request):
+        query = request.query_params.get("q", "")
+        city = _city_in(query) or CITIES[0]
+        config.stats["upstream_requests"] += 1
+        await _delay(config, config.upstream_latency_ms)
+        error = _injected_error(config)
+        if error is not None:
+            return error
+        return JSONResponse(news_payload(city, _rng(config, "news", query), incident=_is_disrupted(config, city)))
+
+    async def congestion(request: Request):
+        port_code = request.query_params.get("portCode", "")
+        config.stats["upstream_requests"] += 1
+        await _delay(config, config.upstream_latency_ms)
+        error = _injected_error(config)
+        if error is not None:
+            return error
+        city = PORTS_BY_CODE.get(port_code.upper(), "")
+        return JSONResponse(congestion_payload(port_code, _rng(config, "congestion", port_code),
+                                               congested=bool(city) and _is_disrupted(config, city)))
+
+    async def vessels(request: Request):
+        name = request.query_params.get("vesselNameOrCode", "")
+        config.stats["upstream_requests"] += 1
+        await _delay(config, config.upstream_latency_ms)
+        error = _injected_error(config)
+        if error is not None:
+            return error
+        return JSONResponse(vessel_payload(name, _rng(config, "vessels", name)))
+
+    async def sec(request: Request):
+        body = await request.json()
+        config.stats["upstream_requests"] += 1
+        await _delay(config, config.upstream_latency_ms)
+        error = _injected_error(config)
+        if error is not None:
+            return error
+        return JSONResponse(sec_payload(_rng(config, "sec", body.get("query"))))
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages") or []
+        system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+        user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        prompt_chars = sum(len(m.get("content") or "") for m in messages)
+        config.stats["llm_requests"] += 1
+        config.stats["llm_prompt_chars"] += prompt_chars
+
+        await _delay(config, config.llm_latency_ms + config.llm_ms_per_1k_prompt_tokens * prompt_chars / 4000)
+
+        content = json.dumps(scripted_reply(system, user))
+        completion_chars = len(content)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        usage = {"prompt_tokens": prompt_chars // 4, "completion_tokens": completion_chars // 4,
+                 "total_tokens": (prompt_chars + completion_chars) // 4}
+
+        if body.get("stream"):
+            return StreamingResponse(_stream_chunks(config, completion_id, body.get("model", "sonar"), content, usage),
+                                     media_type="text/event-stream")
+
+        await _delay(config, config.llm_ms_per_completion_token * completion_chars / 4)
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "sonar"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    async def stats(request: Request):
+        return JSONResponse(config.stats)
+
+    return Starlette(routes=[
+        Route("/weather/v1/{endpoint}.json", weather),
+        Route("/news/v2/everything", news),
+        Route("/sinay/congestion/api/v1/congestion", congestion),
+        Route("/sinay/ports-vessels/api/v1/vessels", vessels),
+        Route("/sec", sec, methods=["POST"]),
+        Route("/llm/chat/completions", chat_completions, methods=["POST"]),
+        Route("/stats", stats),
+    ])
+
+
+async def _stream_chunks(config: MockConfig, completion_id: str, model: str, content: str, usage: dict,
+                         chars_per_chunk: int = 16):
+    """
+    Server-sent chat.completion.chunk events, paced like token generation;
+    the last event carries the usage, as Perplexity's streams do.
+    """
+    def event(delta: dict, finish_reason=None, with_usage=False):
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                 "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+        if with_usage:
+            chunk["usage"] = usage
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    yield event({"role": "assistant", "content": ""})
+    for start in range(0, len(content), chars_per_chunk):
+        await _delay(config, config.llm_ms_per_completion_token * chars_per_chunk / 4)
+        yield event({"content": content[start:start + chars_per_chunk]})
+    yield event({}, finish_reason="stop", with_usage=True)
+    yield "data: [DONE]\n\n"
+
+
+def scripted_reply(system: str, user: str) -> dict:
+    """
+    The reply each agent prompt expects, chosen by the prompt's persona.
+    """
+    if "orchestration agent" in system:
+        supplier = re.search(r"supplier is ([\w\- ]+?)[.,\n]", user)
+        urgent = any(word in user.lower() for word in ("emergency", "critical", "immediate"))
+        sequence = ["DisruptionDetectionAgent", "ImpactAssessmentAgent", "ResponseCoordinationAgent"]
+        return {
+            "parsed_data": {
+                "port": _city_in(user) or CITIES[0],
+                "shipment_type": "electronic container",
+                "suppliers": [supplier.group(1).strip()] if supplier else [],
+                "urgency_level": "high" if urgent else "low",
+            },
+            "agent_call_sequence": [sequence[0], sequence[2]] if urgent else sequence,
+        }
+
+    if "data-fetching AI component" in system:
+        city = _city_in(user) or CITIES[0]
+        return {"tool_calls": [
+            {"function": {"name": "get_weather", "arguments": {"city": city, "history_date": "2026-10-11"}}},
+            {"function": {"name": "get_news", "arguments": {"news": [f"{city} port", "supply chain disruption"]}}},
+        ]}
+
+    if "impact assessment agent" in system:
+        request = json.loads(user)
+        handoff = request.get("handoff") or {}
+        risk = handoff.get("risk_score") or 0
+        return {
+            "severity": "high" if risk >= 7 else "medium" if risk >= 4 else "low",
+            "estimated_delay_days": handoff.get("expected_duration_days") or 1,
+            "estimated_cost_usd": round(risk * 25000, 2),
+            "affected_port_codes": handoff.get("affected_port_codes") or [],
+            "affected_suppliers": (request.get("supply_chain") or {}).get("suppliers") or [],
+            "key_impacts": [f"Scripted impact of: {handoff.get('summary', '')}"],
+            "summary": f"Scripted impact assessment for risk score {risk}.",
+        }
+
+    if "response coordination agent" in system:
+        handoff = json.loads(user).get("handoff") or {}
+        urgent = handoff.get("impact") is None
+        return {
+            "actions": [{"action": "Reroute pending shipments to an alternate port", "owner": "logistics",
+                         "priority": "immediate" if urgent else "24h"},
+                        {"action": "Confirm supplier capacity for the next two weeks", "owner": "procurement",
+                         "priority": "24h"}],
+            "notify": ["supply chain manager"],
+            "summary": "Scripted response plan" + (" (emergency path)." if urgent else "."),
+        }
+
+    findings = [marker for marker in DISRUPTION_MARKERS if marker in user]
+    disrupted = bool(findings)
+    return {
+        "is_disruption_detected": disrupted,
+        "risk_score": 7.5 if disrupted else 1.5,
+        "confidence": 0.8,
+        "summary": "Scripted assessment: " + (", ".join(findings) if disrupted else "no material risk signals."),
+        "key_findings": [f"Input mentions '{marker}'" for marker in findings],
+        "data_for_impact_agent": {"affected_port_codes": [], "expected_duration_days": 2 if disrupted else 0,
+                                  "triggering_event_type": "weather" if "Gale" in findings else "other"},
+        "data_for_response_agent": {"immediate_actions_recommended": [], "critical_skus_at_risk": []},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--upstream-latency-ms", type=float, default=50.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter", type=float, default=0.3, help="relative latency jitter, e.g. 0.3 = +/-30%%")
+    parser.add_argument("--disruption-rate", type=float, default=0.25)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of upstream requests failing with 429/503")
+    parser.add_argument("--marine-extra-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = MockConfig(upstream_latency_ms=args.upstream_latency_ms, llm_latency_ms=args.llm_latency_ms,
+                        jitter=args.jitter, disruption_rate=args.disruption_rate, error_rate=args.error_rate,
+                        marine_extra_latency_ms=args.marine_extra_latency_ms)
+    uvicorn.run(build_mock_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# sample_payloads.py
+"""
+Synthetic upstream responses shaped like weatherapi.com, NewsAPI, sinay.ai and
+sec-api.io, at realistic sizes, wrapped the way _fetch_data stores MCP tool
+results. Used by the benchmarks when no recorded payloads are supplied.
+"""
+import glob
+import json
+import os
+import random
+from datetime import date, datetime, timedelta
+
+CITIES = ["Baltimore", "Los Angeles", "New York", "Savannah", "Houston", "Rotterdam", "Shanghai", "Singapore"]
+
+
+def _condition(rng):
+    return {"text": rng.choice(["Sunny", "Partly cloudy", "Overcast", "Light rain", "Moderate rain", "Thundery outbreaks"]),
+            "icon": "//cdn.weatherapi.com/weather/64x64/day/116.png", "code": 1003}
+
+
+def _location(city):
+    return {"name": city, "region": "", "country": "", "lat": 39.29, "lon": -76.61,
+            "tz_id": "America/New_York", "localtime_epoch": 1760600000, "localtime": "2026-10-16 09:00"}
+
+
+def _hour(rng, when, storm):
+    wind = rng.uniform(5, 25) + (rng.uniform(40, 80) if storm else 0)
+    return {
+        "time_epoch": int(when.timestamp()), "time": when.strftime("%Y-%m-%d %H:%M"),
+        "temp_c": round(rng.uniform(5, 25), 1), "temp_f": 60.0, "is_day": 1, "condition": _condition(rng),
+        "wind_mph": round(wind / 1.6, 1), "wind_kph": round(wind, 1), "wind_degree": rng.randint(0, 359), "wind_dir": "NW",
+        "pressure_mb": 1012.0, "pressure_in": 29.88, "precip_mm": round(rng.uniform(0, 8 if storm else 1), 2), "precip_in": 0.0,
+        "snow_cm": 0.0, "humidity": rng.randint(40, 95), "cloud": rng.randint(0, 100), "feelslike_c": 12.0, "feelslike_f": 53.6,
+        "windchill_c": 11.0, "windchill_f": 51.8, "heatindex_c": 12.0, "heatindex_f": 53.6, "dewpoint_c": 8.0, "dewpoint_f": 46.4,
+        "will_it_rain": 1 if storm else 0, "chance_of_rain": rng.randint(60, 100) if storm else rng.randint(0, 30),
+        "will_it_snow": 0, "chance_of_snow": 0, "vis_km": 10.0, "vis_miles": 6.0,
+        "gust_mph": round(wind * 0.9, 1), "gust_kph": round(wind * 1.4, 1), "uv": 3.0,
+        "sig_ht_mt": round(rng.uniform(0.3, 1.5) + (rng.uniform(2, 5) if storm else 0), 2),
+        "swell_ht_mt": round(rng.uniform(0.2, 1.2) + (rng.uniform(1, 3) if storm else 0), 2),
+        "swell_period_secs": round(rng.uniform(5, 12), 1), "swell_dir": 120.0, "water_temp_c": 16.0,
+    }
+
+
+def _forecast_days(rng, start, days, storm):
+    forecast_days = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        hours = [_hour(rng, datetime(day.year, day.month, day.day, h), storm and offset == 1) for h in range(24)]
+        forecast_days.append({
+            "date": day.isoformat(), "date_epoch": 1760572800,
+            "day": {"maxtemp_c": max(h["temp_c"] for h in hours), "mintemp_c": min(h["temp_c"] for h in hours),
+                    "maxwind_kph": max(h["wind_kph"] for h in hours),
+                    "totalprecip_mm": round(sum(h["precip_mm"] for h in hours), 2),
+                    "daily_chance_of_rain": max(h["chance_of_rain"] for h in hours), "condition": _condition(rng)},
+            "astro": {"sunrise": "07:10 AM", "sunset": "06:25 PM", "moonrise": "10:02 PM", "moonset": "01:41 PM"},
+            "hour": hours,
+            "tides": [{"tide": [{"tide_time": f"{day.isoformat()} 0{i}:12", "tide_height_mt": "0.60", "tide_type": "HIGH"} for i in range(4)]}],
+        })
+    return forecast_days
+
+
+def _tool_result(*payloads):
+    return {
+        "meta": None,
+        "content": [{"type": "text", "text": json.dumps(p, indent=2), "annotations": None, "meta": None} for p in payloads],
+        "structuredContent": None,
+        "isError": False,
+    }
+
+
+def weather_sections(city, rng, storm=False):
+    """
+    Raw current/forecast/history/alerts/marine responses, in get_weather order.
+    """
+    today = date(2026, 10, 16)
+    current = {"location": _location(city), "current": {**_hour(rng, datetime(2026, 10, 16, 9), storm), "last_updated": "2026-10-16 09:00"}}
+    forecast = {"location": _location(city), "current": current["current"], "forecast": {"forecastday": _forecast_days(rng, today, 3, storm)}}
+    history = {"location": _location(city), "forecast": {"forecastday": _forecast_days(rng, today - timedelta(days=5), 1, False)}}
+    alerts = {"location": _location(city), "alerts": {"alert": [
+        {"headline": f"Gale Warning issued for {city} harbor", "severity": "Moderate", "urgency": "Expected",
+         "areas": city, "category": "Met", "event": "Gale Warning", "effective": "2026-10-16T09:00:00-04:00",
+         "expires": "2026-10-17T09:00:00-04:00", "desc": "Northwest winds 35 to 45 kt. " * 8}
+    ] if storm else []}}
+    marine = {"location": _location(city), "forecast": {"forecastday": _forecast_days(rng, today, 3, storm)}}
+    return [current, forecast, history, alerts, marine]
+
+
+def weather_result(city, rng, storm=False):
+    names = ["current", "forecast", "history", "alerts", "marine"]
+    sections = dict(zip(names, weather_sections(city, rng, storm)))
+    return _tool_result({**sections, "section_status": {name: {"status": "ok"} for name in names}})
+
+
+def news_payload(city, rng, incident=False):
+    topics = ["crane failure halts terminal", "strike closes port", "vessel grounding"] if incident else ["quarterly volumes", "new shipping route", "terminal upgrade"]
+    articles = [{
+        "source": {"id": None, "name": rng.choice(["Reuters", "Bloomberg", "FreightWaves", "JOC"])},
+        "author": "Staff", "title": f"{city}: {rng.choice(topics)} ({i})",
+        "description": "Lorem ipsum logistics update. " * 6, "url": f"https://news.example/{city}/{i}",
+        "urlToImage": f"https://img.example/{i}.jpg", "publishedAt": "2026-10-16T08:00:00Z",
+        "content": "Full article text truncated... " * 10,
+    } for i in range(10)]
+    return {"status": "ok", "totalResults": 120, "articles": articles}
+
+
+def news_result(city, rng, incident=False):
+    return _tool_result(news_payload(city, rng, incident))
+
+
+def congestion_payload(port_code, rng, congested=False):
+    wait = rng.uniform(30, 72) if congested else rng.uniform(1, 10)
+    return {"portCode": port_code, "vesselType": "cargo", "averageWaitingTimeHours": round(wait, 1),
+            "vesselsAtAnchor": rng.randint(15, 40) if congested else rng.randint(0, 5),
+            "congestionLevel": "HIGH" if congested else "LOW"}
+
+
+def congestion_result(port_code, rng, congested=False):
+    return _tool_result(congestion_payload(port_code, rng, congested))
+
+
+def vessel_payload(name, rng):
+    return {"vessels": [{"name": f"{name.upper()} {i}", "imo": str(9300000 + rng.randint(0, 99999)), "mmsi": str(rng.randint(200000000, 799999999)),
+                         "type": "Container Ship", "flag": "PA", "status": rng.choice(["Underway", "At anchor", "Moored"]),
+                         "destination": "USBAL", "eta": "2026-10-18T06:00:00Z"} for i in range(10)]}
+
+
+def sec_payload(rng):
+    return {"total": {"value": 1, "relation": "eq"}, "filings": [{
+        "companyName": "Apple Inc.", "formType": "10-Q", "filedAt": "2026-08-01T16:05:00-04:00",
+        "periodOfReport": "2026-06-28", "linkToFilingDetails": "https://www.sec.gov/Archives/edgar/data/320193/x.htm",
+        "documentFormatFiles": [{"sequence": str(i), "description": "EX", "documentUrl": f"https://www.sec.gov/{i}.htm",
+                                 "type": "EX-101", "size": "12345"} for i in range(12)],
+    }]}
+
+
+def sec_result(rng):
+    return _tool_result(sec_payload(rng))
+
+
+def fetched_data(seed: int, disrupted: bool = None) -> dict:
+    """
+    One lane's fetched_data, as _fetch_data would return it.
+    """
+    rng = random.Random(seed)
+    disrupted = rng.random() < 0.2 if disrupted is None else disrupted
+    city = CITIES[seed % len(CITIES)]
+    return {
+        "get_weather": weather_result(city, rng, storm=disrupted and rng.random() < 0.7),
+        "get_news": news_result(city, rng, incident=disrupted and rng.random() < 0.6),
+        "get_port_congestion": congestion_result("USBAL", rng, congested=disrupted and rng.random() < 0.5),
+        "get_sec_filing": sec_result(rng),
+    }
+
+
+def load_payloads(directory: str = None, count: int = 20) -> list:
+    """
+    Recorded fetched_data dumps (*.json) from `directory` when given, otherwise
+    `count` synthetic ones.
+    """
+    if directory:
+        paths = sorted(glob.glob(os.path.join(directory, "*.json")))
+        if not paths:
+            raise FileNotFoundError(f"No *.json payloads found in {directory}")
+        payloads = []
+        for path in paths:
+            with open(path) as f:
+                payloads.append(json.load(f))
+        return payloads
+    return [fetched_data(seed) for seed in range(count)]
@@ -0,0 +1,160 @@
+# http_pool.py
+import importlib.util
+import os
+import time
+from typing import Dict, Any
+from urllib.parse import urlsplit
+
+import httpx
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class _ConnectTrace:
+    """
+    httpcore trace hook for a single request. If the request had to open a new
+    TCP connection it was a pool miss, otherwise it reused a kept-alive one.
+    """
+    def __init__(self):
+        self.opened_connection = False
+        self.connect_started = None
+        self.connect_seconds = 0.0
+
+    async def __call__(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.started":
+            self.opened_connection = True
+            self.connect_started = time.perf_counter()
+        elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            # TLS completes after TCP, so the last event wins and covers the full handshake
+            if self.connect_started is not None:
+                self.connect_seconds = time.perf_counter() - self.connect_started
+
+
+class UpstreamClientRegistry:
+    """
+    Server-lifetime registry of pooled httpx clients, one per upstream host.
+
+    Every tool goes through `request()` instead of opening its own
+    `httpx.AsyncClient`, so DNS, TCP and TLS setup are paid once per kept-alive
+    connection rather than once per call. Limits are tunable through the
+    UPSTREAM_* environment variables.
+    """
+    def __init__(self,
+                 max_connections: int = None,
+                 max_keepalive_connections: int = None,
+                 keepalive_expiry: float = None,
+                 http2: bool = None,
+                 timeout: float = None):
+        self.limits = httpx.Limits(
+            max_connections=max_connections or _env_int("UPSTREAM_MAX_CONNECTIONS", 50),
+            max_keepalive_connections=max_keepalive_connections or _env_int("UPSTREAM_MAX_KEEPALIVE", 20),
+            keepalive_expiry=keepalive_expiry or _env_float("UPSTREAM_KEEPALIVE_EXPIRY", 60.0),
+        )
+        self.timeout = httpx.Timeout(timeout or _env_float("UPSTREAM_TIMEOUT", 20.0))
+
+        # HTTP/2 needs the optional `h2` package (pip install httpx[http2])
+        h2_available = importlib.util.find_spec("h2") is not None
+        wants_http2 = _env_flag("UPSTREAM_HTTP2", True) if http2 is None else http2
+        self.http2 = wants_http2 and h2_available
+
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self.closed = False
+
+    @staticmethod
+    def host_key(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def client_for(self, url: str) -> httpx.AsyncClient:
+        """
+        Returns the pooled client for the host of `url`, creating it on first use.
+        """
+        if self.closed:
+            raise RuntimeError("Upstream client registry is closed.")
+
+        key = self.host_key(url)
+        client = self._clients.get(key)
+        if client is None:
+            client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=self.http2)
+            self._clients[key] = client
+            self._stats[key] = {
+                "requests": 0,
+                "pool_hits": 0,
+                "pool_misses": 0,
+                "connect_time_total_ms": 0.0,
+                "connect_time_max_ms": 0.0,
+                "http_versions": {},
+            }
+        return client
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Sends a request through the host's pooled client and records whether a
+        kept-alive connection was reused and how long any new connect took.
+        """
+        client = self.client_for(url)
+        trace = _ConnectTrace()
+        extensions = dict(kwargs.pop("extensions", None) or {})
+        extensions["trace"] = trace
+
+        response = await client.request(method, url, extensions=extensions, **kwargs)
+
+        stats = self._stats[self.host_key(url)]
+        stats["requests"] += 1
+        if trace.opened_connection:
+            connect_ms = trace.connect_seconds * 1000
+            stats["pool_misses"] += 1
+            stats["connect_time_total_ms"] += connect_ms
+            stats["connect_time_max_ms"] = max(stats["connect_time_max_ms"], connect_ms)
+        else:
+            stats["pool_hits"] += 1
+        versions = stats["http_versions"]
+        versions[response.http_version] = versions.get(response.http_version, 0) + 1
+        return response
+
+    def stats(self) -> dict:
+        hosts = {}
+        totals = {"requests": 0, "pool_hits": 0, "pool_misses": 0, "connect_time_total_ms": 0.0}
+        for key, stats in self._stats.items():
+            misses = stats["pool_misses"]
+            hosts[key] = {
+                **stats,
+                "http_versions": dict(stats["http_versions"]),
+                "connect_time_avg_ms": round(stats["connect_time_total_ms"] / misses, 3) if misses else 0.0,
+            }
+            for field in totals:
+                totals[field] += stats[field]
+        totals["connect_time_total_ms"] = round(totals["connect_time_total_ms"], 3)
+        totals["pool_hit_ratio"] = round(totals["pool_hits"] / totals["requests"], 4) if totals["requests"] else 0.0
+        return {
+            "http2": self.http2,
+            "limits": {
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+                "keepalive_expiry": self.limits.keepalive_expiry,
+            },
+            "totals": totals,
+            "hosts": hosts,
+        }
+
+    async def aclose(self):
+        self.closed = True
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
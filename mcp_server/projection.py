@@ -0,0 +1,88 @@
+# projection.py
+import os
+import sys
+from dataclasses import asdict
+from typing import Any, List, Optional
+
+# Summaries are the agent's risk-feature records (agent_host/risk_features.py),
+# so the agent takes a summary=True result as-is instead of re-extracting it
+# and there is one implementation of each summary to keep up to date.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent_host"))
+
+from risk_features import (congestion_features_from_payload, news_features_from_payload,
+                           sec_filing_features_from_payload, vessel_features_from_payload,
+                           weather_features_from_sections)
+
+
+def _pick(value: Any, path: List[str]) -> Any:
+    """
+    Follows `path` into `value`. Lists are mapped over, so "articles.title"
+    returns every article's title.
+    """
+    if not path:
+        return value
+    if isinstance(value, list):
+        picked = [_pick(item, path) for item in value]
+        return [item for item in picked if item is not None]
+    if isinstance(value, dict) and path[0] in value:
+        return _pick(value[path[0]], path[1:])
+    return None
+
+
+def _merge(target: dict, path: List[str], value: Any):
+    for key in path[:-1]:
+        target = target.setdefault(key, {})
+    target[path[-1]] = value
+
+
+def project(payload: Any, fields: Optional[List[str]]) -> Any:
+    """
+    Keeps only the dotted `fields` of `payload`, e.g.
+    ["current.wind_kph", "alerts.alert.headline"]. Fields that are not present
+    are left out; no fields returns the payload unchanged.
+    """
+    if not fields:
+        return payload
+    if isinstance(payload, list):
+        return [project(item, fields) for item in payload]
+
+    projected = {}
+    for field in fields:
+        path = [part for part in field.split(".") if part]
+        value = _pick(payload, path)
+        if value is not None and value != []:
+            _merge(projected, path, value)
+    return projected
+
+
+def _summary(features) -> dict:
+    return {"mode": "summary", **asdict(features)}
+
+
+def summarize_weather(sections: dict, status: dict = None) -> dict:
+    """
+    Pre-aggregated get_weather result: current conditions, forecast/history
+    peaks, active alerts and marine maxima instead of the hourly arrays.
+    `status` is the per-section fetch status (missing and stale sections).
+    """
+    return _summary(weather_features_from_sections({**sections, "section_status": status or {}}))
+
+
+def summarize_news(payload: dict) -> dict:
+    return _summary(news_features_from_payload(payload))
+
+
+def summarize_congestion(payload: Any) -> dict:
+    """
+    Keeps the port identity and the congestion indicators (waiting time,
+    vessels at anchor, congestion level, ...) wherever they sit in the response.
+    """
+    return _summary(congestion_features_from_payload(payload))
+
+
+def summarize_vessels(payload: Any) -> dict:
+    return _summary(vessel_features_from_payload(payload))
+
+
+def summarize_sec_filing(payload: dict) -> dict:
+    return _summary(sec_filing_features_from_payload(payload))
@@ -0,0 +1,219 @@
+# rate_limit.py
+import asyncio
+import hashlib
+import os
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from http_pool import UpstreamClientRegistry
+
+# Query parameters / headers that carry an upstream API key
+CREDENTIAL_FIELDS = ("key", "apikey", "api_key", "token", "authorization", "x-api-key")
+
+
+def credential_id(params: dict = None, headers: dict = None) -> Optional[str]:
+    """
+    Short fingerprint of the API key a request is sent with, so quotas are
+    tracked per key without the key itself showing up in stats or metrics.
+    """
+    for source in (params or {}, headers or {}):
+        for name, value in source.items():
+            if name.lower() in CREDENTIAL_FIELDS and value:
+                return hashlib.sha256(str(value).encode()).hexdigest()[:8]
+    return None
+
+
+def parse_retry_after(value: Optional[str], now: float = None) -> Optional[float]:
+    """
+    Seconds to wait from a Retry-After header (delta-seconds or HTTP-date).
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - (now or time.time()))
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def parse_rate_limit_headers(headers, now: float = None) -> tuple:
+    """
+    (remaining, reset_seconds) from X-RateLimit-* / RateLimit-* headers, either
+    may be None. Reset values that look like epoch timestamps are converted.
+    """
+    def first(*names):
+        for name in names:
+            value = headers.get(name)
+            if value is not None:
+                try:
+                    return float(value.split(",")[0].split(";")[0])
+                except ValueError:
+                    return None
+        return None
+
+    remaining = first("x-ratelimit-remaining", "ratelimit-remaining")
+    reset = first("x-ratelimit-reset", "ratelimit-reset")
+    if reset is not None and reset > 1e9:
+        reset = max(0.0, reset - (now or time.time()))
+    return remaining, reset
+
+
+class TokenBucket:
+    """
+    Token bucket that adapts to what the upstream reports: `rate` tokens per
+    second, holding at most `burst`.
+
+    A 429 halves the rate (down to `min_rate`), each success wins back a
+    little of it, and a Retry-After or exhausted quota pauses the bucket.
+    """
+    def __init__(self, rate: float, burst: float, min_rate: float = None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate if min_rate is not None else max(rate / 16, 0.1)
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """
+        Waits for a token. Returns the seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                delay = self.paused_until - now
+            else:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            waited += delay
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    def throttled(self):
+        self.rate = max(self.min_rate, self.rate / 2)
+
+    def succeeded(self):
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def limit_remaining(self, remaining: float, reset_seconds: Optional[float]):
+        """
+        Never hold more tokens than the upstream says are left in its window.
+        """
+        self._refill()
+        self.tokens = min(self.tokens, remaining)
+        if remaining < 1 and reset_seconds:
+            self.pause(reset_seconds)
+
+
+class HostRateLimiter:
+    """
+    One adaptive token bucket per upstream host and API key, shared by every
+    tool, so a batch sweep cannot burst past what a provider allows. A rate
+    of 0 disables limiting.
+    """
+    def __init__(self, rate: float = 10.0, burst: float = 20.0, max_pause: float = 60.0):
+        self.rate = rate
+        self.burst = burst
+        # cap on how long one Retry-After / reset header may stall a host
+        self.max_pause = max_pause
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    @classmethod
+    def from_env(cls) -> "HostRateLimiter":
+        """
+        UPSTREAM_RATE_LIMIT is requests per second per host and key (0 disables),
+        UPSTREAM_RATE_BURST the bucket size, UPSTREAM_RATE_MAX_PAUSE the longest
+        Retry-After honoured.
+        """
+        rate = float(os.getenv("UPSTREAM_RATE_LIMIT", "10"))
+        burst = float(os.getenv("UPSTREAM_RATE_BURST", "20"))
+        max_pause = float(os.getenv("UPSTREAM_RATE_MAX_PAUSE", "60"))
+        return cls(rate=rate, burst=burst, max_pause=max_pause)
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    @staticmethod
+    def bucket_key(url: str, credential: str = None) -> str:
+        host = UpstreamClientRegistry.host_key(url)
+        return f"{host}#{credential}" if credential else host
+
+    def _bucket(self, key: str) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            self._stats[key] = {"requests": 0, "throttled": 0, "wait_seconds_total": 0.0,
+                                "upstream_429": 0, "pauses": 0}
+        return bucket
+
+    async def acquire(self, url: str, credential: str = None) -> float:
+        """
+        Waits for the host/key's next token. Returns the seconds spent waiting.
+        """
+        if not self.enabled:
+            return 0.0
+        key = self.bucket_key(url, credential)
+        waited = await self._bucket(key).acquire()
+        stats = self._stats[key]
+        stats["requests"] += 1
+        if waited:
+            stats["throttled"] += 1
+            stats["wait_seconds_total"] = round(stats["wait_seconds_total"] + waited, 3)
+        return waited
+
+    def observe(self, url: str, credential: str, status_code: int, headers) -> Optional[float]:
+        """
+        Adapts the host/key's bucket to a response. Returns the Retry-After
+        delay in seconds, if the upstream sent one.
+        """
+        retry_after = parse_retry_after(headers.get("retry-after"))
+        if retry_after is not None:
+            retry_after = min(retry_after, self.max_pause)
+        if not self.enabled:
+            return retry_after
+
+        key = self.bucket_key(url, credential)
+        bucket = self._bucket(key)
+        stats = self._stats[key]
+        remaining, reset = parse_rate_limit_headers(headers)
+        if remaining is not None:
+            bucket.limit_remaining(remaining, min(reset, self.max_pause) if reset is not None else None)
+
+        if status_code == 429:
+            stats["upstream_429"] += 1
+            bucket.throttled()
+        elif status_code < 400:
+            bucket.succeeded()
+        if retry_after and status_code in (429, 503):
+            stats["pauses"] += 1
+            bucket.pause(retry_after)
+        return retry_after
+
+    def stats(self) -> dict:
+        hosts = {}
+        for key, stats in self._stats.items():
+            bucket = self._buckets[key]
+            hosts[key] = {**stats, "current_rate": round(bucket.rate, 3),
+                          "paused_seconds": round(max(0.0, bucket.paused_until - time.monotonic()), 3)}
+        return {"rate": self.rate, "burst": self.burst, "hosts": hosts}
@@ -0,0 +1,185 @@
+# resilience.py
+import os
+import random
+import time
+from typing import Dict
+
+import httpx
+
+# Statuses worth retrying: throttling and transient server-side failures
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Circuit breaker states, also the values of the /metrics gauge
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+STATE_NAMES = {CLOSED: "closed", HALF_OPEN: "half_open", OPEN: "open"}
+
+
+class UpstreamUnavailable(Exception):
+    """
+    Raised without contacting the upstream while its circuit breaker is open.
+    """
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"Upstream {host} is unavailable (circuit open, next probe in {retry_in:.0f}s).")
+        self.host = host
+        self.retry_in = retry_in
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUSES
+    return isinstance(error, httpx.TransportError)
+
+
+class RetryPolicy:
+    """
+    Jittered exponential backoff with a retry budget shared by all upstream
+    requests.
+
+    Every first attempt deposits `budget_ratio` retries into the budget (up to
+    `budget_max`), every retry withdraws one. While upstreams are healthy the
+    budget fills up; during an outage retries stop at roughly `budget_ratio`
+    extra load instead of multiplying it by `max_retries`.
+    """
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 10.0,
+                 budget_ratio: float = 0.2, budget_max: float = 20.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.budget_max = budget_max
+        self.budget = budget_max
+        self._stats = {"attempts": 0, "retries": 0, "budget_exhausted": 0}
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        """
+        UPSTREAM_MAX_RETRIES (0 disables retries), UPSTREAM_RETRY_BASE_DELAY and
+        UPSTREAM_RETRY_MAX_DELAY in seconds, UPSTREAM_RETRY_BUDGET_RATIO and
+        UPSTREAM_RETRY_BUDGET_MAX.
+        """
+        return cls(
+            max_retries=int(os.getenv("UPSTREAM_MAX_RETRIES", "3")),
+            base_delay=float(os.getenv("UPSTREAM_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("UPSTREAM_RETRY_MAX_DELAY", "10")),
+            budget_ratio=float(os.getenv("UPSTREAM_RETRY_BUDGET_RATIO", "0.2")),
+            budget_max=float(os.getenv("UPSTREAM_RETRY_BUDGET_MAX", "20")),
+        )
+
+    def record_attempt(self):
+        self._stats["attempts"] += 1
+        self.budget = min(self.budget_max, self.budget + self.budget_ratio)
+
+    def should_retry(self, attempt: int, error: Exception) -> bool:
+        """
+        attempt is the number of retries already made for this request.
+        """
+        if attempt >= self.max_retries or not is_retryable(error):
+            return False
+        if self.budget < 1:
+            self._stats["budget_exhausted"] += 1
+            return False
+        self.budget -= 1
+        self._stats["retries"] += 1
+        return True
+
+    def backoff(self, attempt: int, retry_after: float = None) -> float:
+        """
+        Full-jitter exponential delay, but never shorter than Retry-After.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def stats(self) -> dict:
+        return {**self._stats, "budget": round(self.budget, 2), "max_retries": self.max_retries}
+
+
+class _Circuit:
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.probe_started = 0.0
+        self.opened = 0
+        self.rejected = 0
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker. `failure_threshold` consecutive failures open
+    the circuit; requests then fail fast with UpstreamUnavailable until
+    `reset_timeout` has passed, when a single probe request is let through.
+    A successful probe closes the circuit, a failed one re-opens it.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._circuits: Dict[str, _Circuit] = {}
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreaker":
+        """
+        UPSTREAM_BREAKER_FAILURES (0 disables) and UPSTREAM_BREAKER_RESET_SECONDS.
+        """
+        return cls(failure_threshold=int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5")),
+                   reset_timeout=float(os.getenv("UPSTREAM_BREAKER_RESET_SECONDS", "30")))
+
+    def _circuit(self, host: str) -> _Circuit:
+        circuit = self._circuits.get(host)
+        if circuit is None:
+            circuit = self._circuits[host] = _Circuit()
+        return circuit
+
+    def before_request(self, host: str):
+        """
+        Raises UpstreamUnavailable if the host's circuit does not admit a request.
+        """
+        if self.failure_threshold <= 0:
+            return
+        circuit = self._circuit(host)
+        if circuit.state == CLOSED:
+            return
+        now = time.monotonic()
+        retry_in = circuit.opened_at + self.reset_timeout - now
+        if circuit.state == OPEN and retry_in <= 0:
+            circuit.state = HALF_OPEN
+        # a probe that never reported back (cancelled) must not wedge the circuit
+        if circuit.state == HALF_OPEN and (not circuit.probing or now - circuit.probe_started > self.reset_timeout):
+            circuit.probing = True
+            circuit.probe_started = now
+            return
+        circuit.rejected += 1
+        raise UpstreamUnavailable(host, max(0.0, retry_in))
+
+    def record_success(self, host: str):
+        if self.failure_threshold <= 0:
+            return
+        circuit = self._circuit(host)
+        if circuit.state != CLOSED:
+            print(f"[MCP Server] Circuit for {host} closed.")
+        circuit.state = CLOSED
+        circuit.failures = 0
+        circuit.probing = False
+
+    def record_failure(self, host: str):
+        if self.failure_threshold <= 0:
+            return
+        circuit = self._circuit(host)
+        circuit.failures += 1
+        circuit.probing = False
+        if circuit.state == HALF_OPEN or (circuit.state == CLOSED and circuit.failures >= self.failure_threshold):
+            circuit.state = OPEN
+            circuit.opened_at = time.monotonic()
+            circuit.opened += 1
+            print(f"[MCP Server] Circuit for {host} opened after {circuit.failures} consecutive failures.")
+
+    def state(self, host: str) -> int:
+        circuit = self._circuits.get(host)
+        return circuit.state if circuit else CLOSED
+
+    def stats(self) -> dict:
+        return {
+            host: {"state": STATE_NAMES[circuit.state], "consecutive_failures": circuit.failures,
+                   "opened": circuit.opened, "rejected": circuit.rejected}
+            for host, circuit in self._circuits.items()
+        }
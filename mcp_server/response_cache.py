@@ -0,0 +1,337 @@
+# response_cache.py
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+@dataclass
+class CachePolicy:
+    """
+    ttl: seconds an entry is served as fresh.
+    stale_ttl: extra seconds an expired entry is still served while it is
+        refreshed in the background (stale-while-revalidate).
+    """
+    ttl: float
+    stale_ttl: float = 0.0
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    stored_at: float
+    expires_at: float
+    stale_until: float
+
+
+def normalize_args(value):
+    """
+    Normalizes tool arguments so trivially different calls share a cache key:
+    strings are trimmed, whitespace-collapsed and case-folded, dict keys are
+    sorted and keyword lists are treated as unordered sets.
+    """
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, dict):
+        return {str(k): normalize_args(v) for k, v in sorted(value.items()) if v is not None}
+    if isinstance(value, (list, tuple, set)):
+        items = [normalize_args(v) for v in value]
+        return sorted(items, key=lambda item: json.dumps(item, sort_keys=True))
+    return value
+
+
+def make_cache_key(namespace: str, args: dict) -> str:
+    normalized = json.dumps(normalize_args(args or {}), sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(normalized.encode()).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class SQLiteCacheBackend:
+    """
+    On-disk cache tier so responses survive server restarts. Entries are
+    evicted least-recently-used once `max_entries` is exceeded.
+
+    Lookups read on the caller's thread (WAL: they never wait for a write).
+    Every write (stored entries and the last-access times that drive
+    eviction) runs on one writer thread with its own connection, so the
+    event loop never waits on a commit; access times from many hits are
+    batched into one transaction. Expired rows stay until evicted, so the
+    last response is still there to peek() at while an upstream is down.
+    """
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._write_conn = self._connect(check_same_thread=False)
+        self._write_conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " stale_until REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._write_conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_access ON response_cache(last_access)")
+        self._write_conn.commit()
+        self._read_conn = self._connect()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache-writer")
+        self._access_lock = threading.Lock()
+        self._pending_access: Dict[str, float] = {}
+        # entries queued for the writer, served to get() until committed
+        self._pending_writes: Dict[str, CacheEntry] = {}
+        self._access_flush_queued = False
+        self.write_errors = 0
+
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, **kwargs)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _submit(self, fn, *args):
+        def run():
+            try:
+                fn(*args)
+            except Exception as e:
+                self.write_errors += 1
+                print(f"[MCP Server] Response cache write failed: {e}")
+        return self._writer.submit(run)
+
+    def _read(self, key: str) -> Optional[CacheEntry]:
+        with self._access_lock:
+            if key in self._pending_writes:
+                return self._pending_writes[key]
+        row = self._read_conn.execute(
+            "SELECT value, stored_at, expires_at, stale_until FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        return CacheEntry(json.loads(row[0]), row[1], row[2], row[3]) if row is not None else None
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """
+        The entry for `key` while it can still be served (fresh or stale).
+        Rows past their stale window are skipped, not deleted: peek() may
+        still need them while an upstream is down, and LRU eviction on write
+        bounds the table.
+        """
+        entry = self._read(key)
+        if entry is None or entry.stale_until < time.time():
+            return None
+        with self._access_lock:
+            self._pending_access[key] = time.time()
+            queue_flush = not self._access_flush_queued
+            self._access_flush_queued = True
+        if queue_flush:
+            self._submit(self._flush_access)
+        return entry
+
+    def peek(self, key: str) -> Optional[CacheEntry]:
+        """
+        The stored entry for `key`, however old, without recording an access.
+        """
+        return self._read(key)
+
+    def _flush_access(self):
+        with self._access_lock:
+            pending, self._pending_access = self._pending_access, {}
+            self._access_flush_queued = False
+        with self._write_conn:
+            self._write_conn.executemany("UPDATE response_cache SET last_access = ? WHERE key = ?",
+                                         [(accessed, key) for key, accessed in pending.items()])
+
+    def set(self, key: str, entry: CacheEntry):
+        with self._access_lock:
+            self._pending_writes[key] = entry
+        self._submit(self._write_entry, key, entry, time.time())
+
+    def _written(self, key: str, entry: CacheEntry):
+        with self._access_lock:
+            if key in self._pending_writes and self._pending_writes[key] is entry:
+                del self._pending_writes[key]
+
+    def _write_entry(self, key: str, entry: CacheEntry, accessed: float):
+        try:
+            self._store_entry(key, entry, accessed)
+        finally:
+            self._written(key, entry)
+
+    def _store_entry(self, key: str, entry: CacheEntry, accessed: float):
+        with self._write_conn:
+            self._write_conn.execute(
+                "INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (key, json.dumps(entry.value), entry.stored_at, entry.expires_at, entry.stale_until, accessed),
+            )
+            self._write_conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                " SELECT key FROM response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def flush(self):
+        """
+        Blocks until every queued write has been committed.
+        """
+        self._writer.submit(lambda: None).result()
+
+    def __len__(self):
+        return self._read_conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        self._read_conn.close()
+        self._write_conn.close()
+
+
+class ResponseCache:
+    """
+    TTL + stale-while-revalidate cache for upstream responses, keyed on a
+    namespace (tool or tool:endpoint) plus normalized arguments.
+
+    A bounded in-memory LRU serves hot keys; an optional persistent backend
+    (see SQLiteCacheBackend) is consulted on memory misses and written through.
+    Expired entries inside their stale window are returned immediately while a
+    single background task refreshes them, so callers never wait on a refresh.
+    """
+    def __init__(self, policies: Dict[str, CachePolicy], default_policy: CachePolicy = None,
+                 max_entries: int = 2048, persistent_backend: SQLiteCacheBackend = None):
+        self.policies = policies
+        self.default_policy = default_policy or CachePolicy(ttl=60, stale_ttl=60)
+        self.max_entries = max_entries
+        self.persistent_backend = persistent_backend
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "disk_hits": 0,
+            "refreshes": 0,
+            "refresh_failures": 0,
+            "evictions": 0,
+        }
+
+    @classmethod
+    def from_env(cls, policies: Dict[str, CachePolicy]) -> "ResponseCache":
+        """
+        RESPONSE_CACHE_MAX_ENTRIES bounds the memory tier and RESPONSE_CACHE_PATH,
+        when set, enables the SQLite tier at that path.
+        """
+        max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+        path = os.getenv("RESPONSE_CACHE_PATH")
+        backend = SQLiteCacheBackend(path, max_entries=max_entries * 8) if path else None
+        return cls(policies, max_entries=max_entries, persistent_backend=backend)
+
+    def policy_for(self, namespace: str) -> CachePolicy:
+        return self.policies.get(namespace, self.default_policy)
+
+    def _lookup(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+        if self.persistent_backend is not None:
+            entry = self.persistent_backend.get(key)
+            if entry is not None:
+                self._stats["disk_hits"] += 1
+                self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: CacheEntry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _store(self, key: str, value: Any, policy: CachePolicy):
+        now = time.time()
+        entry = CacheEntry(value, now, now + policy.ttl, now + policy.ttl + policy.stale_ttl)
+        self._remember(key, entry)
+        if self.persistent_backend is not None:
+            self.persistent_backend.set(key, entry)
+
+    async def get_or_load(self, namespace: str, args: dict, loader: Callable[[], Awaitable[Any]],
+                          policy: CachePolicy = None) -> Any:
+        """
+        Returns the cached value for (namespace, args), calling `loader` on a miss.
+
+        Args:
+            namespace (str): Tool or tool:endpoint name the policy is looked up by.
+            args (dict): The caller-facing arguments (never secrets such as API keys).
+            loader: Zero-argument coroutine function that fetches a fresh value.
+            policy (CachePolicy): Overrides the namespace policy for this call.
+        """
+        policy = policy or self.policy_for(namespace)
+        if policy.ttl <= 0:
+            return await loader()
+
+        key = make_cache_key(namespace, args)
+        entry = self._lookup(key)
+        now = time.time()
+
+        if entry is not None and now < entry.expires_at:
+            self._stats["hits"] += 1
+            return entry.value
+
+        if entry is not None and now < entry.stale_until:
+            self._stats["stale_hits"] += 1
+            if key not in self._refreshing:
+                self._refreshing[key] = asyncio.create_task(self._refresh(key, loader, policy))
+            return entry.value
+
+        self._stats["misses"] += 1
+        value = await loader()
+        self._store(key, value, policy)
+        return value
+
+    def peek(self, namespace: str, args: dict) -> Optional[CacheEntry]:
+        """
+        The last stored entry for (namespace, args), however old, without
+        counting a lookup or touching LRU order. Used to answer while an
+        upstream is unavailable.
+        """
+        key = make_cache_key(namespace, args)
+        entry = self._entries.get(key)
+        if entry is None and self.persistent_backend is not None:
+            entry = self.persistent_backend.peek(key)
+        return entry
+
+    async def _refresh(self, key: str, loader, policy: CachePolicy):
+        try:
+            value = await loader()
+            self._store(key, value, policy)
+            self._stats["refreshes"] += 1
+        except Exception as e:
+            # keep serving the stale entry until its window closes
+            self._stats["refresh_failures"] += 1
+            print(f"[MCP Server] Background refresh failed for {key}: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self._stats["hits"] + self._stats["stale_hits"] + self._stats["misses"]
+        served = self._stats["hits"] + self._stats["stale_hits"]
+        return {
+            **self._stats,
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "persistent_entries": len(self.persistent_backend) if self.persistent_backend is not None else None,
+            "persistent_write_errors": self.persistent_backend.write_errors if self.persistent_backend is not None else None,
+            "refreshing": len(self._refreshing),
+        }
+
+    async def aclose(self):
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.persistent_backend is not None:
+            # queued writes are waited for on a thread, not on the loop
+            await asyncio.to_thread(self.persistent_backend.flush)
+            self.persistent_backend.close()
@@ -1,65 +1,342 @@
-from typing import Dict, Any , List
+from typing import Dict, Any , List, Optional
+from contextlib import asynccontextmanager
 from mcp.server.fastmcp import FastMCP
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+import uvicorn
 import httpx
 import os
+import re
 from dotenv import load_dotenv
 import asyncio
+import time
+from datetime import date
+
+from http_pool import UpstreamClientRegistry
+from response_cache import ResponseCache, CachePolicy
+from singleflight import SingleFlight, request_key
+from server_metrics import ServerMetrics, PrometheusSink, gauge_lines
+from rate_limit import HostRateLimiter, credential_id
+from resilience import RetryPolicy, CircuitBreaker, UpstreamUnavailable
+from projection import (project, summarize_weather, summarize_news, summarize_congestion,
+                        summarize_vessels, summarize_sec_filing)
 
 load_dotenv()
 
+# Upstream base URLs; overridable so the server can run against local stand-ins (see benchmarks/)
+WEATHER_API_BASE_URL = os.getenv("WEATHER_API_BASE_URL", "http://api.weatherapi.com/v1")
+NEWS_API_URL = os.getenv("NEWS_API_URL", "https://newsapi.org/v2/everything")
+SINAY_API_BASE_URL = os.getenv("SINAY_API_BASE_URL", "https://api.sinay.ai")
+SEC_API_URL = os.getenv("SEC_API_URL", "https://api.sec-api.io")
+
 # Stateful server (maintains session state)
-mcp = FastMCP("StatefulServer" , port = 8001)
+mcp = FastMCP("StatefulServer" , port = int(os.getenv("MCP_PORT", "8001")))
 
-async def fetch(client: httpx.AsyncClient, url: str, params: dict = None):
-    resp = await client.get(url, params=params)
-    resp.raise_for_status()
-    return resp.json()
+# One pooled client per upstream host, shared by every tool for the server lifetime
+upstream_clients = UpstreamClientRegistry()
 
-@mcp.tool()
-async def get_weather(city: str , history_date: str):
+# Per tool/endpoint freshness. Past weather history, vessel details and 10-Q
+# lookups barely change; forecasts, alerts and congestion move in minutes; a
+# new 8-K should show up within the hour.
+CACHE_POLICIES = {
+    "get_weather:current": CachePolicy(ttl=120, stale_ttl=300),
+    "get_weather:forecast": CachePolicy(ttl=600, stale_ttl=1200),
+    "get_weather:history": CachePolicy(ttl=7 * 24 * 3600, stale_ttl=24 * 3600),
+    "get_weather:history_today": CachePolicy(ttl=600, stale_ttl=1200),
+    "get_weather:alerts": CachePolicy(ttl=120, stale_ttl=180),
+    "get_weather:marine": CachePolicy(ttl=900, stale_ttl=1800),
+    "get_news": CachePolicy(ttl=300, stale_ttl=600),
+    "get_port_congestion": CachePolicy(ttl=300, stale_ttl=600),
+    "get_vessel_detail": CachePolicy(ttl=6 * 3600, stale_ttl=6 * 3600),
+    "get_sec_filing": CachePolicy(ttl=12 * 3600, stale_ttl=24 * 3600),
+    "get_sec_filing:8-K": CachePolicy(ttl=3600, stale_ttl=3 * 3600),
+}
+
+response_cache = ResponseCache.from_env(CACHE_POLICIES)
+
+# Concurrent identical upstream requests share one HTTP round trip
+upstream_flights = SingleFlight()
+
+# Tool and upstream request spans, served at /metrics (SERVER_METRICS=0 disables)
+server_metrics = ServerMetrics.from_env()
+
+# Per host and API key request rate, shared by every tool (UPSTREAM_RATE_LIMIT / UPSTREAM_RATE_BURST)
+upstream_rate_limiter = HostRateLimiter.from_env()
+
+# Backoff and retry budget for 429/5xx/connection errors, and fail-fast while a host is down
+upstream_retries = RetryPolicy.from_env()
+upstream_breaker = CircuitBreaker.from_env()
+
+# Batch tools: locations per call and locations fetched at once
+BATCH_MAX_LOCATIONS = int(os.getenv("BATCH_MAX_LOCATIONS", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+WEATHER_SECTIONS = ["current", "forecast", "history", "alerts", "marine"]
+
+# SEC form types get_sec_filing accepts, e.g. "10-Q", "8-K", "10-K/A"
+_FORM_TYPE = re.compile(r"^[0-9A-Z][0-9A-Z/-]*$")
+
+# How long get_weather waits for each section before answering without it
+# (marine.json is the usual straggler, and inland cities rarely need it)
+WEATHER_SECTION_DEADLINES = {
+    "current": float(os.getenv("WEATHER_DEADLINE_CURRENT", "4")),
+    "forecast": float(os.getenv("WEATHER_DEADLINE_FORECAST", "6")),
+    "history": float(os.getenv("WEATHER_DEADLINE_HISTORY", "6")),
+    "alerts": float(os.getenv("WEATHER_DEADLINE_ALERTS", "4")),
+    "marine": float(os.getenv("WEATHER_DEADLINE_MARINE", "3")),
+}
+
+# Section fetches that outlived their deadline; they finish in the background and warm the cache
+_late_fetches = set()
+
+async def _attempt(url: str, params: dict, headers: dict, method: str, json_body: dict, credential: str):
+    """
+    One rate-limited request. Returns (response, retry_after) or raises on a
+    transport error; status checks are left to the caller.
+    """
+    waited = await upstream_rate_limiter.acquire(url, credential)
+    host = upstream_clients.host_key(url)
+    if waited:
+        server_metrics.record("rate_limit_wait", waited, {"host": host})
+    started = time.perf_counter()
+    status = "error"
+    size = None
+    try:
+        resp = await upstream_clients.request(method, url, params=params, headers=headers, json=json_body)
+        status = str(resp.status_code)
+        size = len(resp.content)
+        return resp, upstream_rate_limiter.observe(url, credential, resp.status_code, resp.headers)
+    finally:
+        server_metrics.record("upstream_request", time.perf_counter() - started,
+                              {"host": host, "method": method, "status": status}, size)
+
+async def _send(url: str, params: dict, headers: dict, method: str, json_body: dict):
+    host = upstream_clients.host_key(url)
+    credential = credential_id(params, headers)
+    upstream_retries.record_attempt()
+    attempt = 0
+    while True:
+        upstream_breaker.before_request(host)
+        retry_after = None
+        try:
+            resp, retry_after = await _attempt(url, params, headers, method, json_body, credential)
+            resp.raise_for_status()
+            upstream_breaker.record_success(host)
+            return resp.json()
+        except (httpx.HTTPStatusError, httpx.TransportError) as e:
+            server_down = isinstance(e, httpx.TransportError) or e.response.status_code >= 500
+            if server_down:
+                upstream_breaker.record_failure(host)
+            else:
+                # a 4xx (429 included) means the upstream is up and answering
+                upstream_breaker.record_success(host)
+            if not upstream_retries.should_retry(attempt, e):
+                raise
+            delay = upstream_retries.backoff(attempt, retry_after)
+            print(f"[MCP Server] {method} {host} failed ({e.__class__.__name__}), retry {attempt + 1} in {delay:.2f}s.")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+async def fetch(url: str, params: dict = None, headers: dict = None, method: str = "GET", json_body: dict = None):
+    key = request_key(method, url, params=params, headers=headers, json=json_body)
+    return await upstream_flights.do(key, lambda: _send(url, params, headers, method, json_body))
+
+async def cached_fetch(namespace: str, cache_args: dict, url: str, **kwargs):
+    """
+    fetch() behind the response cache. `cache_args` are the caller-facing
+    arguments that identify the response; API keys must never be part of them.
+    """
+    try:
+        return await response_cache.get_or_load(namespace, cache_args, lambda: fetch(url, **kwargs))
+    except UpstreamUnavailable as e:
+        # circuit open: answer from whatever we last saw, however old, rather than not at all
+        entry = response_cache.peek(namespace, cache_args)
+        if entry is None:
+            raise
+        print(f"[MCP Server] {e} Serving {namespace} from a response {time.time() - entry.stored_at:.0f}s old.")
+        if isinstance(entry.value, dict):
+            return {**entry.value, "_degraded": {"reason": "upstream_unavailable",
+                                                 "age_seconds": round(time.time() - entry.stored_at)}}
+        return entry.value
+
+def _late_fetch_done(task: asyncio.Task):
+    _late_fetches.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"[MCP Server] Late weather fetch failed: {task.exception()}")
+
+
+def _select_sections(sections: Optional[List[str]]) -> List[str]:
+    if not sections:
+        return list(WEATHER_SECTIONS)
+    unknown = [name for name in sections if name not in WEATHER_SECTIONS]
+    if unknown:
+        raise ValueError(f"Unknown weather sections {unknown}, expected any of {WEATHER_SECTIONS}.")
+    return [name for name in WEATHER_SECTIONS if name in sections]
+
+
+async def _weather_sections(city: str, history_date: str, api_key: str,
+                            sections: Optional[List[str]] = None, deadline: Optional[float] = None) -> tuple:
+    """
+    The weatherapi responses for a city, each given until its deadline.
+
+    Returns:
+        tuple: ({section: payload} for the sections that arrived,
+            {section: status} for every requested section, where status is
+            {"status": "ok"}, {"status": "stale", "age_seconds"} or
+            {"status": "missing", "reason"}).
+    """
+    # history for a day that is over never changes, today's is still filling in
+    history_namespace = "get_weather:history" if history_date < date.today().isoformat() else "get_weather:history_today"
 
-    api_key = os.getenv("WEATHER_API_KEY")
-    
-    if not api_key:
-        raise ValueError("API key not found! Check your .env file and loading.")
-    
     # history_date seven days prior
-    endpoints = [
-        ("http://api.weatherapi.com/v1/current.json", {
+    endpoints = {
+        "current": ("get_weather:current", f"{WEATHER_API_BASE_URL}/current.json", {
             "key": api_key,
             "q": city
         }),
-        ("http://api.weatherapi.com/v1/forecast.json", {
+        "forecast": ("get_weather:forecast", f"{WEATHER_API_BASE_URL}/forecast.json", {
             "key": api_key,
             "q": city,
             "days": 3
         }),
-        ("http://api.weatherapi.com/v1/history.json", {
+        "history": (history_namespace, f"{WEATHER_API_BASE_URL}/history.json", {
             "key": api_key,
             "q": city,
             "dt": history_date
         }),
-        ("http://api.weatherapi.com/v1/alerts.json", {
+        "alerts": ("get_weather:alerts", f"{WEATHER_API_BASE_URL}/alerts.json", {
             "key": api_key,
             "q": city
         }),
-        ("http://api.weatherapi.com/v1/marine.json", {
+        "marine": ("get_weather:marine", f"{WEATHER_API_BASE_URL}/marine.json", {
             "key": api_key,
             "q": city
         }),
-    ]
+    }
+
+    async def fetch_section(name: str):
+        namespace, url, params = endpoints[name]
+        cache_args = {k: v for k, v in params.items() if k != "key"}
+        timeout = deadline if deadline is not None else WEATHER_SECTION_DEADLINES[name]
+        task = asyncio.ensure_future(cached_fetch(namespace, cache_args, url, params=params))
+        try:
+            # shielded, so a section that misses its deadline still lands in the cache for the next call
+            value = await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            _late_fetches.add(task)
+            task.add_done_callback(_late_fetch_done)
+            return None, {"status": "missing", "reason": f"no response within {timeout:g}s"}
+        except Exception as e:
+            return None, {"status": "missing", "reason": f"{type(e).__name__}: {e}"}
+
+        if isinstance(value, dict) and "_degraded" in value:
+            return value, {"status": "stale", "age_seconds": value["_degraded"]["age_seconds"]}
+        entry = response_cache.peek(namespace, cache_args)
+        if entry is not None and time.time() > entry.expires_at:
+            # served inside the stale-while-revalidate window
+            return value, {"status": "stale", "age_seconds": round(time.time() - entry.stored_at)}
+        return value, {"status": "ok"}
+
+    names = _select_sections(sections)
+    outcomes = await asyncio.gather(*[fetch_section(name) for name in names])
+    payloads = {name: value for name, (value, _) in zip(names, outcomes) if value is not None}
+    status = {name: section_status for name, (_, section_status) in zip(names, outcomes)}
+    if not payloads:
+        reasons = "; ".join(f"{name}: {s['reason']}" for name, s in status.items())
+        raise RuntimeError(f"No weather data for {city} ({reasons}).")
+    return payloads, status
+
+
+def _weather_response(payloads: dict, status: dict, fields: Optional[List[str]], summary: bool) -> dict:
+    if summary:
+        # missing and stale sections are carried in the summary itself
+        return summarize_weather(payloads, status)
+    return {**{name: project(payload, fields) for name, payload in payloads.items()}, "section_status": status}
+
+
+async def _run_batch(locations: List[str], fetch_one) -> dict:
+    """
+    Runs `fetch_one(location)` for every distinct location, at most
+    BATCH_CONCURRENCY at a time. One location failing does not fail the batch.
+
+    Returns:
+        dict: {"results": {location: result}, "errors": {location: message},
+            "requested", "succeeded", "failed"}
+    """
+    locations = list(dict.fromkeys(locations))
+    if not locations:
+        raise ValueError("At least one location is required.")
+    if len(locations) > BATCH_MAX_LOCATIONS:
+        raise ValueError(f"At most {BATCH_MAX_LOCATIONS} locations per batch call, got {len(locations)}.")
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(location):
+        async with semaphore:
+            return await fetch_one(location)
+
+    outcomes = await asyncio.gather(*[run(location) for location in locations], return_exceptions=True)
+    results, errors = {}, {}
+    for location, outcome in zip(locations, outcomes):
+        if isinstance(outcome, Exception):
+            errors[location] = f"{type(outcome).__name__}: {outcome}"
+        else:
+            results[location] = outcome
+    return {
+        "requested": len(locations),
+        "succeeded": len(results),
+        "failed": len(errors),
+        "results": results,
+        "errors": errors,
+    }
+
+
+@mcp.tool()
+@server_metrics.timed_tool
+async def get_weather(city: str , history_date: str , fields: Optional[List[str]] = None , summary: bool = False ,
+                      sections: Optional[List[str]] = None , deadline_seconds: Optional[float] = None):
+    """
+    Current conditions, 3-day forecast, history for history_date, alerts and marine data for a city,
+    keyed by section, plus "section_status" marking each section ok, stale or missing.
+    fields: optional dotted paths to keep from each section (e.g. "current.wind_kph", "alerts.alert.headline").
+    summary: return pre-aggregated peaks/alerts (with missing and stale sections) instead of the raw hourly responses.
+    sections: only fetch these of current/forecast/history/alerts/marine (default all).
+    deadline_seconds: answer without any section that takes longer (default per section, a few seconds).
+    """
 
-    # call the req at once async gather
-    async with httpx.AsyncClient() as client :
-        tasks = [
-            fetch(client, url, params)
-            for url, params in endpoints
-        ]
-        results = await asyncio.gather(*tasks)
+    api_key = os.getenv("WEATHER_API_KEY")
+    
+    if not api_key:
+        raise ValueError("API key not found! Check your .env file and loading.")
+    
+    payloads, status = await _weather_sections(city, history_date, api_key, sections, deadline_seconds)
 
     # result already in parsed json
-    return results
+    return _weather_response(payloads, status, fields, summary)
+
+
+@mcp.tool()
+@server_metrics.timed_tool
+async def get_weather_batch(cities: List[str] , history_date: str , fields: Optional[List[str]] = None , summary: bool = False ,
+                            sections: Optional[List[str]] = None , deadline_seconds: Optional[float] = None):
+    """
+    get_weather for many cities in one call, keyed by city. Failed cities are
+    listed under "errors" instead of failing the whole batch.
+    fields / summary / sections / deadline_seconds: as for get_weather, applied to every city.
+    """
+    api_key = os.getenv("WEATHER_API_KEY")
+
+    if not api_key:
+        raise ValueError("API key not found! Check your .env file and loading.")
+
+    # reject a bad section list once, not once per city
+    _select_sections(sections)
 
+    async def fetch_city(city):
+        payloads, status = await _weather_sections(city, history_date, api_key, sections, deadline_seconds)
+        return _weather_response(payloads, status, fields, summary)
+
+    return await _run_batch(cities, fetch_city)
 
 
 def build_search_query(keywords: list[str]) -> str:
@@ -67,8 +344,14 @@ def build_search_query(keywords: list[str]) -> str:
     return " OR ".join(formatted_keywords)
 
 @mcp.tool()
-async def get_news(news : List[str]):
-    url = "https://newsapi.org/v2/everything"
+@server_metrics.timed_tool
+async def get_news(news : List[str] , fields: Optional[List[str]] = None , summary: bool = False):
+    """
+    Recent news articles matching any of the keywords.
+    fields: optional dotted paths to keep (e.g. "articles.title", "totalResults").
+    summary: return only the headline list.
+    """
+    url = NEWS_API_URL
 
     api_key = os.getenv("NEWS_API_KEY")
     
@@ -84,20 +367,12 @@ async def get_news(news : List[str]):
         "pageSize" : 10 ,
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url , params=params)
-        response.raise_for_status()
-        return response.json()
+    result = await cached_fetch("get_news", {"news": news}, url , params=params)
+    return summarize_news(result) if summary else project(result, fields)
 
-@mcp.tool()
-async def get_port_congestion(port_code : str , vessel_type : str):
-    url = "https://api.sinay.ai/congestion/api/v1/congestion"
+async def _port_congestion(port_code: str, vessel_type: str, api_key: str):
+    url = f"{SINAY_API_BASE_URL}/congestion/api/v1/congestion"
 
-    api_key = os.getenv("PORT_API_KEY")
-
-    if not api_key:
-        raise ValueError("API key not found! Check your .env file and loading.")
-    
     params = {
         "portCode": port_code ,
         "vesselType":vessel_type
@@ -107,14 +382,52 @@ async def get_port_congestion(port_code : str , vessel_type : str):
         "API_KEY": api_key
     }
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url , params=params , headers=headers)
-        response.raise_for_status()
-        return response.json()
+    return await cached_fetch("get_port_congestion", params, url , params=params , headers=headers)
+
+@mcp.tool()
+@server_metrics.timed_tool
+async def get_port_congestion(port_code : str , vessel_type : str , fields: Optional[List[str]] = None , summary: bool = False):
+    """
+    Current congestion for a port (UN/LOCODE) and vessel type.
+    fields: optional dotted paths to keep from the response.
+    summary: return only the congestion indicators.
+    """
+    api_key = os.getenv("PORT_API_KEY")
+
+    if not api_key:
+        raise ValueError("API key not found! Check your .env file and loading.")
     
+    result = await _port_congestion(port_code, vessel_type, api_key)
+    return summarize_congestion(result) if summary else project(result, fields)
+
 @mcp.tool()
-async def get_vessel_detail(vesselNameOrCode : str):
-    url = "https://api.sinay.ai/ports-vessels/api/v1/vessels"
+@server_metrics.timed_tool
+async def get_port_congestion_batch(port_codes : List[str] , vessel_type : str , fields: Optional[List[str]] = None , summary: bool = False):
+    """
+    get_port_congestion for many ports (UN/LOCODEs) in one call, keyed by port
+    code. Failed ports are listed under "errors" instead of failing the batch.
+    fields / summary: as for get_port_congestion, applied to every port.
+    """
+    api_key = os.getenv("PORT_API_KEY")
+
+    if not api_key:
+        raise ValueError("API key not found! Check your .env file and loading.")
+
+    async def fetch_port(port_code):
+        result = await _port_congestion(port_code, vessel_type, api_key)
+        return summarize_congestion(result) if summary else project(result, fields)
+
+    return await _run_batch(port_codes, fetch_port)
+    
+@mcp.tool()
+@server_metrics.timed_tool
+async def get_vessel_detail(vesselNameOrCode : str , fields: Optional[List[str]] = None , summary: bool = False):
+    """
+    Vessels matching a name or code.
+    fields: optional dotted paths to keep from the response.
+    summary: return only identity, type, status and destination per vessel.
+    """
+    url = f"{SINAY_API_BASE_URL}/ports-vessels/api/v1/vessels"
 
     api_key = os.getenv("PORT_API_KEY")
 
@@ -130,15 +443,27 @@ async def get_vessel_detail(vesselNameOrCode : str):
         "API_KEY": api_key
     }
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url , params=params , headers=headers)
-        response.raise_for_status()
-        return response.json()
+    result = await cached_fetch("get_vessel_detail", params, url , params=params , headers=headers)
+    return summarize_vessels(result) if summary else project(result, fields)
     
 # response is links to all the docs in html 
 @mcp.tool()
-async def get_sec_filing(cik_company: str):
-    url = "https://api.sec-api.io"
+@server_metrics.timed_tool
+async def get_sec_filing(cik_company: str , fields: Optional[List[str]] = None , summary: bool = False ,
+                         form_types: Optional[List[str]] = None):
+    """
+    Latest 10-Q filing links for a company CIK.
+    fields: optional dotted paths to keep (e.g. "filings.filedAt").
+    summary: return only company, form, filing date and link.
+    form_types: form types to search instead of 10-Q (e.g. ["8-K"]); the
+        latest filing among them is returned.
+    """
+    form_types = [str(form).strip().upper() for form in form_types or ["10-Q"]]
+    invalid = [form for form in form_types if not _FORM_TYPE.match(form)]
+    if invalid:
+        raise ValueError(f"Invalid SEC form types {invalid}, expected e.g. '10-Q' or '8-K'.")
+
+    url = SEC_API_URL
 
     api_key = os.getenv("SEC_API_KEY")
 
@@ -149,22 +474,85 @@ async def get_sec_filing(cik_company: str):
     cik_company = str(int(cik_company))
 
     headers = {"Authorization": api_key}
+    forms_query = " OR ".join(f'"{form}"' for form in form_types)
+    if len(form_types) > 1:
+        forms_query = f"({forms_query})"
     payload = {
-        "query": f"cik:{cik_company} AND formType:\"10-Q\"",
+        "query": f"cik:{cik_company} AND formType:{forms_query}",
         "from": "0",
         "size": "1",
         "sort": [{ "filedAt": { "order": "desc" }}]
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url ,json = payload , headers=headers)
-        response.raise_for_status()
-        return response.json()
+    if form_types == ["10-Q"]:
+        namespace, cache_args = "get_sec_filing", {"cik": cik_company}
+    else:
+        # a new 8-K should show up within the hour; other form sets keep the 10-Q policy
+        namespace = "get_sec_filing:8-K" if "8-K" in form_types else "get_sec_filing"
+        cache_args = {"cik": cik_company, "forms": form_types}
+    result = await cached_fetch(namespace, cache_args, url , headers=headers , method="POST" , json_body=payload)
+    return summarize_sec_filing(result) if summary else project(result, fields)
+
+
+@mcp.custom_route("/stats", methods=["GET"])
+async def server_stats(request: Request) -> JSONResponse:
+    return JSONResponse({
+        "upstream_pool": upstream_clients.stats(),
+        "response_cache": response_cache.stats(),
+        "single_flight": upstream_flights.stats(),
+        "rate_limit": upstream_rate_limiter.stats(),
+        "retries": upstream_retries.stats(),
+        "circuit_breakers": upstream_breaker.stats(),
+    })
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def prometheus_metrics(request: Request) -> PlainTextResponse:
+    sink = server_metrics.sink(PrometheusSink)
+    rendered = sink.render().strip() if sink and server_metrics.enabled else ""
+    lines = [rendered] if rendered else []
+    lines += gauge_lines("upstream_pool", upstream_clients.stats()["totals"])
+    lines += gauge_lines("response_cache", response_cache.stats())
+    lines += gauge_lines("single_flight", upstream_flights.stats())
+    for bucket, stats in upstream_rate_limiter.stats()["hosts"].items():
+        for key, value in stats.items():
+            lines.append(f'risk_intel_rate_limit_{key}{{bucket="{bucket}"}} {value}')
+    lines += gauge_lines("retries", upstream_retries.stats())
+    for host, stats in upstream_breaker.stats().items():
+        lines.append(f'risk_intel_circuit_breaker_state{{host="{host}"}} {upstream_breaker.state(host)}')
+        lines.append(f'risk_intel_circuit_breaker_opened_total{{host="{host}"}} {stats["opened"]}')
+        lines.append(f'risk_intel_circuit_breaker_rejected_total{{host="{host}"}} {stats["rejected"]}')
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
+def build_app():
+    """
+    Streamable-http app whose lifespan also owns the upstream client registry.
+    FastMCP's own `lifespan` runs per MCP session, so server-lifetime resources
+    hook into the Starlette lifespan instead.
+    """
+    app = mcp.streamable_http_app()
+    session_manager_lifespan = app.router.lifespan_context
 
+    @asynccontextmanager
+    async def lifespan(app):
+        print("[MCP Server] Upstream client pool ready "
+              f"(http2={upstream_clients.http2}, max_connections={upstream_clients.limits.max_connections}).")
+        try:
+            async with session_manager_lifespan(app):
+                yield
+        finally:
+            await response_cache.aclose()
+            await upstream_clients.aclose()
+            server_metrics.close()
+            print("[MCP Server] Upstream client pool closed.")
 
+    app.router.lifespan_context = lifespan
+    return app
 
 
 if __name__ == "__main__":
     print("Starting MCP server with streamable-http transport...")
     # Run server with streamable_http transport
-    mcp.run(transport="streamable-http")
+    uvicorn.run(build_app(), host=mcp.settings.host, port=mcp.settings.port,
+                log_level=mcp.settings.log_level.lower())
@@ -0,0 +1,161 @@
+# server_metrics.py
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class PrometheusSink:
+    """
+    Aggregates span records into Prometheus-style histograms and counters,
+    rendered in the text exposition format by `render()`.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # (metric, sorted label items) -> [bucket counts..., +Inf], sum
+        self._histograms: Dict[Tuple[str, tuple], dict] = {}
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+
+    def export(self, record: dict):
+        labels = tuple(sorted(record["labels"].items()))
+        with self._lock:
+            key = (f"{record['kind']}_duration_seconds", labels)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            histogram["buckets"][bisect.bisect_left(self.buckets, record["duration_s"])] += 1
+            histogram["sum"] += record["duration_s"]
+            if record.get("bytes"):
+                bytes_key = (f"{record['kind']}_response_bytes_total", labels)
+                self._counters[bytes_key] = self._counters.get(bytes_key, 0) + record["bytes"]
+
+    def render(self, prefix: str = "risk_intel") -> str:
+        lines = []
+        with self._lock:
+            for name in sorted({metric for metric, _ in self._histograms}):
+                lines.append(f"# TYPE {prefix}_{name} histogram")
+                for (metric, labels), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip([str(b) for b in self.buckets] + ["+Inf"], histogram["buckets"]):
+                        cumulative += count
+                        lines.append(f"{prefix}_{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+                    lines.append(f"{prefix}_{name}_sum{_labels(labels)} {round(histogram['sum'], 6)}")
+                    lines.append(f"{prefix}_{name}_count{_labels(labels)} {cumulative}")
+            for name in sorted({metric for metric, _ in self._counters}):
+                lines.append(f"# TYPE {prefix}_{name} counter")
+                for (metric, labels), value in sorted(self._counters.items()):
+                    if metric == name:
+                        lines.append(f"{prefix}_{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        pass
+
+
+class JsonlSink:
+    """
+    Appends one JSON object per span record to `path`.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", buffering=1)
+
+    def export(self, record: dict):
+        line = json.dumps(record)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(items: tuple) -> str:
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+def gauge_lines(name: str, stats: dict, prefix: str = "risk_intel") -> list:
+    """
+    Flattens a numeric stats() dict (nested dicts become name_key) into gauges.
+    """
+    lines = []
+    for key, value in stats.items():
+        metric = f"{name}_{key}"
+        if isinstance(value, dict):
+            lines.extend(gauge_lines(metric, value, prefix))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"{prefix}_{metric} {value}")
+    return lines
+
+
+class ServerMetrics:
+    """
+    Span recording for the MCP server: tool calls and upstream HTTP requests.
+    Records go to every sink; with SERVER_METRICS=0 nothing is recorded.
+
+    SERVER_TRACE_JSONL, when set, also appends every record to that file.
+    """
+    def __init__(self, sinks: list = None, enabled: bool = True):
+        self.sinks = list(sinks or [])
+        self.enabled = enabled and bool(self.sinks)
+
+    @classmethod
+    def from_env(cls) -> "ServerMetrics":
+        enabled = os.getenv("SERVER_METRICS", "1").strip().lower() not in ("0", "false", "no", "off")
+        sinks = [PrometheusSink()]
+        if os.getenv("SERVER_TRACE_JSONL"):
+            sinks.append(JsonlSink(os.getenv("SERVER_TRACE_JSONL")))
+        return cls(sinks, enabled=enabled)
+
+    def record(self, kind: str, duration_s: float, labels: dict, size: int = None):
+        if not self.enabled:
+            return
+        record = {"kind": kind, "ts": time.time(), "duration_s": round(duration_s, 6), "labels": labels, "bytes": size}
+        for sink in self.sinks:
+            try:
+                sink.export(record)
+            except Exception as e:
+                print(f"[MCP Server] Metrics sink {type(sink).__name__} failed: {e}")
+
+    def sink(self, sink_type):
+        return next((s for s in self.sinks if isinstance(s, sink_type)), None)
+
+    def timed_tool(self, func):
+        """
+        Records each call of an MCP tool as a `tool` span. Apply beneath
+        @mcp.tool(); functools.wraps keeps the signature FastMCP inspects.
+        """
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return await func(*args, **kwargs)
+            started = time.perf_counter()
+            status = "ok"
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                status = "error"
+                raise
+            finally:
+                self.record("tool", time.perf_counter() - started, {"tool": func.__name__, "status": status})
+        return wrapper
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
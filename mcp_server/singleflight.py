@@ -0,0 +1,55 @@
+# singleflight.py
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict
+
+
+def request_key(method: str, url: str, **parts) -> str:
+    """
+    Stable key for an upstream request from its method, URL and any of
+    params/headers/json. Hashed so API keys never sit in memory as plain keys.
+    """
+    canonical = json.dumps({"method": method.upper(), "url": url, **parts}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key starts
+    the work, every caller that arrives while it is in flight awaits the same
+    result (or exception). The work runs as its own task, so a cancelled
+    caller never cancels the request the others are waiting on.
+    """
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "max_waiters": 0}
+        self._waiters: Dict[str, int] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self._stats["calls"] += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            self._stats["executions"] += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda _: self._forget(key))
+        else:
+            self._stats["coalesced"] += 1
+
+        self._waiters[key] += 1
+        self._stats["max_waiters"] = max(self._stats["max_waiters"], self._waiters[key])
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str):
+        self._in_flight.pop(key, None)
+        self._waiters.pop(key, None)
+
+    def stats(self) -> dict:
+        calls = self._stats["calls"]
+        return {
+            **self._stats,
+            "coalescing_ratio": round(self._stats["coalesced"] / calls, 4) if calls else 0.0,
+            "in_flight": len(self._in_flight),
+        }